@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""
+Batched version of LandscapeSingleHour: the bilinear interpolation of the
+I-V curves (W. Marion 2004) for many hours at once.
+
+The reference irradiance, temperature, current and voltage grids are built
+once when the LandscapeBatch is created, and all hours x cell groups are
+processed as stacked arrays: the bracketing reference curves are found for
+every cell group at once, and the linear interpolations reproduce
+scipy's interp1d (same sorting, bracket and slope arithmetic) row by row.
+Results are the same as calling LandscapeSingleHour for each hour; only the
+open circuit voltage extrapolation (a 2 point line instead of np.polyfit) can
+differ, at floating point rounding level.
+
+Like LandscapeSingleHour it assumes 3 bypass diodes per module, with two cell
+rows/sensors per bypass diode.
+"""
+
+from __future__ import division, print_function, absolute_import
+import math
+import numpy as np
+
+
+def _whileGrid(start, stop, step):
+    ''' start:step:stop grid built by repeated addition, as in
+    LandscapeSingleHour, so the grid values are the same to the last bit '''
+    grid = []
+    foo = start
+    while foo <= stop:
+        grid.append(foo)
+        foo = foo + step
+    return np.array(grid, dtype=float)
+
+
+def _batchInterp(x, y, xnew, nvalid, fill_below, fill_above):
+    ''' interp1d(x[r, :nvalid[r]], y[r, :nvalid[r]], kind='linear',
+    bounds_error=False)(xnew) for every row r of x, which must be sorted
+    ascending over its valid entries. xnew is a sorted 1-D grid shared by all
+    rows. Returns an array of shape (rows, len(xnew)) '''
+    rows, length = x.shape
+    nnew = len(xnew)
+    valid = np.arange(length) < nvalid[:, None]
+    # searchsorted(x[r], xnew) for all rows: each x value is smaller than the
+    # xnew values from searchsorted(xnew, x, 'right') on, so counting them
+    # per row and grid point gives the insertion indices.
+    first = np.where(valid, np.searchsorted(xnew, x, side='right'), nnew)
+    counts = np.bincount((first + (nnew + 1) * np.arange(rows)[:, None]).ravel(),
+                         minlength=rows * (nnew + 1))
+    indices = np.cumsum(counts.reshape(rows, nnew + 1), axis=1)[:, :nnew]
+    indices = np.clip(indices, 1, (nvalid - 1)[:, None])
+
+    # flat indices of the bracketing points, faster than take_along_axis
+    hi = indices + (length * np.arange(rows))[:, None]
+    lo = hi - 1
+    x = x.ravel()
+    y = y.ravel()
+    x_lo = x[lo]
+    x_hi = x[hi]
+    y_lo = y[lo]
+    y_hi = y[hi]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = (y_hi - y_lo) / (x_hi - x_lo)
+        ynew = slope * (xnew - x_lo) + y_lo
+
+    ynew[xnew < x[length * np.arange(rows)][:, None]] = fill_below
+    ynew[xnew > x[length * np.arange(rows) + nvalid - 1][:, None]] = fill_above
+    return ynew
+
+
+class LandscapeBatch(object):
+    '''
+    LandscapeSingleHour for a batch of hours, with the reference grids and
+    the bilinear interpolation parameters set up once.
+
+    Parameters
+    ----------
+    interpolA : float
+        Current step of the module I-V curves (0.005 for the Yingli defaults).
+    IVArray : numpy array
+        Module voltages at the reference currents, for each reference
+        irradiance and temperature, shape (1, 14, 23, 1101).
+    beta_voc_all, m_all, bee_all : numpy arrays
+        Bilinear interpolation parameters for each irradiance and temperature.
+    chunksize : int
+        Number of hours interpolated together, to bound the memory use.
+
+    Example:
+    landscape = LandscapeBatch(interpolA, IVArray, beta_voc_all, m_all, bee_all)
+    PmaxIdeal, PmaxUnmatched, PmaxAvg = landscape.calculate(FrontIrradiance, RearIrradiance, Tamb, VWind)
+    '''
+
+    Ilim = 11
+    RefRads = np.array([10, 50, 100, 200, 300, 400, 500, 600, 700, 800, 900, 1000, 1100, 1200], dtype=float)
+
+    def __init__(self, interpolA, IVArray, beta_voc_all, m_all, bee_all, chunksize=256):
+        self.interpolA = interpolA
+        self.IVArray = np.asarray(IVArray)[0]
+        self.beta_voc_all = np.asarray(beta_voc_all)
+        self.m_all = np.asarray(m_all)
+        self.bee_all = np.asarray(bee_all)
+        self.chunksize = chunksize
+
+        self.RefTemps = _whileGrid(-10, 100, 5)
+        self.RefCurs = _whileGrid(0, self.Ilim, 0.01)
+        self.ManyCurs = _whileGrid(0, self.Ilim, interpolA)
+        self.newX = _whileGrid(-10, 600, 1)
+
+    def calculate(self, FrontIrradiance, RearIrradiance, Tamb, VWind, numsens=6):
+        '''
+        PmaxIdeal, PmaxUnmatched and PmaxAvg of LandscapeSingleHour for each
+        hour.
+
+        Parameters
+        ----------
+        FrontIrradiance, RearIrradiance : array, shape (hours, sensors)
+            Irradiances of the cell groups, only the first numsens are used.
+        Tamb, VWind : array, shape (hours,)
+            Ambient temperature [C] and wind speed [m/s].
+        numsens : int
+            Number of cell groups (6 for 3 bypass diodes).
+
+        Returns
+        -------
+        PmaxIdeal, PmaxUnmatched, PmaxAvg : numpy arrays, shape (hours,)
+        '''
+        FrontIrradiance = np.atleast_2d(np.asarray(FrontIrradiance, dtype=float))
+        RearIrradiance = np.atleast_2d(np.asarray(RearIrradiance, dtype=float))
+        Tamb = np.atleast_1d(np.asarray(Tamb, dtype=float))
+        VWind = np.atleast_1d(np.asarray(VWind, dtype=float))
+
+        nhours = len(FrontIrradiance)
+        PmaxIdeal = np.zeros(nhours)
+        PmaxUnmatched = np.zeros(nhours)
+        PmaxAvg = np.zeros(nhours)
+        for start in range(0, nhours, self.chunksize):
+            chunk = slice(start, start + self.chunksize)
+            PmaxIdeal[chunk], PmaxUnmatched[chunk], PmaxAvg[chunk] = self._calculateChunk(
+                FrontIrradiance[chunk, :numsens], RearIrradiance[chunk, :numsens],
+                Tamb[chunk], VWind[chunk], numsens)
+        return PmaxIdeal, PmaxUnmatched, PmaxAvg
+
+    def _calculateChunk(self, FrontIrradiance, RearIrradiance, Tamb, VWind, numsens):
+        nhours = len(FrontIrradiance)
+        EffectiveIrradiance = FrontIrradiance + RearIrradiance
+
+        # Cell temperatures, Sandia temperature model (math.exp as in
+        # LandscapeSingleHour, not np.exp, to keep the same rounding)
+        a = -3.56
+        b = -0.0750
+        dT = 3
+        windfactor = np.array([math.exp(a + b * v) for v in VWind])
+        Tcell = EffectiveIrradiance * windfactor[:, None] + Tamb[:, None] + EffectiveIrradiance / 1000 * dT
+
+        # Just in case....
+        EffectiveIrradiance = np.where(EffectiveIrradiance <= 10, 10.1, EffectiveIrradiance)
+        EffectiveIrradiance = np.where(EffectiveIrradiance >= 1199, 1199, EffectiveIrradiance)
+        Tcell = np.where(Tcell <= -9.9, -9.9, Tcell)
+        Tcell = np.where(Tcell >= 99.9, 99.9, Tcell)
+
+        # From here on each (hour, cell group) pair is a row
+        E = EffectiveIrradiance.ravel()
+        Tc = Tcell.ravel()
+
+        indRlo, indRhi, indR, Rparam = self._bracket(self.RefRads, E)
+        indTlo, indThi, indT, Tparam = self._bracket(self.RefTemps, Tc)
+        RadLo = self.RefRads[indRlo]
+        TempRef = self.RefTemps[indT]
+
+        beta_voc = self.beta_voc_all[Rparam, Tparam]
+
+        IVRloTlo = self.IVArray[indRlo, indTlo, :]
+        IVRhiTlo = self.IVArray[indRhi, indTlo, :]
+        IVRloThi = self.IVArray[indRlo, indThi, :]
+        IVRhiThi = self.IVArray[indRhi, indThi, :]
+
+        # Translate the first set of curves: this is just Voc. The irradiance
+        # term (1+(m*Tcell+bee)*log(Rad/Rad)) of LandscapeSingleHour is 1.
+        VocRhiTc = self.IVArray[indRhi, indT, 0] * (1 + beta_voc * (Tc - TempRef))
+        VocRloTc = self.IVArray[indRlo, indT, 0] * (1 + beta_voc * (Tc - TempRef))
+        IVRhiTc = IVRhiThi + (IVRhiTlo - IVRhiThi) * (VocRhiTc - IVRhiThi[:, 0])[:, None] / (IVRhiTlo[:, 0] - IVRhiThi[:, 0])[:, None]
+        IVRloTc = IVRloThi + (IVRloTlo - IVRloThi) * (VocRloTc - IVRloThi[:, 0])[:, None] / (IVRloTlo[:, 0] - IVRloThi[:, 0])[:, None]
+
+        # Take the new curves at Tc and interpolate so they have the same voltages
+        IVRhiTc_Iinterp = self._currentsAtVoltages(IVRhiTc)
+        IVRloTc_Iinterp = self._currentsAtVoltages(IVRloTc)
+
+        # Now the Isc translation
+        IscLo = IVRloTc_Iinterp[:, 10]
+        IscHi = IVRhiTc_Iinterp[:, 10]
+        IscTc = E / RadLo * IscLo
+        IReal = IVRloTc_Iinterp + (IVRhiTc_Iinterp - IVRloTc_Iinterp) * (IscTc - IscLo)[:, None] / (IscHi - IscLo)[:, None]
+
+        # Now put it back to currents instead of voltage-wise
+        PanVolt = self._voltagesAtCurrents(IReal)
+        CellStripIVs = (PanVolt / numsens).reshape(nhours, numsens, -1)
+
+        ModIVs = self._moduleIVs(CellStripIVs)
+
+        # Now get the max possible power
+        Pmax = np.max(self.ManyCurs * CellStripIVs, axis=2)
+        PmaxIdeal = np.zeros(nhours)
+        for s in range(numsens):
+            PmaxIdeal = PmaxIdeal + Pmax[:, s]
+        PmaxUnmatched = np.max(self.ManyCurs * ModIVs, axis=1)
+        PmaxAvg = np.average(Pmax, axis=1) * numsens
+
+        return PmaxIdeal, PmaxUnmatched, PmaxAvg
+
+    @staticmethod
+    def _moduleIVs(CellStripIVs):
+        ''' Module voltages at each current from the cell group voltages, shape
+        (hours, numsens, currents). In landscape each bypass diode protects two
+        cell groups '''
+        # BypassDiodeLevelIVCUrves. These are voltages at each current!
+        BypIVs = np.stack([CellStripIVs[:, 0] + CellStripIVs[:, 1],
+                           CellStripIVs[:, 2] + CellStripIVs[:, 3],
+                           CellStripIVs[:, 4] + CellStripIVs[:, 5]], axis=1)
+        BypIVs[BypIVs < -0.7] = -0.7
+        return BypIVs[:, 0] + BypIVs[:, 1] + BypIVs[:, 2]
+
+    @staticmethod
+    def _bracket(reference, values):
+        ''' Closest reference index and the reference indices below and
+        above each value, as found by LandscapeSingleHour (first closest on
+        ties, the closest counts as the upper one unless it is below) '''
+        ind = np.argmin(np.abs(reference - values[:, None]), axis=1)
+        below = reference[ind] - values < 0
+        indlo = np.where(below, ind, ind - 1)
+        indhi = np.where(below, ind + 1, ind)
+        param = np.where(below, ind, np.maximum(1, ind - 1))
+        return indlo, indhi, ind, param
+
+    def _currentsAtVoltages(self, IVcurves):
+        ''' Currents at the newX voltages of curves given as voltages at the
+        RefCurs currents, 0 outside of the curves '''
+        order = np.argsort(IVcurves, axis=1, kind='mergesort')
+        x = np.take_along_axis(IVcurves, order, axis=1)
+        y = self.RefCurs[order]
+        nvalid = np.full(len(x), x.shape[1])
+        return _batchInterp(x, y, self.newX, nvalid, 0, 0)
+
+    def _voltagesAtCurrents(self, IReal):
+        ''' Voltages at the ManyCurs currents of curves given as currents at
+        the newX voltages, -10000 outside of the curves. The unique currents
+        are paired with the voltages and the extrapolated open circuit
+        voltage just like in LandscapeSingleHour '''
+        rows, length = IReal.shape
+        newX = self.newX
+
+        # np.unique(IReal, return_index=True) of every row, padded with inf
+        order = np.argsort(IReal, axis=1, kind='mergesort')
+        ordered = np.take_along_axis(IReal, order, axis=1)
+        newvalue = np.ones(ordered.shape, dtype=bool)
+        newvalue[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+        nuni = newvalue.sum(axis=1)
+        position = np.cumsum(newvalue, axis=1) - 1
+        rowindex = np.broadcast_to(np.arange(rows)[:, None], ordered.shape)
+        Uni = np.full(ordered.shape, np.inf)
+        Uni[rowindex[newvalue], position[newvalue]] = ordered[newvalue]
+        uniind = np.zeros(ordered.shape, dtype=int)
+        uniind[rowindex[newvalue], position[newvalue]] = order[newvalue]
+        if (nuni < 3).any():
+            raise ValueError("I-V curve with less than 3 distinct currents")
+
+        # Open circuit voltage: line through the 2nd and 3rd smallest currents
+        # at 0 A (np.polyfit/np.polyval of LandscapeSingleHour)
+        rows_ = np.arange(rows)
+        I1, I2 = Uni[:, 1], Uni[:, 2]
+        V1, V2 = newX[uniind[:, 1]], newX[uniind[:, 2]]
+        VocReal = V1 - I1 * (V2 - V1) / (I2 - I1)
+
+        # The k-th smallest unique current goes with the voltage newX[uniind[1]-k+1]
+        # (the first one with VocReal), so there must be as many unique
+        # currents as voltages from newX[uniind[-1]] to newX[uniind[1]], plus Voc
+        indfirst = uniind[:, 1]
+        indlast = uniind[rows_, nuni - 1]
+        if (nuni != indfirst - indlast + 2).any():
+            raise ValueError("shape mismatch: I-V curve currents are not monotonic")
+        k = np.arange(length)
+        Vee = newX[np.clip(indfirst[:, None] - k + 1, 0, length - 1)]
+        Vee[:, 0] = VocReal
+
+        return _batchInterp(Uni, Vee, self.ManyCurs, nuni, -10000, -10000)
@@ -36,9 +36,8 @@ def LandscapeSingleHour(FrontIrradiance, RearIrradiance, Tamb, VWind, numsens, i
     # clear Pmax*
     #This is at the module level because the system is assumed unshaded and with long rows so irradiance is constant in the module X plane.  
 
-    global PmaxUnmatched
-    global PmaxIdeal
-    
+    # Results are local (no module level state), so concurrent calls from
+    # threads are safe.
     PmaxUnmatched=0;
     PmaxIdeal=0;
     
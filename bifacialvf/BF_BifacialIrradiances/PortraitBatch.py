@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+Batched version of PortraitSingleHour: the bilinear interpolation of the
+I-V curves for many hours at once, with the grids and the stacked array
+processing of LandscapeBatch.
+
+In portrait every cell group (row of cells across the module) has cells in
+each of the 3 bypass diode substrings, so the bypass diodes see one third of
+the sum of all cell groups.
+"""
+
+from __future__ import division, print_function, absolute_import
+import numpy as np
+from bifacialvf.BF_BifacialIrradiances.LandscapeBatch import LandscapeBatch
+
+
+class PortraitBatch(LandscapeBatch):
+    '''
+    PortraitSingleHour for a batch of hours. Same parameters and use as
+    LandscapeBatch, usually with numsens=12 cell groups (72 cell module).
+
+    Example:
+    portrait = PortraitBatch(interpolA, IVArray, beta_voc_all, m_all, bee_all)
+    PmaxIdeal, PmaxUnmatched, PmaxAvg = portrait.calculate(FrontIrradiance, RearIrradiance, Tamb, VWind, numsens=12)
+    '''
+
+    @staticmethod
+    def _moduleIVs(CellStripIVs):
+        ''' Module voltages at each current: all the cell groups in series,
+        split evenly across the 3 bypass diodes '''
+        StripSum = CellStripIVs[:, 0]
+        for s in range(1, CellStripIVs.shape[1]):
+            StripSum = StripSum + CellStripIVs[:, s]
+        BypIVs = StripSum / 3
+        BypIVs[BypIVs < -0.7] = -0.7
+        return BypIVs * 3
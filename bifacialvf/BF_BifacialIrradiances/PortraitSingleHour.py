@@ -33,9 +33,8 @@ def PortraitSingleHour(FrontIrradiance, RearIrradiance, Tamb, Vwind, numsens, in
     # clear Pmax*
     #This is at the module level because the system is assumed unshaded and with long rows so irradiance is constant in the module X plane.  
 
-    global PmaxUnmatched
-    global PmaxIdeal
-    
+    # Results are local (no module level state), so concurrent calls from
+    # threads are safe.
     PmaxUnmatched=0;
     PmaxIdeal=0;
     
@@ -116,7 +115,7 @@ def PortraitSingleHour(FrontIrradiance, RearIrradiance, Tamb, Vwind, numsens, in
        a=-3.56;
        b=-0.0750;
        dT=3;
-       Tback=EffectiveIrradiance[s]*math.exp(a+b*VWind)+Tamb;
+       Tback=EffectiveIrradiance[s]*math.exp(a+b*Vwind)+Tamb;
        Tcell.append(Tback+EffectiveIrradiance[s]/1000*dT);
        
        # Just in case.... 
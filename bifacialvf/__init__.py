@@ -1,9 +1,15 @@
 # ensure python3 compatible division and printing
 from __future__ import division, print_function, absolute_import
-from bifacialvf.bifacialvf import simulate, getEPW, readInputTMY  # main program
+from bifacialvf.bifacialvf import simulate, tracker_sweep, getEPW, readInputTMY  # main program
 from bifacialvf.vf import getBackSurfaceIrradiances, getFrontSurfaceIrradiances, getGroundShadeFactors  # main subroutines
-from bifacialvf.vf import getSkyConfigurationFactors, trackingBFvaluescalculator, rowSpacing # helper functions
-from bifacialvf.sun import hrSolarPos, perezComp, solarPos, sunIncident # solar position and value
+from bifacialvf.vf import getSkyConfigurationFactors, trackingBFvaluescalculator, trackingGeometry, rowSpacing # helper functions
+from bifacialvf.sun import hrSolarPos, perezComp, perezCompArray, solarPos, sunIncident # solar position and value
+from bifacialvf.sun import sunIncidentArray, aOIcorrection, aOIcorrectionArray # array versions
+from bifacialvf.sun import solarPosArray, hrSolarPosArray, sunrisecorrectedsunposition
+from bifacialvf.sun import cachedsunrisecorrectedsunposition, SOLPOS_CACHE # solar position cache
+from bifacialvf.sun import warmupSolarPosition, SOLAR_POSITION_METHODS
 from bifacialvf.loadVFresults import loadVFresults # utility for reading result files
 from bifacialvf.BF_BifacialIrradiances.LandscapeSingleHour import LandscapeSingleHour # For calculateBilInterpol
-from bifacialvf.BF_BifacialIrradiances.PortraitSingleHour import PortraitSingleHour # For calculateBilInterpol
\ No newline at end of file
+from bifacialvf.BF_BifacialIrradiances.PortraitSingleHour import PortraitSingleHour # For calculateBilInterpol
+from bifacialvf.BF_BifacialIrradiances.LandscapeBatch import LandscapeBatch # For analyseVFResultsBilInterpol
+from bifacialvf.BF_BifacialIrradiances.PortraitBatch import PortraitBatch # For analyseVFResultsBilInterpol
\ No newline at end of file
@@ -13,19 +13,116 @@ from pvmismatch import *  # this imports everything we need
 import bifacialvf
 import os
 import pandas as pd
+from copy import copy
+from pvmismatch.pvmismatch_lib.pvconstants import npinterpx
+from bifacialvf.cache import LRUCache
+
+BILINEARPARAMSDIR = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'BF_BifacialIrradiances', 'BilinearInterpParams')
+
+# Bilinear interpolation parameters by module name: the .mat files they are read
+# from and the current step of the interpolation
+_BILINEAR_REGISTRY = {}
+# Parameters already loaded in this process, by module name
+_BILINEAR_PARAMS = {}
+
+
+def registerBilinearInterpolationParams(name, IVArrayfile, paramsfile, interpolA=0.005):
+    r'''Registers the bilinear interpolation parameters of a module, to be used
+    by passing its name as BilInterpolParams.
+
+    Inputs:
+    name: name of the module, for example the vendor.
+    IVArrayfile: .mat file with the 'IVArray' of module voltages at the reference
+                      currents, for each reference irradiance and temperature.
+    paramsfile: .mat file with the 'beta_voc_all', 'm_all' and 'bee_all' parameters.
+    interpolA: current step of the interpolated I-V curves.
+
+    Example:
+    registerBilinearInterpolationParams('Yingli', 'IVArrayYingli.mat', 'newBilinearParamsYingli.mat')
+    '''
+    _BILINEAR_REGISTRY[name] = {'IVArrayfile': IVArrayfile, 'paramsfile': paramsfile,
+                                'interpolA': interpolA}
+    _BILINEAR_PARAMS.pop(name, None)
+
+
+registerBilinearInterpolationParams('Yingli', os.path.join(BILINEARPARAMSDIR, 'IVArrayYingli.mat'),
+                                    os.path.join(BILINEARPARAMSDIR, 'newBilinearParamsYingli.mat'))
+
+
+def _npycachedir(matfile, cachedir):
+    ''' Folder for the .npy copies: cachedir, else the folder of the .mat file
+    if it can be written, else a bifacialvf folder in the temporary directory '''
+    if cachedir is None:
+        cachedir = os.path.dirname(os.path.abspath(matfile))
+        if not os.access(cachedir, os.W_OK):
+            import tempfile
+            cachedir = os.path.join(tempfile.gettempdir(), 'bifacialvf')
+    os.makedirs(cachedir, exist_ok=True)
+    return cachedir
+
+
+def _loadMatAsNpy(matfile, keys, cachedir=None):
+    ''' Arrays keys of matfile, memory-mapped from .npy copies that are written
+    the first time (and again when the .mat file is newer) '''
+    cachedir = _npycachedir(matfile, cachedir)
+    stem = os.path.splitext(os.path.basename(matfile))[0]
+    npyfiles = [os.path.join(cachedir, '%s_%s.npy' % (stem, key)) for key in keys]
+    mattime = os.path.getmtime(matfile)
+    if not all(os.path.exists(npyfile) and os.path.getmtime(npyfile) >= mattime for npyfile in npyfiles):
+        mat_contents = sio.loadmat(matfile)
+        for key, npyfile in zip(keys, npyfiles):
+            tmpname = '%s.%d.tmp.npy' % (npyfile[:-4], os.getpid())
+            np.save(tmpname, mat_contents[key])
+            os.replace(tmpname, npyfile)
+    return [np.load(npyfile, mmap_mode='r') for npyfile in npyfiles]
+
+
+def loadBilinearInterpolationParams(name='Yingli', cachedir=None):
+    r'''Returns interpolA, IVArray, beta_voc_all, m_all, bee_all of a registered
+    module. The .mat files are converted once to .npy files, which are then
+    memory-mapped, so all the processes using them share the same memory, and
+    the parameters are kept for the next calls in this process.
+
+    Inputs:
+    name: module name given to registerBilinearInterpolationParams. 'Yingli' is
+                      registered with the parameters in BF_BifacialIrradiances/BilinearInterpParams.
+    cachedir: folder for the .npy files. By default the folder of the .mat files,
+                      or a bifacialvf folder in the temporary directory if it can't be written.
+
+    Example:
+    interpolA, IVArray, beta_voc_all, m_all, bee_all = loadBilinearInterpolationParams('Yingli')
+    '''
+    params = _BILINEAR_PARAMS.get(name)
+    if params is None:
+        try:
+            entry = _BILINEAR_REGISTRY[name]
+        except KeyError:
+            raise ValueError("No bilinear interpolation parameters registered as %r. Registered: %s"
+                             % (name, ', '.join(sorted(_BILINEAR_REGISTRY))))
+        IVArray, = _loadMatAsNpy(entry['IVArrayfile'], ['IVArray'], cachedir)
+        beta_voc_all, m_all, bee_all = _loadMatAsNpy(entry['paramsfile'], ['beta_voc_all', 'm_all', 'bee_all'], cachedir)
+        params = (entry['interpolA'], IVArray, beta_voc_all, m_all, bee_all)
+        _BILINEAR_PARAMS[name] = params
+    return params
+
 
 def setupforBilinearInterpolation(BilInterpolParams=None):
     r'''Reads dictionary and assigns values. Also calcualtes the center location
     of the sensors in case the number of sensors is more than the number
     of cells-rows required by the bilinear interpolation routine (6 for landscape)
+
+    BilInterpolParams can also be the name of registered parameters (see
+    registerBilinearInterpolationParams); None uses the bundled 'Yingli' parameters.
     
     Example:
     cellCenterBI, interpolA, IVArray, beta_voc_all, m_all, bee_all = setupforBilinearInterpolation(portraitorlandscape='landscape', sensorsy=100, BilInterpolParams=None)
-   
-    NOTE: portrait mode not working yet, will run everything on landscape!!
-    #2DO #TODO #FIX
+
     '''
     
+    if BilInterpolParams is None:
+        return loadBilinearInterpolationParams('Yingli')
+    if isinstance(BilInterpolParams, str):
+        return loadBilinearInterpolationParams(BilInterpolParams)
     try:
         interpolA = BilInterpolParams.interpolA
         IVArray = BilInterpolParams.IVArray
@@ -33,128 +130,868 @@ def setupforBilinearInterpolation(BilInterpolParams=None):
         m_all = BilInterpolParams.m_all
         bee_all = BilInterpolParams.bee_all
     except:
-        # Try to load bilinear interpolation params dictionary from \BF_BifacialIrradiances\BilinearInterpParams
-        print("Warning: BilInterpolParams dictionary is None OR is wrongly defined. Using default values for Bilintear Interpolation routine")
-        currentdir =  os.path.abspath(os.path.dirname(__file__))
-
-        mat_contents = sio.loadmat(os.path.join(currentdir,'BF_BifacialIrradiances','BilinearInterpParams','IVArrayYingli.mat'))
-        IVArray=mat_contents['IVArray']        
-        mat_contents = sio.loadmat(os.path.join(currentdir,'BF_BifacialIrradiances','BilinearInterpParams','newBilinearParamsYingli.mat'))
-        beta_voc_all=mat_contents['beta_voc_all']        
-        m_all=mat_contents['m_all']
-        bee_all=mat_contents['bee_all']
-        interpolA = 0.005  # More accurate interpolation. Do 0.01 as an option.
+        print("Warning: BilInterpolParams dictionary is wrongly defined. Using default values for Bilintear Interpolation routine")
+        return loadBilinearInterpolationParams('Yingli')
         
     return interpolA, IVArray, beta_voc_all, m_all, bee_all      
 
+class ModuleLayout(object):
+    r''' Cell placement and electrical connectivity of a module for PVMismatch,
+    built once when the layout is registered (see registerModuleLayout).
+
+    The cells are in nrows rows (along the module chord in portrait) and in
+    columns, numbered down the first column and up the next one. The bypass
+    diode substrings take substringColumns columns each. In half-cut modules
+    the upper and lower halves of every substring are two strings of half
+    cells in parallel, and the cells have half the area of the PVMismatch
+    default cell.
+
+    Parameters
+    ----------
+    nrows : int
+        Number of rows of cells in portrait.
+    substringColumns : list of int
+        Number of columns of cells of each bypass diode substring.
+    halfcut : bool
+        True for half-cut cells, with the two halves of each substring in parallel.
+
+    Attributes: numcells, stdpl (cell indices [nrows x columns], portrait),
+    cell_pos (PVMismatch cell_pos of the module).
+
+    Example:
+    layout = ModuleLayout(nrows=20, substringColumns=[2, 2, 2], halfcut=True)
+    stdpl, cellsx, cellsy = layout.placement('landscape')
+    '''
+
+    def __init__(self, nrows, substringColumns, halfcut=False):
+        if halfcut and nrows % 2:
+            raise ValueError("Half-cut modules need an even number of rows")
+        self.nrows = nrows
+        self.substringColumns = list(substringColumns)
+        self.halfcut = halfcut
+        ncolumns = sum(self.substringColumns)
+        self.numcells = nrows * ncolumns
+        self.stdpl = np.array([[column * nrows + (row if column % 2 == 0 else nrows - 1 - row)
+                                for column in range(ncolumns)] for row in range(nrows)])
+
+        # PVMismatch cell_pos: substrings of columns of cells in series. The
+        # halves of a half-cut substring are columns joined (crosstied) only
+        # at their first cell, which PVMismatch combines in parallel.
+        halves = [range(nrows // 2), range(nrows // 2, nrows)] if halfcut else [range(nrows)]
+        self.cell_pos = []
+        first = 0
+        for columns in self.substringColumns:
+            substring = []
+            for half in halves:
+                rows = [(row, column) for column in range(first, first + columns)
+                        for row in (half if (column - first) % 2 == 0 else reversed(half))]
+                if halfcut:
+                    substring.append([{'crosstie': i == 0, 'idx': int(self.stdpl[row, column])}
+                                      for i, (row, column) in enumerate(rows)])
+                else:
+                    substring += [[{'crosstie': False, 'idx': int(self.stdpl[row, column])} for row in half]
+                                  for column in range(first, first + columns)]
+            self.cell_pos.append(substring)
+            first += columns
+
+    def placement(self, portraitorlandscape):
+        ''' stdpl, cellsx, cellsy of the module in 'portrait' or 'landscape',
+        None if portraitorlandscape is neither '''
+        if portraitorlandscape == 'portrait':
+            stdpl = self.stdpl
+        elif portraitorlandscape == 'landscape':
+            stdpl = self.stdpl.transpose()
+        else:
+            return None
+        return stdpl, stdpl.shape[1], stdpl.shape[0]
+
+    def pvmodule(self):
+        ''' New PVMismatch PVmodule of the layout, with the default PVMismatch
+        cells (half the area for half-cut cells) '''
+        from pvmismatch.pvmismatch_lib import pvcell, pvmodule
+        if self.halfcut:
+            cell = pvcell.PVcell(Rs=pvcell.RS * 2, Rsh=pvcell.RSH * 2, Isat1_T0=pvcell.ISAT1_T0 / 2,
+                                 Isat2_T0=pvcell.ISAT2_T0 / 2, Isc0_T0=pvcell.ISC0_T0 / 2)
+            return pvmodule.PVmodule(cell_pos=self.cell_pos, pvcells=[cell] * self.numcells)
+        return pvmodule.PVmodule(cell_pos=self.cell_pos)
+
+
+# Module layouts by number of cells
+_MODULE_LAYOUTS = {}
+
+
+def registerModuleLayout(numcells, nrows, substringColumns, halfcut=False):
+    r'''Registers the ModuleLayout of modules with numcells cells, used by
+    setupforPVMismatch, MismatchEvaluator and analyseVFResultsPVMismatch.
+
+    Example:
+    registerModuleLayout(108, nrows=18, substringColumns=[2, 2, 2], halfcut=True)
+    '''
+    layout = ModuleLayout(nrows, substringColumns, halfcut=halfcut)
+    if layout.numcells != numcells:
+        raise ValueError("The layout has {} cells, not {}".format(layout.numcells, numcells))
+    _MODULE_LAYOUTS[numcells] = layout
+    return layout
+
+
+registerModuleLayout(60, 10, [2, 2, 2])
+registerModuleLayout(66, 11, [2, 2, 2])
+registerModuleLayout(72, 12, [2, 2, 2])
+registerModuleLayout(96, 12, [2, 4, 2])
+registerModuleLayout(120, 20, [2, 2, 2], halfcut=True)
+registerModuleLayout(144, 24, [2, 2, 2], halfcut=True)
+
+
+def getModuleLayout(numcells):
+    r''' Registered ModuleLayout of modules with numcells cells, ValueError if
+    there is none '''
+    if numcells not in _MODULE_LAYOUTS:
+        raise ValueError("No module layout registered for {} cells, registered: {}".format(
+            numcells, sorted(_MODULE_LAYOUTS)))
+    return _MODULE_LAYOUTS[numcells]
+
+
 def setupforPVMismatch(portraitorlandscape, sensorsy, numcells=72):
     r''' Sets values for calling PVMismatch, for ladscape or portrait modes and 
+    the registered module layout of numcells cells (see registerModuleLayout:
+    60, 66, 72, 96, and 120 and 144 half-cut cells are registered)
     
     Example:
     cellCenterPVM, stdpl, cellsx, cellsy = setupforPVMismatch(portraitorlandscape='portrait', sensorsy=100, numcells=72):
     '''
     
-    # cell placement for 'portrait'.
-    if numcells == 72:
-        stdpl=np.array([[0,	23,	24,	47,	48,	71],
-        [1,	22,	25,	46,	49,	70],
-        [2,	21,	26,	45,	50,	69],
-        [3,	20,	27,	44,	51,	68],
-        [4,	19,	28,	43,	52,	67],
-        [5,	18,	29,	42,	53,	66],
-        [6,	17,	30,	41,	54,	65],
-        [7,	16,	31,	40,	55,	64],
-        [8,	15,	32,	39,	56,	63],
-        [9,	14,	33,	38,	57,	62],
-        [10,	13,	34,	37,	58,	61],
-        [11,	12,	35,	36,	59,	60]])
-    
-    elif numcells == 96:
-        stdpl=np.array([[0,	23,	24,	47,	48,	71,	72,	95],
-            [1,	22,	25,	46,	49,	70,	73,	94],
-            [2,	21,	26,	45,	50,	69,	74,	93],
-            [3,	20,	27,	44,	51,	68,	75,	92],
-            [4,	19,	28,	43,	52,	67,	76,	91],
-            [5,	18,	29,	42,	53,	66,	77,	90],
-            [6,	17,	30,	41,	54,	65,	78,	89],
-            [7,	16,	31,	40,	55,	64,	79,	88],
-            [8,	15,	32,	39,	56,	63,	80,	87],
-            [9,	14,	33,	38,	57,	62,	81,	86],
-            [10,	13,	34,	37,	58,	61,	82,	85],
-            [11,	12,	35,	36,	59,	60,	83,	84]])
-    else:
-        print("Error. Only 72 and 96 cells modules supported at the moment. Change numcells to either of this options!")
+    if numcells not in _MODULE_LAYOUTS:
+        print("Error. No module layout registered for {} cells. Registered: {}".format(numcells, sorted(_MODULE_LAYOUTS)))
         return
     
-    if portraitorlandscape == 'landscape':
-        stdpl = stdpl.transpose()
-    elif portraitorlandscape != 'portrait':
+    placement = _MODULE_LAYOUTS[numcells].placement(portraitorlandscape)
+    if placement is None:
         print("Error. portraitorlandscape variable must either be 'landscape' or 'portrait'")
         return
     
-    cellsx = len(stdpl[1]); cellsy = len(stdpl)
+    stdpl, cellsx, cellsy = placement
                
     return stdpl, cellsx, cellsy
 
 
+# highest irradiance [suns] of the tabulated cell IV curves of MismatchEvaluator
+_CELL_IV_MAXSUNS = 1.4
+
+class MismatchEvaluator(object):
+    r''' PVMismatch module and system built once for a module type, and reused
+    for every hour to evaluate the power of the module with averaged and with
+    detailed (mismatched) cell irradiances. Building the PVmodule calculates
+    the IV curves of all cells, which is the expensive part of a PVMismatch call.
+
+    Parameters
+    ----------
+    numcells : int
+        Number of cells of the module, with a registered ModuleLayout (60, 66,
+        72, 96, and 120 and 144 half-cut cells are registered).
+    portraitorlandscape : str
+        'portrait' or 'landscape', which defines the electrical interconnects
+        inside the module.
+    bififactor : float
+        Bifaciality factor of the module, applied to the rear irradiances.
+    pmp_cache_resolution : float or None
+        Pmp results are memoized on the cell irradiances, so hours with the
+        same pattern only need one PVMismatch solve. None (default) reuses
+        only identical patterns. A step in W/m2 quantizes the cell
+        irradiances to that step before solving, so near-identical patterns
+        also share a solve (results change by up to about half a step of
+        irradiance).
+    pmp_cache_size : int
+        Maximum number of memoized Pmp results (least recently used are
+        dropped). Hits and misses are counted in pmpCache.
+    cell_iv_resolution : float or None
+        None (default) solves the cell IV curves of every new irradiance with
+        PVMismatch. A step in W/m2 tabulates the cell IV curves once on a grid
+        of irradiances up to 1.4 suns (see cellIVTable), and the curves of the
+        cells of each hour are interpolated between the two nearest grid
+        curves and combined into the module curve with the PVMismatch series
+        and parallel routines, without building PVMismatch cells and modules.
+        Irradiances out of the grid are solved with PVMismatch. Not available
+        for half-cut modules.
+
+    Example:
+    evaluator = MismatchEvaluator(numcells=72, portraitorlandscape='landscape')
+    PowerAveraged, PowerDetailed = evaluator.evaluate(frontGTIrow, backGTIrow)
+    '''
+
+    def __init__(self, numcells=72, portraitorlandscape='landscape', bififactor=1.0,
+                 pmp_cache_resolution=None, pmp_cache_size=10000, cell_iv_resolution=None):
+        import pvmismatch
+
+        layout = setupforPVMismatch(portraitorlandscape=portraitorlandscape, sensorsy=None, numcells=numcells)
+        if layout is None:
+            raise ValueError("numcells must have a registered module layout and portraitorlandscape be 'portrait' or 'landscape'")
+        self.stdpl, self.cellsx, self.cellsy = layout
+        self.numcells = numcells
+        self.portraitorlandscape = portraitorlandscape
+        self.bififactor = bififactor
+        self.layout = getModuleLayout(numcells)
+        if cell_iv_resolution is not None and self.layout.halfcut:
+            raise ValueError("cell_iv_resolution is not available for half-cut modules")
+
+        cell_pos = self.layout.cell_pos
+        self.pvmod = self.layout.pvmodule()
+        self.pvsys = pvmismatch.pvsystem.PVsystem(numberStrs=1, numberMods=1, pvmods=self.pvmod)
+
+        self.pmp_cache_resolution = pmp_cache_resolution
+        self.pmpCache = LRUCache(maxsize=pmp_cache_size)
+        self.cell_iv_resolution = cell_iv_resolution
+        self._cellIVTables = {}
+        # cells of each bypass diode substring, in series
+        self._substringCells = [np.array([cell['idx'] for column in substring for cell in column])
+                                for substring in cell_pos]
+
+    def cellSuns(self, frontGTIrow, backGTIrow):
+        ''' Returns the averaged and detailed cell irradiances (in suns, with
+        the rear irradiance times bififactor) of the sensor values along the
+        module, resampled to the cell rows if needed '''
+        cellCenterValFront = _cellCenterValues(np.asarray(frontGTIrow, dtype=float)[None, :], self.cellsy)[0]
+        cellCenterValBack = _cellCenterValues(np.asarray(backGTIrow, dtype=float)[None, :], self.cellsy)[0]
+
+        cellCenterValues_FrontPlusBack = (cellCenterValFront + cellCenterValBack * self.bififactor) / 1000
+
+        array_det = np.outer(cellCenterValues_FrontPlusBack, np.ones(self.cellsx))
+        array_avg = np.ones([self.cellsy, self.cellsx]) * np.mean(cellCenterValues_FrontPlusBack)
+        return array_avg, array_det
+
+    def pmp(self, cellsuns, stdpl=None):
+        ''' Maximum power of the module with cellsuns [cellsy x cellsx],
+        memoized on the (quantized) cell irradiances. stdpl is the cell index
+        at each position of cellsuns, the layout placement (self.stdpl) if None '''
+        cellsuns = np.asarray(cellsuns, dtype=float)
+        if stdpl is None or np.array_equal(stdpl, self.stdpl):
+            stdpl = self.stdpl
+            placementkey = None
+        else:
+            stdpl = np.asarray(stdpl)
+            placementkey = stdpl.tobytes()
+        if self.pmp_cache_resolution is not None:
+            step = self.pmp_cache_resolution / 1000.0    # W/m2 to suns
+            # irradiated cells keep at least one step: PVMismatch can't solve a module fully in the dark
+            quantized = np.where(cellsuns > 0, np.maximum(np.round(cellsuns / step), 1), 0)
+            key = (cellsuns.shape, quantized.astype(np.int64).tobytes(), placementkey)
+            cellsuns = quantized * step
+        else:
+            key = (cellsuns.shape, cellsuns.tobytes(), placementkey)
+
+        Pmp = self.pmpCache.get(key)
+        if Pmp is None:
+            if self.cell_iv_resolution is not None:
+                Pmp = self._pmpTabulated(cellsuns, stdpl)
+            else:
+                self.pvsys.setSuns({0: {0: [cellsuns, stdpl]}})
+                Pmp = self.pvsys.Pmp
+            self.pmpCache.put(key, Pmp)
+        return Pmp
+
+    def cellIVTable(self):
+        ''' Irradiance grid [suns] and cell currents and voltages [grid x IV
+        points] of the cells of the module, solved with PVMismatch once per
+        cell temperature (in 1 K bins) and kept for the next calls '''
+        pvcell = self.pvmod.pvcells[0]
+        key = int(round(float(pvcell.Tcell)))
+        if key not in self._cellIVTables:
+            step = self.cell_iv_resolution / 1000.0    # W/m2 to suns
+            grid = np.arange(1, int(np.ceil(_CELL_IV_MAXSUNS / step)) + 1) * step
+            cell = copy(pvcell)
+            Icell = np.zeros((len(grid), pvcell.Icell.size))
+            Vcell = np.zeros((len(grid), pvcell.Vcell.size))
+            for i, Ee in enumerate(grid):
+                cell.Ee = Ee
+                Icell[i], Vcell[i] = cell.Icell.flatten(), cell.Vcell.flatten()
+            self._cellIVTables[key] = (grid, Icell, Vcell)
+        return self._cellIVTables[key]
+
+    def _cellCurves(self, levels):
+        ''' Cell currents and voltages [levels x IV points] at the irradiance
+        levels [suns], interpolated on cellIVTable '''
+        grid, Itable, Vtable = self.cellIVTable()
+        i = np.clip(np.searchsorted(grid, levels) - 1, 0, len(grid) - 2)
+        w = ((levels - grid[i]) / (grid[i + 1] - grid[i]))[:, None]
+        Icell = (1 - w) * Itable[i] + w * Itable[i + 1]
+        Vcell = (1 - w) * Vtable[i] + w * Vtable[i + 1]
+        cell = copy(self.pvmod.pvcells[0])
+        for k in np.flatnonzero((levels < grid[0]) | (levels > grid[-1])):
+            cell.Ee = levels[k]
+            Icell[k], Vcell[k] = cell.Icell.flatten(), cell.Vcell.flatten()
+        return Icell, Vcell
+
+    def _pmpTabulated(self, cellsuns, stdpl):
+        ''' Maximum power of the module with cellsuns [cellsy x cellsx] at the
+        cells stdpl, as PVmodule.calcMod, PVstring.calcString and
+        PVsystem.calcSystem with the cell curves of _cellCurves '''
+        pvconst = self.pvmod.pvconst
+        pvcell = self.pvmod.pvcells[0]
+        cellEe = np.zeros(self.numcells)
+        cellEe[np.ravel(stdpl)] = np.ravel(cellsuns)
+        # every irradiance level is interpolated once, and its cells counted
+        levels, cellLevel = np.unique(cellEe, return_inverse=True)
+        Icell, Vcell = self._cellCurves(levels)
+        Isc = levels * pvcell.Isc0
+        IatVrbd = np.array([np.interp(pvcell.VRBD, V, I) for I, V in zip(Icell, Vcell)])
+
+        Isubstr, Vsubstr = [], []
+        for cells in self._substringCells:
+            counts = np.bincount(cellLevel[cells], minlength=len(levels))
+            used = np.flatnonzero(counts)
+            meanIsc = Isc[cellLevel[cells]].mean()
+            Ireverse = (IatVrbd[used].max() - meanIsc) * pvconst.Imod_pts + meanIsc
+            Iforward = (np.minimum(Icell[used].min(), 0.) - meanIsc) * pvconst.Imod_negpts + meanIsc
+            Itot = np.concatenate((Iforward, Ireverse), axis=0).flatten()
+            Vtot = np.zeros(Itot.shape)
+            for k in used:
+                Vtot += counts[k] * npinterpx(Itot, np.flipud(Icell[k]), np.flipud(Vcell[k]))
+            Vsub = np.flipud(Vtot)
+            Vsub[Vsub < self.pvmod.Vbypass] = self.pvmod.Vbypass
+            Isubstr.append(np.flipud(Itot))
+            Vsubstr.append(Vsub)
+        Isubstr, Vsubstr = np.asarray(Isubstr), np.asarray(Vsubstr)
+        Isc_substr = [np.interp(np.float64(0), Vsub, Isub) for Isub, Vsub in zip(Isubstr, Vsubstr)]
+        Imod, Vmod = pvconst.calcSeries(Isubstr, Vsubstr, np.mean(Isc_substr), Isubstr.max())
+        Istring, Vstring = pvconst.calcSeries(Imod[None, :], Vmod[None, :], cellEe.mean() * pvcell.Isc0, Imod.max())
+        Isys, Vsys = pvconst.calcParallel(Istring[None, :], Vstring[None, :], Vstring.max(), Vstring.min())
+
+        # maximum power where the central difference of dP/dV is 0, as PVsystem
+        Psys = Isys * Vsys
+        mpp = np.argmax(Psys)
+        P, V, I = Psys[mpp - 1:mpp + 2], Vsys[mpp - 1:mpp + 2], Isys[mpp - 1:mpp + 2]
+        Pv = np.diff(P) / np.diff(V)
+        Vmid = (V[1:] + V[:-1]) / 2.0
+        Imid = (I[1:] + I[:-1]) / 2.0
+        Vmp = -Pv[0] * np.diff(Vmid)[0] / np.diff(Pv)[0] + Vmid[0]
+        Imp = -Pv[0] * np.diff(Imid)[0] / np.diff(Pv)[0] + Imid[0]
+        return Imp * Vmp
+
+    def evaluate(self, frontGTIrow, backGTIrow):
+        ''' Returns PowerAveraged, PowerDetailed for one hour, 0 if the mean
+        front irradiance is below 1 W/m2 '''
+        if np.mean(frontGTIrow) < 1.0:
+            return 0, 0
+        array_avg, array_det = self.cellSuns(frontGTIrow, backGTIrow)
+        return self.pmp(array_avg), self.pmp(array_det)
+
+    def evaluate_batch(self, frontGTI, backGTI):
+        ''' evaluate for arrays of [hours x sensorsy] front and back
+        irradiances. Returns arrays of PowerAveraged and PowerDetailed '''
+        frontGTI = np.asarray(frontGTI, dtype=float)
+        backGTI = np.asarray(backGTI, dtype=float)
+        PowerAveraged = np.zeros(len(frontGTI))
+        PowerDetailed = np.zeros(len(frontGTI))
+        for i in range(len(frontGTI)):
+            PowerAveraged[i], PowerDetailed[i] = self.evaluate(frontGTI[i], backGTI[i])
+        return PowerAveraged, PowerDetailed
+
+
+_MISMATCH_EVALUATORS = {}
+
+def getMismatchEvaluator(numcells=72, portraitorlandscape='landscape', bififactor=1.0,
+                         pmp_cache_resolution=None, cell_iv_resolution=None):
+    r''' Returns the MismatchEvaluator of a module type, building it on the
+    first call for each (numcells, portraitorlandscape, bififactor,
+    pmp_cache_resolution, cell_iv_resolution) '''
+    key = (numcells, portraitorlandscape, bififactor, pmp_cache_resolution, cell_iv_resolution)
+    if key not in _MISMATCH_EVALUATORS:
+        _MISMATCH_EVALUATORS[key] = MismatchEvaluator(numcells=numcells, portraitorlandscape=portraitorlandscape,
+                                                      bififactor=bififactor,
+                                                      pmp_cache_resolution=pmp_cache_resolution,
+                                                      cell_iv_resolution=cell_iv_resolution)
+    return _MISMATCH_EVALUATORS[key]
+
+
+# number of features of MismatchSurrogate that describe the irradiance (Tamb is last)
+_SURROGATE_IRRADIANCE_FEATURES = 5
+
+
+class MismatchSurrogate(object):
+    r''' Fast model of the PVMismatch mismatch loss, fitted on a sample of
+    hours evaluated with the full model (MismatchEvaluator) and then applied
+    to all hours.
+
+    The mismatch loss (1 - PowerDetailed/PowerAveraged) is fitted with a
+    quadratic polynomial (least squares) of the cell row irradiance
+    nonuniformity: range and standard deviation of the rear irradiance and
+    standard deviation of the front irradiance (relative to the mean), rear to
+    front ratio, mean irradiance and, if passed, Tamb (PVMismatch cells are at a
+    fixed temperature, so its coefficients come out close to 0). PowerAveraged
+    only depends on the mean irradiance and is interpolated between the
+    sampled hours. Hours with irradiance features outside of the range of the
+    training hours are evaluated with the full model instead (counted in
+    fallbacks); Tamb is not checked, the full model does not depend on it.
+
+    Parameters
+    ----------
+    numcells, portraitorlandscape, bififactor :
+        Module type, as for MismatchEvaluator.
+
+    Attributes after fit
+    --------------------
+    holdout_rmse, holdout_maxerror : float
+        RMS and maximum error of the mismatch loss (fraction) on the held out
+        sample hours.
+    holdout_power_rmse : float
+        RMS of the relative error of PowerDetailed on the held out hours.
+
+    Example:
+    surrogate = MismatchSurrogate(numcells=72, portraitorlandscape='landscape').fit(frontGTI, backGTI, Tamb)
+    PowerAveraged, PowerDetailed = surrogate.evaluate_batch(frontGTI, backGTI, Tamb)
+    '''
+
+    def __init__(self, numcells=72, portraitorlandscape='landscape', bififactor=1.0):
+        self.evaluator = getMismatchEvaluator(numcells=numcells, portraitorlandscape=portraitorlandscape,
+                                              bififactor=bififactor)
+        self.coefficients = None
+        self.fallbacks = 0
+
+    def features(self, frontGTI, backGTI, Tamb=None):
+        ''' Nonuniformity features of each hour (rows) of [hours x sensorsy]
+        front and back irradiances, on the cell rows of the module '''
+        cellsy = self.evaluator.cellsy
+        front = _cellCenterValues(np.atleast_2d(np.asarray(frontGTI, dtype=float)), cellsy) / 1000
+        rear = _cellCenterValues(np.atleast_2d(np.asarray(backGTI, dtype=float)), cellsy) * self.evaluator.bififactor / 1000
+        suns = np.mean(front + rear, axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            features = [(rear.max(axis=1) - rear.min(axis=1)) / suns,
+                        rear.std(axis=1) / suns,
+                        front.std(axis=1) / suns,
+                        rear.mean(axis=1) / front.mean(axis=1),
+                        suns]
+        if Tamb is not None:
+            features.append(np.broadcast_to(np.asarray(Tamb, dtype=float), suns.shape))
+        return np.column_stack(features)
+
+    def _design(self, features):
+        ''' Quadratic polynomial terms of the standardized features '''
+        x = (features - self._center) / self._scale
+        terms = [np.ones(len(x))] + [x[:, i] for i in range(x.shape[1])]
+        terms += [x[:, i] * x[:, j] for i in range(x.shape[1]) for j in range(i, x.shape[1])]
+        return np.column_stack(terms)
+
+    def fit(self, frontGTI, backGTI, Tamb=None, nsamples=300, holdout=0.25, seed=0):
+        '''
+        Evaluates nsamples random daylight hours with the full model, front +
+        back and front only, fits the mismatch loss on all but a holdout
+        fraction of them and reports the error on the held out ones.
+        Returns the fitted surrogate.
+        '''
+        frontGTI = np.asarray(frontGTI, dtype=float)
+        backGTI = np.asarray(backGTI, dtype=float)
+        rng = np.random.default_rng(seed)
+        daylight = np.flatnonzero(np.mean(frontGTI, axis=1) >= 1.0)
+        if len(daylight) == 0:
+            raise ValueError("No daylight hours to fit the surrogate model")
+        sample = rng.choice(daylight, size=min(nsamples, len(daylight)), replace=False)
+
+        front = np.vstack([frontGTI[sample], frontGTI[sample]])
+        back = np.vstack([backGTI[sample], np.zeros(backGTI[sample].shape)])
+        Tsample = None if Tamb is None else np.tile(np.asarray(Tamb, dtype=float)[sample], 2)
+        PowerAveraged, PowerDetailed = self.evaluator.evaluate_batch(front, back)
+        features = self.features(front, back, Tsample)
+        loss = 1 - PowerDetailed / PowerAveraged
+
+        order = rng.permutation(len(loss))
+        nholdout = int(round(holdout * len(loss)))
+        test, train = order[:nholdout], order[nholdout:]
+
+        self.usesTamb = Tamb is not None
+        self._center = features[train].mean(axis=0)
+        self._scale = np.where(features[train].std(axis=0) > 0, features[train].std(axis=0), 1.0)
+        design = self._design(features[train])
+        if len(train) <= design.shape[1]:
+            raise ValueError("{} training hours can not fit the {} terms of the surrogate model, "
+                             "more daylight hours or a smaller holdout are needed".format(len(train), design.shape[1]))
+        self.coefficients = np.linalg.lstsq(design, loss[train], rcond=None)[0]
+        irradiance = features[train, :_SURROGATE_IRRADIANCE_FEATURES]
+        self.domain = (irradiance.min(axis=0), irradiance.max(axis=0))
+
+        suns = features[:, 4]
+        ordersuns = np.argsort(suns)
+        self._suns = suns[ordersuns]
+        self._PowerAveraged = PowerAveraged[ordersuns]
+
+        if nholdout:
+            error = self._predictloss(features[test]) - loss[test]
+            powererror = (PowerAveraged[test] * (1 - self._predictloss(features[test])) - PowerDetailed[test]) / PowerDetailed[test]
+            self.holdout_rmse = np.sqrt(np.mean(error**2))
+            self.holdout_maxerror = np.max(np.abs(error))
+            self.holdout_power_rmse = np.sqrt(np.mean(powererror**2))
+        else:
+            self.holdout_rmse = self.holdout_maxerror = self.holdout_power_rmse = np.nan
+        return self
+
+    def _predictloss(self, features):
+        return np.clip(self._design(features).dot(self.coefficients), 0, 1)
+
+    def evaluate_batch(self, frontGTI, backGTI, Tamb=None):
+        ''' PowerAveraged and PowerDetailed of [hours x sensorsy] front and back
+        irradiances, as MismatchEvaluator.evaluate_batch '''
+        if self.coefficients is None:
+            raise ValueError("The surrogate model must be fitted first")
+        frontGTI = np.atleast_2d(np.asarray(frontGTI, dtype=float))
+        backGTI = np.atleast_2d(np.asarray(backGTI, dtype=float))
+        features = self.features(frontGTI, backGTI, Tamb if self.usesTamb else None)
+
+        PowerAveraged = np.zeros(len(frontGTI))
+        PowerDetailed = np.zeros(len(frontGTI))
+        daylight = np.mean(frontGTI, axis=1) >= 1.0
+        irradiance = features[:, :_SURROGATE_IRRADIANCE_FEATURES]
+        indomain = daylight & np.all((irradiance >= self.domain[0]) & (irradiance <= self.domain[1]), axis=1)
+        PowerAveraged[indomain] = np.interp(features[indomain, 4], self._suns, self._PowerAveraged)
+        PowerDetailed[indomain] = PowerAveraged[indomain] * (1 - self._predictloss(features[indomain]))
+
+        outside = np.flatnonzero(daylight & ~indomain)
+        if len(outside):
+            PowerAveraged[outside], PowerDetailed[outside] = self.evaluator.evaluate_batch(frontGTI[outside], backGTI[outside])
+        self.fallbacks += len(outside)
+        return PowerAveraged, PowerDetailed
+
+
+class VectorizedMismatchEngine(object):
+    r''' Mismatch engine that evaluates all hours at once with numpy arrays,
+    as an alternative to PVMismatch (MismatchEvaluator).
+
+    The cell voltages of every cell row are solved with the diode model of the
+    PVMismatch cells (photogenerated current, two diodes, shunt resistance and
+    reverse breakdown, with the default PVMismatch cell parameters) at a grid
+    of module currents, for (hours, cell rows, currents) at once with a
+    safeguarded Newton iteration. The cells are added into the bypass diode
+    substrings of the PVMismatch module (cell_pos, with the stdpl placement of
+    setupforPVMismatch), each substring is clamped at the bypass diode
+    voltage, and the maximum power is searched on the current grid and then
+    on a finer grid around the maximum.
+
+    Accuracy against PVMismatch (Richmond, VA TMY3, 1-axis tracking, 72 cells
+    landscape, 4292 daylight hours): the annual energy differs by 0.06% and the
+    annual mismatch loss is 0.180% instead of 0.193%. Single hours differ by up
+    to 2.4% (PowerDetailed) below 50 W/m2 front irradiance, 0.7% between 50
+    and 200 W/m2 and 0.15% above. PowerAveraged differs as much, so the
+    difference comes from the discretized IV curves of PVMismatch and not from
+    the mismatch itself; other systems measured up to about 1.1% on hourly
+    PowerDetailed and 1.6% relative on the annual mismatch loss. The tests
+    allow 2%.
+    npoints above 25 does not change the results (10 points add up to 0.2
+    points of mismatch loss on single hours); the run time grows linearly
+    with npoints (1.3 s at 25, 6.3 s at 100 points for the year above).
+
+    Parameters
+    ----------
+    numcells, portraitorlandscape, bififactor :
+        Module type, as for MismatchEvaluator (not half-cut).
+    Tcell : float
+        Cell temperature [K], 298.15 as the PVMismatch default.
+    npoints : int
+        Number of module currents of the coarse and of the fine grid
+        (see the accuracy above; 25 is already converged).
+    chunksize : int
+        Number of hours evaluated together, to bound the memory use.
+
+    Example:
+    engine = VectorizedMismatchEngine(numcells=72, portraitorlandscape='landscape')
+    PowerAveraged, PowerDetailed = engine.evaluate_batch(frontGTI, backGTI)
+    '''
+
+    def __init__(self, numcells=72, portraitorlandscape='landscape', bififactor=1.0, Tcell=298.15,
+                 npoints=100, chunksize=512):
+        from pvmismatch.pvmismatch_lib import pvcell, pvmodule
+        from pvmismatch.pvmismatch_lib.pvconstants import PVconstants
+
+        layout = setupforPVMismatch(portraitorlandscape=portraitorlandscape, sensorsy=None, numcells=numcells)
+        if layout is None:
+            raise ValueError("numcells must have a registered module layout and portraitorlandscape be 'portrait' or 'landscape'")
+        if getModuleLayout(numcells).halfcut:
+            raise ValueError("Half-cut modules (strings in parallel) are not supported by the vectorized engine")
+        self.stdpl, self.cellsx, self.cellsy = layout
+        self.bififactor = bififactor
+        self.npoints = npoints
+        self.chunksize = chunksize
+
+        # number of cells of each cell row in each bypass diode substring
+        cell_pos = getModuleLayout(numcells).cell_pos
+        substringofcell = np.zeros(numcells, dtype=int)
+        for substring, columns in enumerate(cell_pos):
+            for column in columns:
+                for cell in column:
+                    substringofcell[cell['idx']] = substring
+        self.substringCells = np.zeros((len(cell_pos), self.cellsy))
+        for row in range(self.cellsy):
+            np.add.at(self.substringCells[:, row], substringofcell[self.stdpl[row]], 1)
+        self.Vbypass = pvmodule.VBYPASS
+
+        # PVMismatch default cell at Tcell
+        pvconst = PVconstants()
+        self.Rs = pvcell.RS
+        self.Rsh = pvcell.RSH
+        self.Vt = pvconst.k * Tcell / pvconst.q
+        Tstar = Tcell ** 3. / pvconst.T0 ** 3.
+        inv_delta_T = 1. / pvconst.T0 - 1. / Tcell
+        self.Isat1 = pvcell.ISAT1_T0 * Tstar * np.exp(pvcell.EG * pvconst.q / pvconst.k * inv_delta_T)
+        self.Isat2 = pvcell.ISAT2_T0 * Tstar * np.exp(pvcell.EG * pvconst.q / (2.0 * pvconst.k) * inv_delta_T)
+        self.Isc0 = pvcell.ISC0_T0 * (1. + pvcell.ALPHA_ISC * (Tcell - pvconst.T0))
+        self.Isc0_T0 = pvcell.ISC0_T0
+        self.aRBD, self.bRBD, self.VRBD, self.nRBD = pvcell.ARBD, pvcell.BRBD, pvcell.VRBD_, pvcell.NRBD
+
+    def Igen(self, suns):
+        ''' Photogenerated current of cells at suns, 0 without irradiance '''
+        Isc = suns * self.Isc0
+        Vdiode_sc = Isc * self.Rs
+        Idiode_sc = (self.Isat1 * (np.exp(Vdiode_sc / self.Vt) - 1.) + self.Isat2 * (np.exp(Vdiode_sc / 2. / self.Vt) - 1.)
+                     + Vdiode_sc / self.Rsh)
+        return Isc + Idiode_sc
+
+    def _cellCurrent(self, Vdiode, Igen):
+        ''' Cell current, breakdown current and their derivatives at the diode voltages '''
+        exp1 = self.Isat1 * np.exp(Vdiode / self.Vt)
+        exp2 = self.Isat2 * np.exp(Vdiode / 2. / self.Vt)
+        fRBD = 1. - Vdiode / self.VRBD
+        u = Vdiode / self.Rsh / self.Isc0_T0
+        gRBD = self.Isc0_T0 * fRBD ** (-self.nRBD)
+        IRBD = (self.aRBD * u + self.bRBD * u ** 2) * gRBD
+        dIRBD = ((self.aRBD + 2 * self.bRBD * u) / self.Rsh * fRBD ** (-self.nRBD)
+                 + (self.aRBD * u + self.bRBD * u ** 2) * gRBD * self.nRBD / self.VRBD / fRBD)
+        Icell = Igen - (exp1 - self.Isat1) - (exp2 - self.Isat2) - Vdiode / self.Rsh - IRBD
+        dIcell = -exp1 / self.Vt - exp2 / 2. / self.Vt - 1. / self.Rsh - dIRBD
+        return Icell, dIcell, IRBD, dIRBD
+
+    def cellVoltage(self, Igen, Imod, iterations=60, tol=1e-9):
+        ''' Voltages of cells with photogenerated currents Igen at the module
+        currents Imod (broadcast together) '''
+        Igen, Imod = np.broadcast_arrays(Igen, Imod)
+        # the cell current decreases with the diode voltage: the root is
+        # between the breakdown voltage and the diode voltage that drives
+        # Igen - Imod through the first diode alone
+        lo = np.full(Igen.shape, self.VRBD * (1 - 1e-12))
+        hi = self.Vt * np.log1p(np.maximum(Igen - Imod, 0) / self.Isat1)
+        Vdiode = hi.copy()
+        for _ in range(iterations):
+            Icell, dIcell, IRBD, dIRBD = self._cellCurrent(Vdiode, Igen)
+            residual = Icell - Imod
+            lo = np.where(residual > 0, Vdiode, lo)
+            hi = np.where(residual < 0, Vdiode, hi)
+            # in reverse bias the breakdown current -IRBD balances the rest:
+            # the log of their ratio is close to linear in the log of the
+            # distance to the breakdown voltage, so Newton steps there
+            balance = -IRBD - residual
+            uselog = (Vdiode < 0) & (IRBD < 0) & (balance > 0)
+            with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+                fRBD = 1. - Vdiode / self.VRBD
+                ratio = np.log(-IRBD) - np.log(balance)
+                dratio = (dIRBD / IRBD + (dIcell + dIRBD) / balance) * -self.VRBD * fRBD
+                newton = np.where(uselog,
+                                  self.VRBD * (1. - fRBD * np.exp(-ratio / dratio)),
+                                  Vdiode - residual / dIcell)
+            Vnext = np.where((newton >= lo) & (newton <= hi), newton, (lo + hi) / 2)
+            converged = np.max(np.abs(Vnext - Vdiode)) < tol
+            Vdiode = Vnext
+            if converged:
+                break
+        return Vdiode - Imod * self.Rs
+
+    def moduleVoltage(self, suns, Imod, substringCells):
+        ''' Module voltages at the module currents Imod [hours x currents] of
+        cell rows with irradiances suns [hours x rows], with substringCells
+        cells of each row in each substring '''
+        Vcell = self.cellVoltage(self.Igen(suns)[:, :, None], Imod[:, None, :])
+        Vsubstring = np.einsum('kr,trc->tkc', substringCells, Vcell)
+        return np.maximum(Vsubstring, self.Vbypass).sum(axis=1)
+
+    def pmp(self, suns, substringCells):
+        ''' Maximum power of the module for each hour of cell row
+        irradiances suns [hours x rows] '''
+        hours = np.arange(len(suns))
+        Imax = self.Igen(suns).max(axis=1)
+        Imod = Imax[:, None] * np.linspace(0, 1, self.npoints)
+        Pmod = Imod * self.moduleVoltage(suns, Imod, substringCells)
+        k = np.clip(np.argmax(Pmod, axis=1), 1, self.npoints - 2)
+        # finer grid between the neighbours of the maximum
+        Imod = Imod[hours, k - 1][:, None] + (Imod[hours, k + 1] - Imod[hours, k - 1])[:, None] * np.linspace(0, 1, self.npoints)
+        Pmod = Imod * self.moduleVoltage(suns, Imod, substringCells)
+        return Pmod.max(axis=1)
+
+    def evaluate_batch(self, frontGTI, backGTI):
+        ''' PowerAveraged and PowerDetailed for arrays of [hours x sensorsy]
+        front and back irradiances, 0 for hours with mean front irradiance
+        below 1 W/m2 '''
+        frontGTI = np.atleast_2d(np.asarray(frontGTI, dtype=float))
+        backGTI = np.atleast_2d(np.asarray(backGTI, dtype=float))
+        PowerAveraged = np.zeros(len(frontGTI))
+        PowerDetailed = np.zeros(len(frontGTI))
+        daylight = np.flatnonzero(np.mean(frontGTI, axis=1) >= 1.0)
+        for start in range(0, len(daylight), self.chunksize):
+            rows = daylight[start:start + self.chunksize]
+            suns = (_cellCenterValues(frontGTI[rows], self.cellsy)
+                    + _cellCenterValues(backGTI[rows], self.cellsy) * self.bififactor) / 1000
+            PowerDetailed[rows] = self.pmp(suns, self.substringCells)
+            PowerAveraged[rows] = self.pmp(suns.mean(axis=1, keepdims=True),
+                                           self.substringCells.sum(axis=1, keepdims=True))
+        return PowerAveraged, PowerDetailed
+
+    def evaluate(self, frontGTIrow, backGTIrow):
+        ''' PowerAveraged, PowerDetailed for one hour '''
+        PowerAveraged, PowerDetailed = self.evaluate_batch([frontGTIrow], [backGTIrow])
+        return PowerAveraged[0], PowerDetailed[0]
+
+
+class StringMismatchEvaluator(object):
+    r''' String and inverter level mismatch of the modules of an inverter
+    block, with the modules in rows of different types ('first', 'interior',
+    'last') which see different irradiances.
+
+    For each hour the module voltages are solved once per row type with
+    VectorizedMismatchEngine, at module currents shared by all modules, and
+    every string is the sum of the modules of its row types in series. Strings
+    with the same number of modules of each row type are solved once. The
+    strings of the inverter are in parallel: their currents are added at the
+    voltages of the string curves, which are interpolated linearly.
+
+    Parameters
+    ----------
+    strings : list of dict
+        Number of modules of each row type in each string of the inverter,
+        for example [{'first': 10, 'interior': 10}, {'interior': 20}]. See
+        stringLayout.
+    numcells, portraitorlandscape, bififactor, npoints :
+        Module type and number of currents, as for VectorizedMismatchEngine.
+    chunksize : int
+        Number of hours evaluated together, to bound the memory use.
+
+    Example:
+    evaluator = StringMismatchEvaluator(stringLayout(20, 4, rows=4))
+    PowerAveraged, PowerModules, PowerStrings, PowerInverter = evaluator.evaluate_batch(
+        {'first': frontGTIfirst, 'interior': frontGTIinterior, 'last': frontGTIlast},
+        {'first': backGTIfirst, 'interior': backGTIinterior, 'last': backGTIlast})
+    '''
+
+    def __init__(self, strings, numcells=72, portraitorlandscape='landscape', bififactor=1.0, npoints=100,
+                 chunksize=128):
+        self.engine = VectorizedMismatchEngine(numcells=numcells, portraitorlandscape=portraitorlandscape,
+                                               bififactor=bififactor, npoints=npoints)
+        self.rowTypes = []
+        for string in strings:
+            self.rowTypes += [rowType for rowType in string if rowType not in self.rowTypes]
+        counts = np.array([[string.get(rowType, 0) for rowType in self.rowTypes] for string in strings], dtype=float)
+        # identical strings are solved once and counted with their multiplicity
+        self.stringCounts, self.stringMultiplicity = np.unique(counts, axis=0, return_counts=True)
+        self.moduleCounts = counts.sum(axis=0)
+        self.chunksize = chunksize
+
+    def evaluate_batch(self, frontGTI, backGTI):
+        ''' PowerAveraged, PowerModules, PowerStrings and PowerInverter of the
+        inverter for dicts of [hours x sensorsy] front and back irradiances
+        of each row type, 0 for hours with mean front irradiance below 1 W/m2.
+
+        PowerAveraged: all the modules at the average cell irradiance.
+        PowerModules: every module at its own maximum power point.
+        PowerStrings: every string at its own maximum power point.
+        PowerInverter: all the strings in parallel at a single voltage.
+        '''
+        engine = self.engine
+        suns = np.stack([(_cellCenterValues(np.atleast_2d(np.asarray(frontGTI[rowType], dtype=float)), engine.cellsy)
+                          + _cellCenterValues(np.atleast_2d(np.asarray(backGTI[rowType], dtype=float)), engine.cellsy)
+                          * engine.bififactor) / 1000 for rowType in self.rowTypes], axis=1)
+        modules = self.moduleCounts
+        results = np.zeros((4, len(suns)))
+        daylight = np.flatnonzero(np.mean(suns, axis=2).dot(modules) / modules.sum() * 1000 >= 1.0)
+        for start in range(0, len(daylight), self.chunksize):
+            rows = daylight[start:start + self.chunksize]
+            results[:, rows] = self._evaluateChunk(suns[rows])
+        return tuple(results)
+
+    def _evaluateChunk(self, suns):
+        ''' The four powers for suns [hours x row types x cell rows] '''
+        engine = self.engine
+        substringCells = engine.substringCells
+        hours = np.arange(len(suns))
+        npoints = engine.npoints
+        counts, multiplicity, modules = self.stringCounts, self.stringMultiplicity, self.moduleCounts
+
+        meansuns = np.mean(suns, axis=2).dot(modules) / modules.sum()
+        PowerAveraged = engine.pmp(meansuns[:, None], substringCells.sum(axis=1, keepdims=True)) * modules.sum()
+        PowerModules = sum(engine.pmp(suns[:, r], substringCells) * modules[r] for r in range(len(modules)))
+
+        # string curves on a grid of currents shared by all the modules, and
+        # on finer grids (a quarter of the points) around the maximum power
+        # of every string
+        Imax = engine.Igen(suns).max(axis=(1, 2))
+        Icoarse = Imax[:, None] * np.linspace(0, 1, npoints)
+        Vstring = np.einsum('ur,hrn->hun', counts, self._moduleVoltages(suns, Icoarse))
+        k = np.clip(np.argmax(Icoarse[:, None, :] * Vstring, axis=2), 1, npoints - 2)
+        Ifine = (Icoarse[hours[:, None], k - 1][:, :, None] + (Icoarse[hours[:, None], k + 1] -
+                 Icoarse[hours[:, None], k - 1])[:, :, None] * np.linspace(0, 1, npoints // 4)).reshape(len(suns), -1)
+        Imod = np.concatenate([Icoarse, Ifine], axis=1)
+        Vstring = np.concatenate([Vstring, np.einsum('ur,hrn->hun', counts, self._moduleVoltages(suns, Ifine))], axis=2)
+        order = np.argsort(Imod, axis=1)
+        Imod = Imod[hours[:, None], order]
+        Vstring = Vstring[hours[:, None, None], np.arange(len(counts))[None, :, None], order[:, None, :]]
+        # the voltage can't increase with the current
+        Vstring = np.minimum.accumulate(Vstring, axis=2)
+        PowerStrings = (Imod[:, None, :] * Vstring).max(axis=2).dot(multiplicity)
+
+        # strings in parallel: total current at the voltages of all the curves
+        PowerInverter = np.zeros(len(suns))
+        for hour in hours:
+            Vinverter = Vstring[hour][Vstring[hour] >= 0]
+            Iinverter = sum(np.interp(Vinverter, Vstring[hour, u, ::-1], Imod[hour, ::-1])
+                            * multiplicity[u] for u in range(len(counts)))
+            PowerInverter[hour] = np.max(Vinverter * Iinverter, initial=0)
+        return PowerAveraged, PowerModules, PowerStrings, PowerInverter
+
+    def _moduleVoltages(self, suns, Imod):
+        ''' Module voltages [hours x row types x currents] at the module
+        currents Imod [hours x currents] '''
+        return np.stack([self.engine.moduleVoltage(suns[:, r], Imod, self.engine.substringCells)
+                         for r in range(suns.shape[1])], axis=1)
+
+
 def calculateVFPVMismatch(stdpl, cellsx, cellsy, sensorsy, frontGTIrow, backGTIrow, bififactor=1.0, debug=False, plotflag=False):
     r''' calls PVMismatch with all the pre-generated values on view factor.
     
     Inputs:
+    stdpl: cell index of each cell position [cellsy x cellsx], as returned by setupforPVMismatch.
+           A different placement of the cells of the module (for example flipped) is passed to PVMismatch as is.
     bififactor: bifaciality factor of the module. Max 1.0. ALL Rear irradiance values saved include the bifi-factor.
 
+    The PVMismatch module and system are built once per module type (numcells =
+    cellsx*cellsy, portrait if cellsy > cellsx, bififactor) with getMismatchEvaluator
+    and reused by later calls. The electrical interconnects of the module are the ones of the
+    registered module layout, and stdpl places its cells.
+
     Example:
     PowerAveraged, PowerDetailed = calculateVFPVMismatch(stdpl, cellsy, cellsx, sensorsy, frontGTIrow, backGTIrow, bififactor)
     
     '''
-    import pvmismatch
-    
+    if cellsx*cellsy not in _MODULE_LAYOUTS:
+        print("Error. No module layout registered for {} cells. Registered: {}".format(cellsx*cellsy, sorted(_MODULE_LAYOUTS)))
+        return
+    # the module and system are built once per module type and reused
+    evaluator = getMismatchEvaluator(numcells=cellsx*cellsy,
+                                     portraitorlandscape='portrait' if cellsy > cellsx else 'landscape',
+                                     bififactor=bififactor)
+    stdpl = np.asarray(stdpl)
+    if stdpl.shape != (evaluator.cellsy, evaluator.cellsx) or \
+            not np.array_equal(np.sort(stdpl, axis=None), np.arange(evaluator.numcells)):
+        print("Error. stdpl must place each of the {} cells once in {} rows and {} columns".format(
+            evaluator.numcells, evaluator.cellsy, evaluator.cellsx))
+        return
+
     if np.mean(frontGTIrow) < 1.0:
         PowerAveraged = 0
         PowerDetailed = 0
-    else:                
-        if cellsx*cellsy == 72:
-            cell_pos = pvmismatch.pvmismatch_lib.pvmodule.STD72
-        elif cellsx*cellsy == 96:
-            cell_pos = pvmismatch.pvmismatch_lib.pvmodule.STD96
-        else:
-            print("Error. Only 72 and 96 cells modules supported at the moment. Change numcells to either of this options!")
-            return
-        
-        pvmod=pvmismatch.pvmismatch_lib.pvmodule.PVmodule(cell_pos=cell_pos)
-        pvsys = pvmismatch.pvsystem.PVsystem(numberStrs=1, numberMods=1, pvmods=pvmod)  
-        # makes the system  # 1 module, in portrait mode. 
-        
-        
-        # 2DO: Improve this Sampling downsampling routines.
-        
-        if sensorsy != cellsy:                        
-            cellCenterValFront= np.interp(np.linspace(0, (sensorsy-1), cellsy), list(range(0,sensorsy)), frontGTIrow)
-            cellCenterValBack= np.interp(np.linspace(0, (sensorsy-1), cellsy), list(range(0,sensorsy)), backGTIrow)
-        else:
-            cellCenterValFront = frontGTIrow
-            cellCenterValBack = backGTIrow
+    else:
+        array_avg, array_det = evaluator.cellSuns(frontGTIrow, backGTIrow)
 
-        cellCenterValues_FrontPlusBack = [(x+y*bififactor)/1000 for x,y in zip(cellCenterValFront,cellCenterValBack)]
-        
-        # New section from bifacial_radiance optimized
-        G=np.array([cellCenterValues_FrontPlusBack]).transpose()
-        H = np.ones([1,cellsx]) 
-        array_det = np.dot(G,H) 
-        array_avg = np.ones([cellsy,cellsx])*(np.mean(cellCenterValues_FrontPlusBack))        
-        
         # Actually do calculations
-        pvsys.setSuns({0: {0: [array_avg, stdpl]}})
-        PowerAveraged=pvsys.Pmp
-        
+        PowerAveraged = evaluator.pmp(array_avg, stdpl)
+
         if plotflag:
-            pvsys.plotSys()                         
+            evaluator.pvsys.plotSys()
+
+        PowerDetailed = evaluator.pmp(array_det, stdpl)
 
-        pvsys.setSuns({0: {0: [array_det, stdpl]}})
-        PowerDetailed=pvsys.Pmp        
-        
         if plotflag:
-            pvsys.plotSys()   
+            evaluator.pvsys.plotSys()
     
     if debug:          
         return PowerAveraged, PowerDetailed, array_avg, array_det
@@ -169,28 +1006,161 @@ def calculateVFBilinearInterpolation(portraitorlandscape, sensorsy, interpolA, I
 
     '''    
     
-    cellsy = 6
-    
-    if portraitorlandscape=='portrait':
-        print("Bilinear Itnerpolation portrait not supported yet, sorry!")
-        return
-    
-    if portraitorlandscape=='landscape':
-        
-        if sensorsy != cellsy:                        
-            cellCenterValFront= np.interp(np.linspace(0, (sensorsy-1), cellsy), list(range(0,sensorsy)), frontGTIrow)
-            cellCenterValBack= np.interp(np.linspace(0, (sensorsy-1), cellsy), list(range(0,sensorsy)), backGTIrow)
-        else:
-            cellCenterValFront = frontGTIrow
-            cellCenterValBack = backGTIrow
-            
-        [PmaxIdeal, PmaxUnmatched, PmaxAvg] = bifacialvf.LandscapeSingleHour(cellCenterValFront, cellCenterValBack, Tamb, VWind, 6, interpolA,IVArray,beta_voc_all,m_all,bee_all)
+    cellsy = _bilInterpolCellsy(portraitorlandscape)
 
+    if sensorsy != cellsy:                        
+        cellCenterValFront = _cellCenterValues(np.asarray(frontGTIrow, dtype=float)[None, :], cellsy)[0]
+        cellCenterValBack = _cellCenterValues(np.asarray(backGTIrow, dtype=float)[None, :], cellsy)[0]
+    else:
+        cellCenterValFront = frontGTIrow
+        cellCenterValBack = backGTIrow
+        
+    if portraitorlandscape=='landscape':
+        [PmaxIdeal, PmaxUnmatched, PmaxAvg] = bifacialvf.LandscapeSingleHour(cellCenterValFront, cellCenterValBack, Tamb, VWind, cellsy, interpolA,IVArray,beta_voc_all,m_all,bee_all)
+    else:
+        [PmaxIdeal, PmaxUnmatched, PmaxAvg] = bifacialvf.PortraitSingleHour(cellCenterValFront, cellCenterValBack, Tamb, VWind, cellsy, interpolA,IVArray,beta_voc_all,m_all,bee_all)
         
     return PmaxIdeal, PmaxUnmatched
 
 
-def analyseVFResultsBilInterpol(filename, portraitorlandscape='landscape', bififactor=1.0, BilInterpolParams=None, writefilename=None):
+def _bilInterpolCellsy(portraitorlandscape):
+    ''' Number of cell groups of the bilinear interpolation routines: 6 cell
+    rows in landscape (2 per bypass diode), 12 in portrait (72 cell module) '''
+    if portraitorlandscape == 'landscape':
+        return 6
+    if portraitorlandscape == 'portrait':
+        return 12
+    raise ValueError("portraitorlandscape must be 'portrait' or 'landscape', not %r" % (portraitorlandscape,))
+
+
+# Matrices resampling the sensor values to the cell rows, by (sensorsy, cellsy)
+_RESAMPLE_MATRICES = {}
+
+def _resampleMatrix(sensorsy, cellsy):
+    ''' [cellsy x sensorsy] matrix of the linear interpolation of equally spaced
+    sensor values at equally spaced cell row centers, built once per shape '''
+    key = (sensorsy, cellsy)
+    if key not in _RESAMPLE_MATRICES:
+        cellCenters = np.linspace(0, (sensorsy-1), cellsy)
+        lower = np.clip(np.floor(cellCenters).astype(int), 0, max(sensorsy - 2, 0))
+        weight = cellCenters - lower
+        matrix = np.zeros((cellsy, sensorsy))
+        np.add.at(matrix, (np.arange(cellsy), lower), 1 - weight)
+        np.add.at(matrix, (np.arange(cellsy), np.minimum(lower + 1, sensorsy - 1)), weight)
+        _RESAMPLE_MATRICES[key] = matrix
+    return _RESAMPLE_MATRICES[key]
+
+
+def _cellCenterValues(GTI, cellsy):
+    ''' Irradiances of each hour (rows) resampled from the sensors to the
+    cellsy cell groups, as np.interp at the cell row centers '''
+    sensorsy = GTI.shape[1]
+    if sensorsy == cellsy:
+        return GTI
+    return GTI.dot(_resampleMatrix(sensorsy, cellsy).T)
+
+
+def _chunkslices(nrows, n_jobs):
+    ''' Splits nrows into consecutive chunks, a few per worker so the pool
+    stays busy when chunks take different times '''
+    nchunks = max(1, min(nrows, 4 * n_jobs))
+    bounds = np.linspace(0, nrows, nchunks + 1).astype(int)
+    return [slice(bounds[k], bounds[k+1]) for k in range(nchunks)]
+
+
+def _resolvejobs(n_jobs):
+    if n_jobs is None or n_jobs < 1:
+        return os.cpu_count() or 1
+    return n_jobs
+
+
+_BILINTERPOL_PARAMS = None
+
+def _initBilInterpolWorker(BilInterpolParams):
+    ''' Pool initializer: keeps one set of bilinear interpolation parameters
+    per worker process instead of sending them with every chunk. A registered
+    name is loaded in the worker, memory-mapping the shared .npy files '''
+    global _BILINTERPOL_PARAMS
+    if isinstance(BilInterpolParams, str):
+        BilInterpolParams = loadBilinearInterpolationParams(BilInterpolParams)
+    _BILINTERPOL_PARAMS = BilInterpolParams
+
+
+def _bilInterpolChunk(args):
+    ''' PmaxIdeal and PmaxUnmatched of LandscapeSingleHour or PortraitSingleHour
+    for a chunk of hours, front + back and front only, all hours at once with
+    LandscapeBatch or PortraitBatch '''
+    portraitorlandscape, frontGTI, backGTI, Tamb, VWind, BilInterpolParams = args
+    if BilInterpolParams is None:
+        BilInterpolParams = _BILINTERPOL_PARAMS
+    interpolA, IVArray, beta_voc_all, m_all, bee_all = BilInterpolParams
+
+    cellsy = _bilInterpolCellsy(portraitorlandscape)
+    if portraitorlandscape == 'landscape':
+        batch = bifacialvf.LandscapeBatch(interpolA, IVArray, beta_voc_all, m_all, bee_all)
+    else:
+        batch = bifacialvf.PortraitBatch(interpolA, IVArray, beta_voc_all, m_all, bee_all)
+    cellCenterValFront = _cellCenterValues(frontGTI, cellsy)
+    PmaxIdeal_all, PmaxUnmatched_all, PmaxAvg_all = batch.calculate(cellCenterValFront,
+                                                                    _cellCenterValues(backGTI, cellsy),
+                                                                    Tamb, VWind, cellsy)
+    # Front only: same evaluation without the rear irradiance
+    PmaxIdeal_FrontOnly_all, PmaxUnmatched_FrontOnly_all, PmaxAvg_FrontOnly_all = batch.calculate(
+        cellCenterValFront, np.zeros(cellCenterValFront.shape), Tamb, VWind, cellsy)
+    return PmaxIdeal_all, PmaxUnmatched_all, PmaxIdeal_FrontOnly_all, PmaxUnmatched_FrontOnly_all
+
+
+def _pvMismatchChunk(args):
+    ''' Front + back and front only PVMismatch powers for a chunk of hours,
+    with the MismatchEvaluator of the worker process '''
+    numcells, portraitorlandscape, bififactor, pmp_cache_resolution, cell_iv_resolution, frontGTI, backGTI = args
+    evaluator = getMismatchEvaluator(numcells=numcells, portraitorlandscape=portraitorlandscape, bififactor=bififactor,
+                                     pmp_cache_resolution=pmp_cache_resolution, cell_iv_resolution=cell_iv_resolution)
+    hits = evaluator.pmpCache.hits; misses = evaluator.pmpCache.misses
+    PowerAveraged, PowerDetailed = evaluator.evaluate_batch(frontGTI, backGTI)
+    # Front only: same evaluation without the rear irradiance (0 for hours below 1 W/m2 on the front)
+    PowerAveraged_FrontOnly, PowerDetailed_FrontOnly = evaluator.evaluate_batch(frontGTI, np.zeros(backGTI.shape))
+    return (PowerAveraged, PowerDetailed, PowerAveraged_FrontOnly, PowerDetailed_FrontOnly,
+            evaluator.pmpCache.hits - hits, evaluator.pmpCache.misses - misses)
+
+
+# mismatch engines of analyseVFResultsPVMismatch, with the prefix of their power columns
+_MISMATCH_ENGINES = {'pvmismatch': 'PVMismatch', 'vectorized': 'Vectorized'}
+
+
+def _checkMismatchEngine(mismatch_engine, surrogate=None):
+    ''' Raises a ValueError for an unknown mismatch_engine, or a surrogate
+    with another engine than PVMismatch, which it is fitted on '''
+    if mismatch_engine not in _MISMATCH_ENGINES:
+        raise ValueError("mismatch_engine must be one of {}, not {!r}".format(sorted(_MISMATCH_ENGINES), mismatch_engine))
+    if surrogate is not None and surrogate is not False and mismatch_engine != 'pvmismatch':
+        raise ValueError("The surrogate model is fitted on PVMismatch, mismatch_engine must be 'pvmismatch'")
+
+
+def _analysisinput(filename, output_df):
+    ''' Data and metadata of the view factor results, from output_df if
+    given (no file is read) or else from the results file '''
+    if output_df is not None:
+        return output_df.copy(), {}
+    if filename is None:
+        raise ValueError("Either filename or output_df must be passed")
+    return bifacialvf.loadVFresults(filename)
+
+
+def _writeanalysisresults(data, metadata, filename, writefilename, ending):
+    ''' Writes the metadata row and the data, to writefilename or else to
+    filename with ending '''
+    if writefilename is None:
+        if filename is None:
+            raise ValueError("writefilename must be passed to write the results of an output_df")
+        writefilename=(os.path.splitext(filename)[0])+ending
+    metadata2=pd.Series(metadata).to_frame().T
+    metadata2.to_csv(writefilename,index=False)
+    data.to_csv(writefilename, mode='a', index=False, header=True)
+
+
+def analyseVFResultsBilInterpol(filename=None, portraitorlandscape='landscape', bififactor=1.0, BilInterpolParams=None, writefilename=None,
+                                n_jobs=1, output_df=None, write=True, executor='processes'):
     '''
     Opens a finished bifacialVF results file with the metadata and the irradiance
     results for Front and back in format "No_1_RowFrontGTI", detects how many
@@ -200,18 +1170,31 @@ def analyseVFResultsBilInterpol(filename, portraitorlandscape='landscape', bifif
     
     If no writefilename is passed it uses the same filename of input adding a 
     '_BilInterpol.csv' ending
+
+    Returns the results DataFrame with the power columns added.
     
     Inputs:
     bififactor: bifaciality factor of the module. Max 1.0. ALL Rear irradiance values saved include the bifi-factor.
-    portraitorlandscape: 'portrait' or 'landscape', for PVMismatch input
-                      which defines the electrical interconnects inside the module. 
+    portraitorlandscape: 'portrait' or 'landscape', which defines the electrical
+                      interconnects inside the module. The sensors are resampled to the
+                      6 (landscape) or 12 (portrait) cell rows of the module.
+    n_jobs: number of worker processes the hours are split across (in consecutive
+                      chunks, reassembled in order). 1 (default) runs in this process,
+                      None uses all processors.
+    output_df: results DataFrame returned by simulate, analysed directly instead of
+                      reading filename. Results are then only written if writefilename is passed.
+    write: False to only return the results, without writing a file.
+    executor: 'processes' (default) to split the hours across worker processes, or
+                      'threads' to split them across n_jobs threads of this process, which
+                      share the interpolation parameters (IVArray) instead of loading them
+                      in every worker. The numpy work releases the GIL.
 
     Example:
     analyseVFResultsBilInterpol(filename='Output\test.csv')
     '''
     import time
     
-    (data, metadata) = bifacialvf.loadVFresults(filename)
+    (data, metadata) = _analysisinput(filename, output_df)
 
     # Checking to see if PVMismatch has already been run:
     if 'CalculatePVOutput (PVMismatch)' in metadata:
@@ -220,8 +1203,9 @@ def analyseVFResultsBilInterpol(filename, portraitorlandscape='landscape', bifif
         else:
             metadata['CalculatePVOutput (Bilinear Interpol)'] = 'True'
 
-    print ("Warning: Bilinear Interpolation supports only Landscape mode for this release. ")    
-    portraitorlandscape='landscape'
+    _bilInterpolCellsy(portraitorlandscape)
+    if executor not in ('processes', 'threads'):
+        raise ValueError("executor must be 'processes' or 'threads'")
     metadata['PortraitorLandscape_BilInterpol'] = portraitorlandscape
  
     frontGTI = [col for col in data if col.endswith('RowFrontGTI')]
@@ -230,30 +1214,43 @@ def analyseVFResultsBilInterpol(filename, portraitorlandscape='landscape', bifif
 
     #2DO: Add reading of bififactor if it doesnt match what's on the file.
     #2DO: Multiply by bififactor here ~
-    #2DO: include resampling routnies here for frontGTI and backGTI so it matches cellsy
     
     frontGTI=data[frontGTI]
     backGTI=data[backGTI]
 
     interpolA, IVArray, beta_voc_all, m_all, bee_all = setupforBilinearInterpolation(BilInterpolParams=BilInterpolParams)
 
-    PowerAveraged_all=[]
-    PowerDetailed_all=[]
-    PowerAveraged_FrontOnly_all=[]
-    PowerDetailed_FrontOnly_all=[]    
-    
     print("Starting Bilinear Interpolation Analysis")
     start = time.time()
 
-    for i in range (0,len(frontGTI)):
-        cellCenterValFront=frontGTI.iloc[i]
-        cellCenterValBack=backGTI.iloc[i]
-        [PmaxIdeal, PmaxUnmatched, PmaxAvg] = bifacialvf.LandscapeSingleHour(cellCenterValFront, cellCenterValBack, data['Tamb'][i], data['VWind'][i], 6, interpolA,IVArray,beta_voc_all,m_all,bee_all)
-        PowerAveraged_all.append(PmaxIdeal)
-        PowerDetailed_all.append(PmaxUnmatched)
-        [PmaxIdeal, PmaxUnmatched, PmaxAvg] = bifacialvf.LandscapeSingleHour(cellCenterValFront, cellCenterValBack, data['Tamb'][i], data['VWind'][i], 6, interpolA,IVArray,beta_voc_all,m_all,bee_all)
-        PowerAveraged_FrontOnly_all.append(PmaxIdeal)
-        PowerDetailed_FrontOnly_all.append(PmaxUnmatched)
+    frontGTI = frontGTI.to_numpy(dtype=float)
+    backGTI = backGTI.to_numpy(dtype=float)
+    Tamb = data['Tamb'].to_numpy(dtype=float)
+    VWind = data['VWind'].to_numpy(dtype=float)
+    n_jobs = _resolvejobs(n_jobs)
+    if n_jobs == 1:
+        results = [_bilInterpolChunk((portraitorlandscape, frontGTI, backGTI, Tamb, VWind, (interpolA, IVArray, beta_voc_all, m_all, bee_all)))]
+    elif executor == 'threads':
+        from concurrent.futures import ThreadPoolExecutor
+        chunks = [(portraitorlandscape, frontGTI[c], backGTI[c], Tamb[c], VWind[c], (interpolA, IVArray, beta_voc_all, m_all, bee_all))
+                  for c in _chunkslices(len(frontGTI), n_jobs)]
+        with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+            results = list(pool.map(_bilInterpolChunk, chunks))
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        chunks = [(portraitorlandscape, frontGTI[c], backGTI[c], Tamb[c], VWind[c], None) for c in _chunkslices(len(frontGTI), n_jobs)]
+        if BilInterpolParams is None or isinstance(BilInterpolParams, str):
+            workerparams = BilInterpolParams or 'Yingli'
+        else:
+            workerparams = (interpolA, IVArray, beta_voc_all, m_all, bee_all)
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_initBilInterpolWorker,
+                                 initargs=(workerparams,)) as pool:
+            results = list(pool.map(_bilInterpolChunk, chunks))
+
+    PowerAveraged_all = np.concatenate([result[0] for result in results])
+    PowerDetailed_all = np.concatenate([result[1] for result in results])
+    PowerAveraged_FrontOnly_all = np.concatenate([result[2] for result in results])
+    PowerDetailed_FrontOnly_all = np.concatenate([result[3] for result in results])
    
     end = time.time()
     print ("Finished. Time elapsed for calculating Bilinear Interpolation Output (s): {:.0f}%".format(end - start))
@@ -264,18 +1261,19 @@ def analyseVFResultsBilInterpol(filename, portraitorlandscape='landscape', bifif
     data['BilInterpol FRONT ONLY (Detailed) PmaxUnmatched [W]']=PowerDetailed_FrontOnly_all
           
     metadata['Bififactor'] = bififactor # saving type of PVMismatch module used.
-    metadata2=pd.Series(metadata).to_frame().T
-    
-    writefilename=(os.path.splitext(filename)[0])+'_BilInterpol.csv'
-    metadata2.to_csv(writefilename,index=False)
-    data.to_csv(writefilename, mode='a', index=False, header=True)
+    if write and (output_df is None or writefilename is not None):
+        _writeanalysisresults(data, metadata, filename, writefilename, '_BilInterpol.csv')
     
     print("The DC Power Mismatch loss for the year is of: {:.3f}%".format(100-data['BilInterpol FRONT + BACK (Detailed) PmaxUnmatched [W]'].sum()*100/data['BilInterpol FRONT + BACK (Averaged) PmaxIdeal [W]'].sum()))
     print("The detailed irradiance power is: {:.1f} W".format(data['BilInterpol FRONT + BACK (Detailed) PmaxUnmatched [W]'].sum()))
     print("The average irradinace power is: {:.1f} W".format(data['BilInterpol FRONT + BACK (Averaged) PmaxIdeal [W]'].sum()))
 
+    return data
+
 
-def analyseVFResultsPVMismatch(filename, portraitorlandscape='portrait', bififactor=1.0, numcells=72, writefilename=None):
+def analyseVFResultsPVMismatch(filename=None, portraitorlandscape='portrait', bififactor=1.0, numcells=72, writefilename=None,
+                               pmp_cache_resolution=None, n_jobs=1, output_df=None, write=True, surrogate=None,
+                               mismatch_engine='pvmismatch', cell_iv_resolution=None):
     '''
     Opens a finished bifacialVF results file with the metadata and the irradiance
     results for Front and back in format "No_1_RowFrontGTI", detects how many
@@ -285,11 +1283,38 @@ def analyseVFResultsPVMismatch(filename, portraitorlandscape='portrait', bififac
     
     If no writefilename is passed it uses the same filename of input adding a 
     '_PVMismatch.csv' ending
+
+    Returns the results DataFrame with the power columns added. For arrays of
+    front and back irradiances use MismatchEvaluator.evaluate_batch.
     
     Inputs:
     bififactor: bifaciality factor of the module. Max 1.0. ALL Rear irradiance values saved include the bifi-factor.
     portraitorlandscape: 'portrait' or 'landscape', for PVMismatch input
                       which defines the electrical interconnects inside the module. 
+    pmp_cache_resolution: None to reuse PVMismatch solves only for identical cell
+                      irradiances, or a step in W/m2 to which the cell irradiances are
+                      quantized so near-identical hours share a solve. See MismatchEvaluator.
+    n_jobs: number of worker processes the hours are split across (in consecutive
+                      chunks, reassembled in order), each with its own MismatchEvaluator.
+                      1 (default) runs in this process, None uses all processors.
+    output_df: results DataFrame returned by simulate, analysed directly instead of
+                      reading filename. Results are then only written if writefilename is passed.
+    write: False to only return the results, without writing a file.
+    surrogate: True to fit a MismatchSurrogate on a sample of the hours and apply it
+                      to all of them instead of running PVMismatch for every hour, or a
+                      MismatchSurrogate (fitted on these hours if it isn't fitted yet).
+                      n_jobs and pmp_cache_resolution are not used then, and the power
+                      columns start with 'Surrogate' instead of 'PVMismatch'.
+    mismatch_engine: 'pvmismatch' (default) to solve every hour with PVMismatch, or
+                      'vectorized' to solve all hours at once with VectorizedMismatchEngine,
+                      the same cell model in numpy arrays. n_jobs and pmp_cache_resolution
+                      are not used then, and the power columns start with 'Vectorized'.
+                      The engine is saved in the metadata and in the attrs of the results
+                      ('MismatchEngine', and 'MismatchSurrogate' with the held out RMSE of
+                      the surrogate or None).
+    cell_iv_resolution: None to solve the PVMismatch cell IV curves of every new irradiance,
+                      or a step in W/m2 of an irradiance grid on which the cell IV curves are
+                      tabulated once and interpolated. See MismatchEvaluator.
 
     Example:
     analyseVFResultsPVMismatch(filename='Output\test.csv', 
@@ -298,10 +1323,10 @@ def analyseVFResultsPVMismatch(filename, portraitorlandscape='portrait', bififac
                                 #This will rewrite the input file!
     '''
     
-    (data, metadata) = bifacialvf.loadVFresults(filename)
+    _checkMismatchEngine(mismatch_engine, surrogate)
+    (data, metadata) = _analysisinput(filename, output_df)
 
     import time
-    import pvmismatch
 
     # Checking to see if PVMismatch has already been run:
     if 'CalculatePVOutput (PVMismatch)' in metadata:
@@ -319,89 +1344,171 @@ def analyseVFResultsPVMismatch(filename, portraitorlandscape='portrait', bififac
     frontGTI=data[frontGTI]
     backGTI=data[backGTI]
 
-    stdpl, cellsx, cellsy = bifacialvf.analysis.setupforPVMismatch(portraitorlandscape=portraitorlandscape, sensorsy=sensorsy, numcells=numcells)
-
-    #2DO: include resampling routnies here for frontGTI and backGTI so it matches cellsy
-           
-    if cellsx*cellsy == 72:
-        cell_pos = pvmismatch.pvmismatch_lib.pvmodule.STD72
-    elif cellsx*cellsy == 96:
-        cell_pos = pvmismatch.pvmismatch_lib.pvmodule.STD96
-    else:
-        print("Error. Only 72 and 96 cells modules supported at the moment. Change numcells to either of this options!")
+    placement = setupforPVMismatch(portraitorlandscape, sensorsy, numcells)
+    if placement is None:
         return
-     
-    pvmod=pvmismatch.pvmismatch_lib.pvmodule.PVmodule(cell_pos=cell_pos)
-    pvsys = pvmismatch.pvsystem.PVsystem(numberStrs=1, numberMods=1, pvmods=pvmod)  
-
+    stdpl, cellsx, cellsy = placement
 
-    PowerAveraged_FrontOnly_all=[]
-    PowerDetailed_FrontOnly_all=[]  
-    PowerAveraged_all=[]
-    PowerDetailed_all=[]
-    
     print("starting")
     start = time.time()
 
-    for i in range (0,len(frontGTI)):
-        cellCenterValFront=frontGTI.iloc[i]
-        cellCenterValBack=backGTI.iloc[i]
-        
-        if np.mean(cellCenterValFront) < 1.0:
-            PowerAveraged = 0
-            PowerDetailed = 0
-        else:                
-    
-            cellCenterValues_FrontPlusBack = [(x+y*bififactor)/1000 for x,y in zip(cellCenterValFront,cellCenterValBack)]
-            
-            # New section from bifacial_radiance optimized
-            G=np.array([cellCenterValues_FrontPlusBack]).transpose()
-            H = np.ones([1,cellsx]) 
-            array_det = np.dot(G,H) 
-            array_avg = np.ones([cellsy,cellsx])*(np.mean(cellCenterValues_FrontPlusBack))        
-            
-            # Actually do calculations
-            pvsys.setSuns({0: {0: [array_avg, stdpl]}})
-            PowerAveraged=pvsys.Pmp
-                                     
-            pvsys.setSuns({0: {0: [array_det, stdpl]}})
-            PowerDetailed=pvsys.Pmp        
-            
-            cellCenterValues_FrontOnly = [x/1000 for x in cellCenterValFront]
-            G=np.array([cellCenterValues_FrontOnly]).transpose()
-            H = np.ones([1,cellsx]) 
-            array_det = np.dot(G,H) 
-            array_avg = np.ones([cellsy,cellsx])*(np.mean(cellCenterValues_FrontPlusBack))        
-
-            # Actually do calculations
-            pvsys.setSuns({0: {0: [array_avg, stdpl]}})
-            PowerAveraged_FrontOnly=pvsys.Pmp
-                                     
-            pvsys.setSuns({0: {0: [array_det, stdpl]}})
-            PowerDetailed_FrontOnly=pvsys.Pmp        
-            
-        PowerAveraged_all.append(PowerAveraged)
-        PowerDetailed_all.append(PowerDetailed)
-        PowerAveraged_FrontOnly_all.append(PowerAveraged_FrontOnly)
-        PowerDetailed_FrontOnly_all.append(PowerDetailed_FrontOnly)
-        
+    frontGTI = frontGTI.to_numpy(dtype=float)
+    backGTI = backGTI.to_numpy(dtype=float)
+    n_jobs = _resolvejobs(n_jobs)
+    method = _MISMATCH_ENGINES[mismatch_engine]
+    metadata['MismatchSurrogate'] = None
+    if surrogate is not None and surrogate is not False:
+        Tamb = data['Tamb'].to_numpy(dtype=float) if 'Tamb' in data else None
+        if surrogate is True:
+            surrogate = MismatchSurrogate(numcells=numcells, portraitorlandscape=portraitorlandscape, bififactor=bififactor)
+        if surrogate.coefficients is None:
+            surrogate.fit(frontGTI, backGTI, Tamb)
+        print("Surrogate mismatch loss held out RMSE: {:.4f}%, max error: {:.4f}%".format(
+            100 * surrogate.holdout_rmse, 100 * surrogate.holdout_maxerror))
+        fallbacks = surrogate.fallbacks
+        results = [surrogate.evaluate_batch(frontGTI, backGTI, Tamb) +
+                   surrogate.evaluate_batch(frontGTI, np.zeros(backGTI.shape), Tamb)]
+        print("Hours outside of the surrogate training domain (full model): ", surrogate.fallbacks - fallbacks)
+        method = 'Surrogate'
+        metadata['MismatchSurrogate'] = surrogate.holdout_rmse
+    elif mismatch_engine == 'vectorized':
+        engine = VectorizedMismatchEngine(numcells=numcells, portraitorlandscape=portraitorlandscape, bififactor=bififactor)
+        results = [engine.evaluate_batch(frontGTI, backGTI) +
+                   engine.evaluate_batch(frontGTI, np.zeros(backGTI.shape))]
+    elif n_jobs == 1:
+        # PVMismatch module and system, built once (per worker) and reused for every hour
+        results = [_pvMismatchChunk((numcells, portraitorlandscape, bififactor, pmp_cache_resolution, cell_iv_resolution,
+                                    frontGTI, backGTI))]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        chunks = [(numcells, portraitorlandscape, bififactor, pmp_cache_resolution, cell_iv_resolution,
+                   frontGTI[c], backGTI[c])
+                  for c in _chunkslices(len(frontGTI), n_jobs)]
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            results = list(executor.map(_pvMismatchChunk, chunks))
+
+    PowerAveraged_all, PowerDetailed_all, PowerAveraged_FrontOnly_all, PowerDetailed_FrontOnly_all = \
+        [np.concatenate([result[k] for result in results]) for k in range(4)]
+
     end = time.time()
-    print ("Time elapsed for calculating PVMismatch Output ", end - start)
+    print ("Time elapsed for calculating {} Output ".format(method), end - start)
+    if method == 'PVMismatch':
+        hits = sum(result[4] for result in results); misses = sum(result[5] for result in results)
+        print("PVMismatch solves: ", misses, " reused: ", hits,
+              " hit rate: %0.3f" % (hits / (hits + misses) if hits + misses else 0.0))
     print("ending")
-    data['PVMismatch FRONT + BACK (Averaged) PmaxIdeal [W]']=PowerAveraged_all
-    data['PVMismatch FRONT + BACK (Detailed) PmaxUnmatched [W]']=PowerDetailed_all
-    data['PVMismatch FRONT ONLY (Averaged) PmaxIdeal [W]']=PowerAveraged_FrontOnly_all
-    data['PVMismatch FRONT ONLY (Detailed) PmaxUnmatched [W]']=PowerDetailed_FrontOnly_all
+    data[method + ' FRONT + BACK (Averaged) PmaxIdeal [W]']=PowerAveraged_all
+    data[method + ' FRONT + BACK (Detailed) PmaxUnmatched [W]']=PowerDetailed_all
+    data[method + ' FRONT ONLY (Averaged) PmaxIdeal [W]']=PowerAveraged_FrontOnly_all
+    data[method + ' FRONT ONLY (Detailed) PmaxUnmatched [W]']=PowerDetailed_FrontOnly_all
 
     metadata['NumCellsinPanel'] = cellsx*cellsy # saving type of PVMismatch module used.
     metadata['Bififactor'] = bififactor # saving type of PVMismatch module used.
-    metadata2=pd.Series(metadata).to_frame().T
-    
-    writefilename=(os.path.splitext(filename)[0])+'_PVMismatch.csv'
-    metadata2.to_csv(writefilename,index=False)
-    data.to_csv(writefilename, mode='a', index=False, header=True)
+    metadata['MismatchEngine'] = mismatch_engine
+    data.attrs['MismatchEngine'] = mismatch_engine
+    data.attrs['MismatchSurrogate'] = metadata['MismatchSurrogate']
+    if write and (output_df is None or writefilename is not None):
+        _writeanalysisresults(data, metadata, filename, writefilename, '_PVMismatch.csv')
     
-    print("The DC Power Mismatch loss for the year is of: {:.3f}%".format(100-data['PVMismatch FRONT + BACK (Detailed) PmaxUnmatched [W]'].sum()*100/data['PVMismatch FRONT + BACK (Averaged) PmaxIdeal [W]'].sum()))
-    print("The detailed irradiance power is: {:.1f} W".format(data['PVMismatch FRONT + BACK (Detailed) PmaxUnmatched [W]'].sum()))
-    print("The average irradinace power is: {:.1f} W".format(data['PVMismatch FRONT + BACK (Averaged) PmaxIdeal [W]'].sum()))
+    print("The DC Power Mismatch loss for the year is of: {:.3f}%".format(100-data[method + ' FRONT + BACK (Detailed) PmaxUnmatched [W]'].sum()*100/data[method + ' FRONT + BACK (Averaged) PmaxIdeal [W]'].sum()))
+    print("The detailed irradiance power is: {:.1f} W".format(data[method + ' FRONT + BACK (Detailed) PmaxUnmatched [W]'].sum()))
+    print("The average irradinace power is: {:.1f} W".format(data[method + ' FRONT + BACK (Averaged) PmaxIdeal [W]'].sum()))
+
+    return data
+
+
+def stringLayout(modulesPerString, stringsPerInverter, rows=3):
+    '''
+    Strings of an inverter block of rows with the same number of modules,
+    as number of modules of each row type in each string for
+    StringMismatchEvaluator. The strings are laid along the rows one after
+    the other, so a string can continue in the next row. The first row is
+    'first', the last 'last' and the rest 'interior' ('single' for one row).
+
+    Example:
+    strings = stringLayout(modulesPerString=20, stringsPerInverter=6, rows=4)
+    '''
+    modules = modulesPerString * stringsPerInverter
+    if rows < 1 or modules % rows:
+        raise ValueError("The {} modules of the inverter can't be split in {} rows".format(modules, rows))
+    if rows == 1:
+        rowTypes = ['single']
+    else:
+        rowTypes = ['first'] + ['interior'] * (rows - 2) + ['last']
+    rowofmodule = np.arange(modules) // (modules // rows)
+    strings = []
+    for string in range(stringsPerInverter):
+        rowTypesofmodules = [rowTypes[row] for row in rowofmodule[string * modulesPerString:(string + 1) * modulesPerString]]
+        strings.append({rowType: rowTypesofmodules.count(rowType) for rowType in rowTypes if rowType in rowTypesofmodules})
+    return strings
+
+
+def analyseVFResultsStringMismatch(results, strings, portraitorlandscape='landscape', bififactor=1.0, numcells=72,
+                                   writefilename=None):
+    '''
+    Calculates the power of an inverter block with StringMismatchEvaluator from
+    the bifacialVF results of each row type, with all the modules at the
+    average irradiance, every module, every string and the whole inverter at
+    its maximum power point.
+
+    Returns a DataFrame with the date (if in the results) and the power
+    columns, written with the layout in the metadata row if writefilename
+    is passed.
+
+    Inputs:
+    results: dict of row type ('first', 'interior', 'last' or 'single') to the
+                      results filename or results DataFrame returned by simulate
+                      of that row type, with the same timesteps.
+    strings: number of modules of each row type in each string, see stringLayout.
+    bififactor: bifaciality factor of the module. Max 1.0. ALL Rear irradiance values saved include the bifi-factor.
+    portraitorlandscape: 'portrait' or 'landscape', electrical interconnects inside the module.
+
+    Example:
+    analyseVFResultsStringMismatch({'first': 'Output\\first.csv', 'interior': 'Output\\interior.csv',
+                                    'last': 'Output\\last.csv'}, stringLayout(20, 6, rows=4),
+                                   writefilename='Output\\inverter.csv')
+    '''
+    import time
+
+    data = {}
+    for rowType, result in results.items():
+        if isinstance(result, pd.DataFrame):
+            data[rowType] = _analysisinput(None, result)[0]
+        else:
+            data[rowType] = _analysisinput(result, None)[0]
+    if len(set(len(rowdata) for rowdata in data.values())) > 1:
+        raise ValueError("The results of all the row types must have the same timesteps")
+
+    evaluator = StringMismatchEvaluator(strings, numcells=numcells, portraitorlandscape=portraitorlandscape,
+                                        bififactor=bififactor)
+    missing = [rowType for rowType in evaluator.rowTypes if rowType not in data]
+    if missing:
+        raise ValueError("The strings have modules in rows without results: {}".format(missing))
+    frontGTI = {rowType: data[rowType][[col for col in data[rowType] if col.endswith('RowFrontGTI')]].to_numpy(dtype=float)
+                for rowType in evaluator.rowTypes}
+    backGTI = {rowType: data[rowType][[col for col in data[rowType] if col.endswith('RowBackGTI')]].to_numpy(dtype=float)
+               for rowType in evaluator.rowTypes}
+
+    start = time.time()
+    PowerAveraged, PowerModules, PowerStrings, PowerInverter = evaluator.evaluate_batch(frontGTI, backGTI)
+    print("Time elapsed for calculating the string mismatch ", time.time() - start)
+
+    output = pd.DataFrame(index=data[evaluator.rowTypes[0]].index)
+    if 'date' in data[evaluator.rowTypes[0]]:
+        output['date'] = data[evaluator.rowTypes[0]]['date']
+    output['Inverter FRONT + BACK (Averaged) PmaxIdeal [W]'] = PowerAveraged
+    output['Inverter FRONT + BACK (Modules) Pmax [W]'] = PowerModules
+    output['Inverter FRONT + BACK (Strings) Pmax [W]'] = PowerStrings
+    output['Inverter FRONT + BACK (Inverter) Pmax [W]'] = PowerInverter
+
+    if writefilename is not None:
+        metadata = {'NumCellsinPanel': numcells, 'PortraitorLandscape': portraitorlandscape, 'Bififactor': bififactor,
+                    'Strings': len(strings), 'Modules': int(evaluator.moduleCounts.sum())}
+        _writeanalysisresults(output, metadata, None, writefilename, None)
+
+    if PowerAveraged.sum() > 0:
+        print("The DC Power Mismatch loss for the year of the modules is of: {:.3f}%, of the strings: {:.3f}%, "
+              "of the inverter: {:.3f}%".format(*[100 - power.sum() * 100 / PowerAveraged.sum()
+                                                 for power in (PowerModules, PowerStrings, PowerInverter)]))
 
+    return output
@@ -37,13 +37,16 @@ import sys
 import warnings
 
 from bifacialvf.vf import getBackSurfaceIrradiances, getFrontSurfaceIrradiances, getGroundShadeFactors
-from bifacialvf.vf import getSkyConfigurationFactors, trackingBFvaluescalculator, rowSpacing
-from bifacialvf.sun import  perezComp,  sunIncident, sunrisecorrectedsunposition #, hrSolarPos, solarPos,
+from bifacialvf.vf import getSkyConfigurationFactors, trackingGeometry, rowSpacing
+from bifacialvf.vf import getGroundShadeFactorsCached
+from bifacialvf.vf import getSurfaceIrradianceWeights, getSurfaceIrradiancesFromWeights, groupTrackerStates
+from bifacialvf.cache import LRUCache
+from bifacialvf.sun import  perezComp,  sunIncident, sunrisecorrectedsunposition, cachedsunrisecorrectedsunposition #, hrSolarPos, solarPos,
 
 #from bifacialvf.readepw import readepw
 
 # Electrical Mismatch Calculation 
-from bifacialvf.analysis import analyseVFResultsBilInterpol, analyseVFResultsPVMismatch
+from bifacialvf.analysis import analyseVFResultsBilInterpol, analyseVFResultsPVMismatch, _checkMismatchEngine
 #import bifacialvf.analysis as analysis
 
 from gsee import trigon
@@ -234,11 +237,14 @@ def simulate(myTMY3, meta, azimFlag, writefiletitle=None, tilt=0, sazm=180,
              pitch=None, rowType='interior', transFactor=0.01, sensorsy=6, 
              PVfrontSurface='glass', PVbackSurface='glass', albedo=None,  
              tracking=False, backtrack=True, limit_angle=45,
-             calculatePVMismatch=False, cellsnum=72, 
+             calculatePVMismatch=False, cellsnum=72,
              portraitorlandscape='landscape', bififactor=1.0,
              calculateBilInterpol=False, BilInterpolParams=None,
              deltastyle='TMY3', agriPV=False, calcule_gti=False, data=None, angles=None,
-             verbose=False, iplant=0, progress_log=None, plant_name=None):
+             verbose=False, iplant=0, progress_log=None, plant_name=None,
+             shade_cache_resolution=None, shade_cache_size=50000,
+             incremental=False, solar_position_method='nrel_numpy', solar_position_cache=True,
+             solar_position_cachedir=None, mismatch_engine='pvmismatch'):
 
         '''
       
@@ -260,9 +266,49 @@ def simulate(myTMY3, meta, azimFlag, writefiletitle=None, tilt=0, sazm=180,
         sensorsy:      Number of points along the module chord to return irradiance values.  Default 6 (1-up landscape module)
         limit_angle:     1-axis tracking maximum limits of rotation
         tracking, backtrack:  boolean to enable 1-axis tracking and pvlib backtracking algorithm, respectively
+                    With tracking, the daylight timesteps are grouped by unique tracker state (tilt, C, D)
+                    and the sky configuration factors are calculated once per state. The number of unique
+                    states and of daylight timesteps are saved in output_df.attrs['tracker_states_unique']
+                    and ['tracker_states_timesteps']. With incremental=True the view weights of states
+                    that repeat are also kept.
         albedo:     If a value is passed, that value will be used for all the simulations.
                     If None is passed (or albedo argument is not passed), program will search the 
                     TMY file for the "Albe (unitless)" column and use those values
+        calculatePVMismatch, calculateBilInterpol:  calculate the module power with PVMismatch (cellsnum cells,
+                    portraitorlandscape) or with bilinear interpolation (BilInterpolParams) from the
+                    results in memory. The power columns are added to the returned output_df.
+        shade_cache_resolution:  if a value is passed (degrees, e.g. 0.1), the sun elevation and azimuth
+                    are quantized to that resolution and the ground and module shade factors are
+                    cached and reused for timesteps with the same quantized sun position and geometry.
+                    None (default) computes the shade factors exactly for every timestep.
+                    Only useful for fixed tilt: the tracker state is part of the cache key as it is,
+                    and it rarely repeats, so tracking runs get almost no cache hits.
+                    See vf.getGroundShadeFactorsCached for the accuracy impact.
+        shade_cache_size:  maximum number of cached shade patterns (least recently used are dropped).
+                    Hits and misses are saved in output_df.attrs['shade_cache_hits'] and ['shade_cache_misses']
+        incremental:  reuse the geometry (sky configuration factors and the view weights of the
+                    front and back surface irradiances) of the previous timestep when it is unchanged,
+                    and only scale it by the irradiances of the timestep. The beam fraction reaching
+                    each ground segment is also reused when the ground shade pattern is the same as in
+                    the previous timestep; the shade factors themselves are still computed for every
+                    timestep. Useful for fixed tilt and for sub-hourly data, where consecutive
+                    timesteps mostly share the tracker position. Results match the default
+                    calculation up to rounding. Reused and recomputed counts are saved in
+                    output_df.attrs['incremental_geometry_reused'], ['incremental_geometry_recomputed'],
+                    ['incremental_beam_factor_reused'] and ['incremental_beam_factor_recomputed']
+        solar_position_method:  'nrel_numpy' (default, pvlib SPA), a pvlib get_solarposition method
+                    ('nrel_numba', 'nrel_c', 'pyephem', 'ephemeris') or 'marion' (vectorized Marion
+                    algorithm, faster and less accurate, for screening runs). Only used if myTMY3 has
+                    no zenith, azimuth and elevation columns. See sun.sunrisecorrectedsunposition;
+                    for 'nrel_numba' call sun.warmupSolarPosition once per worker process.
+        solar_position_cache:  reuse the sun position of earlier simulate calls with the same timestamps,
+                    location, deltastyle and solar_position_method (in-memory LRU cache sun.SOLPOS_CACHE).
+                    False always recalculates it.
+        solar_position_cachedir:  optional directory where calculated sun positions are also stored
+                    on disk, to share them between processes and sessions. Only used with solar_position_cache.
+        mismatch_engine:  'pvmismatch' (default) or 'vectorized' to solve all hours at once with
+                    VectorizedMismatchEngine instead of PVMismatch (power columns starting with
+                    'Vectorized'). See analyseVFResultsPVMismatch.
 
         New Parameters: 
         # Dictionary input example:
@@ -275,6 +321,7 @@ def simulate(myTMY3, meta, azimFlag, writefiletitle=None, tilt=0, sazm=180,
         '''    
         warnings.simplefilter("ignore")
         num_discrete_elements = 100
+        _checkMismatchEngine(mismatch_engine)     # before the simulation, not after it
 
         if (calcule_gti == False):
             if (data is None):
@@ -355,7 +402,13 @@ def simulate(myTMY3, meta, azimFlag, writefiletitle=None, tilt=0, sazm=180,
         dataInterval = (myTMY3.index[1]-myTMY3.index[0]).total_seconds()/60
     
         if not (('azimuth' in myTMY3) and ('zenith' in myTMY3) and ('elevation' in myTMY3)):
-            solpos, sunup = sunrisecorrectedsunposition(myTMY3, meta, deltastyle = deltastyle, verbose=verbose)
+            if solar_position_cache:
+                solpos, sunup = cachedsunrisecorrectedsunposition(myTMY3, meta, deltastyle = deltastyle, verbose=verbose,
+                                                                  solar_position_method=solar_position_method,
+                                                                  cachedir=solar_position_cachedir)
+            else:
+                solpos, sunup = sunrisecorrectedsunposition(myTMY3, meta, deltastyle = deltastyle, verbose=verbose,
+                                                            solar_position_method=solar_position_method)
             myTMY3['zenith'] = np.radians(solpos['zenith'].to_numpy())
             myTMY3['azimuth'] = np.radians(solpos['azimuth'].to_numpy())
             myTMY3['elevation']=np.radians(solpos['elevation'].to_numpy())
@@ -374,7 +427,7 @@ def simulate(myTMY3, meta, azimFlag, writefiletitle=None, tilt=0, sazm=180,
                 myTMY3['trackingdata_surface_tilt'] = trackingdata['surface_tilt']         
                 myTMY3['trackingdata_surface_azimuth'] = trackingdata['surface_azimuth']      
             
-            [myTMY3['C'], myTMY3['D']] = trackingBFvaluescalculator(myTMY3['trackingdata_surface_tilt'], hub_height, pitch)
+            myTMY3['C'], myTMY3['D'] = trackingGeometry(myTMY3['trackingdata_surface_tilt'].to_numpy(), hub_height, pitch)[:2]
                 
         # Check what Albedo to se:
         if albedo == None:
@@ -422,6 +475,31 @@ def simulate(myTMY3, meta, azimFlag, writefiletitle=None, tilt=0, sazm=180,
         if tracking==False:        
             ## Sky configuration factors are the same for all times, only based on geometry and row type
             [rearSkyConfigFactors, frontSkyConfigFactors] = getSkyConfigurationFactors(rowType, tilt, C, D)       ## Sky configuration factors are the same for all times, only based on geometry and row type
+
+        # Precompute the sky configuration factors once per unique tracker state
+        trackerGeometry = None
+        trackerWeights = {}
+        if tracking == True:
+            daylight = myTMY3['zenith'].to_numpy() < 0.5 * math.pi
+            trackerStates = groupTrackerStates(myTMY3['trackingdata_surface_tilt'].to_numpy()[daylight],
+                                               myTMY3['C'].to_numpy()[daylight], myTMY3['D'].to_numpy()[daylight])
+            trackerGeometry = {}
+            for state in trackerStates:
+                trackerGeometry[state] = getSkyConfigurationFactors(rowType, state[0], state[1], state[2])
+            if verbose:
+                print("Tracker states: ", len(trackerStates), " unique for ", int(daylight.sum()), " daylight timesteps")
+
+        shadeCache = None
+        if shade_cache_resolution is not None:
+            shadeCache = LRUCache(maxsize=shade_cache_size)
+
+        # State of the previous timestep for the incremental mode
+        prevGeometry = None
+        prevShade = None
+        geometryReused = 0
+        geometryRecomputed = 0
+        beamFactorReused = 0
+        beamFactorRecomputed = 0
                     
         if tracking==False and backtrack==True:
             if verbose:
@@ -497,43 +575,85 @@ def simulate(myTMY3, meta, azimFlag, writefiletitle=None, tilt=0, sazm=180,
                     C = myTMY3['C'].iloc[rl]                        
                     D = myTMY3['D'].iloc[rl]
                         
-                    [rearSkyConfigFactors, frontSkyConfigFactors] = getSkyConfigurationFactors(rowType, tilt, C, D)       ## Sky configuration factors are the same for all times, only based on geometry and row type
+                    if (tilt, C, D) in trackerGeometry:
+                        [rearSkyConfigFactors, frontSkyConfigFactors] = trackerGeometry[(tilt, C, D)]
+                    else:   # not a finite tracker state
+                        [rearSkyConfigFactors, frontSkyConfigFactors] = getSkyConfigurationFactors(rowType, tilt, C, D)       ## Sky configuration factors are the same for all times, only based on geometry and row type
+
+                if incremental:
+                    if (tilt, sazm, C, D) == prevGeometry:
+                        geometryReused += 1
+                    elif (tilt, C, D) in trackerWeights:
+                        # same tracker state as an earlier, not consecutive, timestep
+                        geometryReused += 1
+                        prevGeometry = (tilt, sazm, C, D)
+                        surfaceWeights = trackerWeights[(tilt, C, D)]
+                    else:
+                        geometryRecomputed += 1
+                        prevGeometry = (tilt, sazm, C, D)
+                        surfaceWeights = getSurfaceIrradianceWeights(rowType, PVfrontSurface, PVbackSurface, tilt, C, D, sensorsy, num_discrete_elements)
+                        if tracking == True and trackerStates.get((tilt, C, D), 0) > 1:
+                            trackerWeights[(tilt, C, D)] = surfaceWeights   # only kept for states that repeat
 
                 rearGroundGHI=[]
                 frontGroundGHI=[]
-                pvFrontSH, pvBackSH, maxShadow, rearGroundSH, frontGroundSH = getGroundShadeFactors (rowType, tilt, C, D, elv, azm, sazm)
+                if shadeCache is not None:
+                    pvFrontSH, pvBackSH, maxShadow, rearGroundSH, frontGroundSH = getGroundShadeFactorsCached(shadeCache, shade_cache_resolution, rowType, tilt, C, D, elv, azm, sazm)
+                else:
+                    pvFrontSH, pvBackSH, maxShadow, rearGroundSH, frontGroundSH = getGroundShadeFactors (rowType, tilt, C, D, elv, azm, sazm)
             
                 # Sum the irradiance components for each of the ground segments, to the front and rear of the front of the PV row
                 #double iso_dif = 0.0, circ_dif = 0.0, horiz_dif = 0.0, grd_dif = 0.0, beam = 0.0   # For calling PerezComp to break diffuse into components for zero tilt (horizontal)                           
                 ghi, iso_dif, circ_dif, horiz_dif, grd_dif, beam = perezComp(dni, dhi, albedo, zen, 0.0, zen)
-                    
-                    
-                for k in range (0, num_discrete_elements):
-                    
-                    rearGroundGHI.append(iso_dif * rearSkyConfigFactors[k])       # Add diffuse sky component viewed by ground
-                    if (rearGroundSH[k] == 0):
-                        rearGroundGHI[k] += beam + circ_dif                    # Add beam and circumsolar component if not shaded
-                    else:
-                        rearGroundGHI[k] += (beam + circ_dif) * transFactor    # Add beam and circumsolar component transmitted thru module spacing if shaded
-            
-                    frontGroundGHI.append(iso_dif * frontSkyConfigFactors[k])     # Add diffuse sky component viewed by ground
-                    if (frontGroundSH[k] == 0):
-                        frontGroundGHI[k] += beam + circ_dif                   # Add beam and circumsolar component if not shaded 
+
+                if incremental:
+                    # Fraction of beam and circumsolar reaching each ground segment only changes with the shadow pattern
+                    if (rearGroundSH, frontGroundSH) == prevShade:
+                        beamFactorReused += 1
                     else:
-                        frontGroundGHI[k] += (beam + circ_dif) * transFactor   # Add beam and circumsolar component transmitted thru module spacing if shaded
-                    
-            
-                # b. CALCULATE THE AOI CORRECTED IRRADIANCE ON THE FRONT OF THE PV MODULE, AND IRRADIANCE REFLECTED FROM FRONT OF PV MODULE ***************************
-                #double[] frontGTI = new double[sensorsy], frontReflected = new double[sensorsy]
-                #double aveGroundGHI = 0.0          # Average GHI on ground under PV array
-                    
-                if (calcule_gti):
-                    aveGroundGHI, frontGTI, frontReflected = getFrontSurfaceIrradiances(rowType, maxShadow, PVfrontSurface, tilt, sazm, dni, dhi, C, D, albedo, zen, azm, sensorsy, pvFrontSH, frontGroundGHI, num_discrete_elements)
-                    
-                else: # calculate_gti == False
-                    frontReflected = ([0.0] * sensorsy)
-                    frontGTI = gti[index:index+sensorsy]
-                    index += sensorsy
+                        beamFactorRecomputed += 1
+                        prevShade = (rearGroundSH, frontGroundSH)
+                        rearBeamFactor = np.where(np.array(rearGroundSH) == 0, 1.0, transFactor)
+                        frontBeamFactor = np.where(np.array(frontGroundSH) == 0, 1.0, transFactor)
+
+                    rearGroundGHI = (iso_dif * np.asarray(rearSkyConfigFactors) + (beam + circ_dif) * rearBeamFactor).tolist()
+                    frontGroundGHI = (iso_dif * np.asarray(frontSkyConfigFactors) + (beam + circ_dif) * frontBeamFactor).tolist()
+
+                    if (calcule_gti):
+                        frontGTI, backGTI, aveGroundGHI = getSurfaceIrradiancesFromWeights(surfaceWeights, PVfrontSurface, PVbackSurface, tilt, sazm, dni, dhi, albedo, zen, azm, pvFrontSH, pvBackSH, rearGroundGHI, frontGroundGHI)
+                    else: # calculate_gti == False
+                        frontGTI = gti[index:index+sensorsy]
+                        index += sensorsy
+                        frontGTI, backGTI, aveGroundGHI = getSurfaceIrradiancesFromWeights(surfaceWeights, PVfrontSurface, PVbackSurface, tilt, sazm, dni, dhi, albedo, zen, azm, pvFrontSH, pvBackSH, rearGroundGHI, frontGroundGHI, frontGTI=frontGTI)
+                    backGTI = backGTI.tolist()
+
+                else:
+                    for k in range (0, num_discrete_elements):
+                        
+                        rearGroundGHI.append(iso_dif * rearSkyConfigFactors[k])       # Add diffuse sky component viewed by ground
+                        if (rearGroundSH[k] == 0):
+                            rearGroundGHI[k] += beam + circ_dif                    # Add beam and circumsolar component if not shaded
+                        else:
+                            rearGroundGHI[k] += (beam + circ_dif) * transFactor    # Add beam and circumsolar component transmitted thru module spacing if shaded
+                
+                        frontGroundGHI.append(iso_dif * frontSkyConfigFactors[k])     # Add diffuse sky component viewed by ground
+                        if (frontGroundSH[k] == 0):
+                            frontGroundGHI[k] += beam + circ_dif                   # Add beam and circumsolar component if not shaded 
+                        else:
+                            frontGroundGHI[k] += (beam + circ_dif) * transFactor   # Add beam and circumsolar component transmitted thru module spacing if shaded
+                        
+                
+                    # b. CALCULATE THE AOI CORRECTED IRRADIANCE ON THE FRONT OF THE PV MODULE, AND IRRADIANCE REFLECTED FROM FRONT OF PV MODULE ***************************
+                    #double[] frontGTI = new double[sensorsy], frontReflected = new double[sensorsy]
+                    #double aveGroundGHI = 0.0          # Average GHI on ground under PV array
+                        
+                    if (calcule_gti):
+                        aveGroundGHI, frontGTI, frontReflected = getFrontSurfaceIrradiances(rowType, maxShadow, PVfrontSurface, tilt, sazm, dni, dhi, C, D, albedo, zen, azm, sensorsy, pvFrontSH, frontGroundGHI, num_discrete_elements)
+                        
+                    else: # calculate_gti == False
+                        frontReflected = ([0.0] * sensorsy)
+                        frontGTI = gti[index:index+sensorsy]
+                        index += sensorsy
 
                 #double inc, tiltr, sazmr
                 inc, tiltr, sazmr = sunIncident(0, tilt, sazm, 45.0, zen, azm)	    # For calling PerezComp to break diffuse into components for 
@@ -543,7 +663,8 @@ def simulate(myTMY3, meta, azimFlag, writefiletitle=None, tilt=0, sazm=180,
                 
                 # CALCULATE THE AOI CORRECTED IRRADIANCE ON THE BACK OF THE PV MODULE
                 #double[] backGTI = new double[sensorsy]
-                backGTI, aveGroundGHI = getBackSurfaceIrradiances(rowType, maxShadow, PVbackSurface, tilt, sazm, dni, dhi, C, D, albedo, zen, azm, sensorsy, pvBackSH, rearGroundGHI, frontGroundGHI, frontReflected, num_discrete_elements, offset=0)
+                if not incremental:
+                    backGTI, aveGroundGHI = getBackSurfaceIrradiances(rowType, maxShadow, PVbackSurface, tilt, sazm, dni, dhi, C, D, albedo, zen, azm, sensorsy, pvBackSH, rearGroundGHI, frontGroundGHI, frontReflected, num_discrete_elements, offset=0)
                
                 inc, tiltr, sazmr = sunIncident(0, 180.0-tilt, sazm-180.0, 45.0, zen, azm)       # For calling PerezComp to break diffuse into components for 
                 gtiAllpc, iso_dif, circ_dif, horiz_dif, grd_dif, beam = perezComp(dni, dhi, albedo, inc, tiltr, zen)   # Call to get components for the tilt
@@ -602,18 +723,150 @@ def simulate(myTMY3, meta, azimFlag, writefiletitle=None, tilt=0, sazm=180,
     
         # End of myTMY3 rows of data
         progress_log[iplant-1] = "DONE"
+
+        if trackerGeometry is not None:
+            output_df.attrs['tracker_states_unique'] = len(trackerStates)
+            output_df.attrs['tracker_states_timesteps'] = int(daylight.sum())
+
+        if incremental:
+            output_df.attrs['incremental_geometry_reused'] = geometryReused
+            output_df.attrs['incremental_geometry_recomputed'] = geometryRecomputed
+            output_df.attrs['incremental_beam_factor_reused'] = beamFactorReused
+            output_df.attrs['incremental_beam_factor_recomputed'] = beamFactorRecomputed
+            if verbose:
+                print("Incremental mode, geometry reused: ", geometryReused, " recomputed: ", geometryRecomputed)
+                print("Incremental mode, beam factors reused: ", beamFactorReused, " recomputed: ", beamFactorRecomputed)
+
+        if shadeCache is not None:
+            output_df.attrs['shade_cache_hits'] = shadeCache.hits
+            output_df.attrs['shade_cache_misses'] = shadeCache.misses
+            if verbose:
+                print("Shade cache hits: ", shadeCache.hits, " misses: ", shadeCache.misses,
+                      " hit rate: %0.3f" % shadeCache.hit_rate)
        
+        # The power analyses run on output_df in memory, without writing or reading files
         if calculateBilInterpol==True:
-            analyseVFResultsBilInterpol(filename=writefiletitle, portraitorlandscape=portraitorlandscape, bififactor=bififactor, writefilename=writefiletitle)
+            output_df = analyseVFResultsBilInterpol(output_df=output_df, portraitorlandscape=portraitorlandscape, bififactor=bififactor,
+                                                    BilInterpolParams=BilInterpolParams, write=False)
 
         if calculatePVMismatch==True:
-            analyseVFResultsPVMismatch(filename=writefiletitle, portraitorlandscape=portraitorlandscape, bififactor=bififactor, numcells=cellsnum, writefilename=writefiletitle)
+            output_df = analyseVFResultsPVMismatch(output_df=output_df, portraitorlandscape=portraitorlandscape, bififactor=bififactor,
+                                                   numcells=cellsnum, write=False, mismatch_engine=mismatch_engine)
 
         if verbose:
             print( "Finished")
         
         return output_df
-        
+
+
+# weather data and location of tracker_sweep, set once per worker process by _initTrackerSweep
+_SWEEP_WEATHER = None
+
+
+def _initTrackerSweep(myTMY3, meta):
+    '''
+    Keeps the weather data of tracker_sweep in the worker process, so it is
+    sent to each worker once instead of with every configuration.
+    '''
+    global _SWEEP_WEATHER
+    _SWEEP_WEATHER = (myTMY3, meta)
+
+
+def _trackerSweepConfiguration(args):
+    '''
+    Runs simulate for one tracker configuration of tracker_sweep and returns
+    its row of the results table. Module level so it can run in a process pool.
+    '''
+    azimFlag, limit_angle, gcr, backtrack, kwargs = args
+    myTMY3, meta = _SWEEP_WEATHER
+    # simulate adds the tracker angles of the configuration to the data it is given
+    output_df = simulate(myTMY3.copy(), meta, azimFlag, tracking=True, limit_angle=limit_angle,
+                         backtrack=backtrack, pitch=1.0/gcr, progress_log=[None], **kwargs)
+
+    # insolation in kWh/m2, from the average of the sensors of each timestep
+    intervalHours = (myTMY3.index[1]-myTMY3.index[0]).total_seconds()/3600
+    frontcols = [col for col in output_df.columns if col.endswith('_RowFrontGTI')]
+    backcols = [col for col in output_df.columns if col.endswith('_RowBackGTI')]
+    front = output_df[frontcols].astype(float).mean(axis=1).sum() * intervalHours / 1000
+    rear = output_df[backcols].astype(float).mean(axis=1).sum() * intervalHours / 1000
+
+    return {'limit_angle': limit_angle, 'gcr': gcr, 'backtrack': backtrack,
+            'front_insolation': front, 'rear_insolation': rear,
+            'bifacial_ratio': rear / front if front > 0 else np.nan}
+
+
+def tracker_sweep(myTMY3, meta, limit_angles=(45,), gcrs=(0.35,), backtrack=(True, False),
+                  azimFlag=1, n_jobs=None, verbose=False, **kwargs):
+    '''
+    Description
+    -----------
+    Simulates a 1-axis tracker for every combination of limit angle, ground
+    coverage ratio and backtracking, and returns the annual front and rear
+    insolation of each configuration.
+
+    The sun position only depends on the weather file, so it is calculated
+    once and reused by every configuration. The configurations are simulated
+    in parallel in a process pool, to which the weather data is sent once per
+    worker process.
+
+    Parameters
+    ----------
+    myTMY3 (pd.DataFrame): weather data, as for simulate
+    meta (dict): location, as for simulate
+    limit_angles:  1-axis tracking maximum limits of rotation to sweep (degrees)
+    gcrs:    ground coverage ratios to sweep (pitch = 1/gcr)
+    backtrack:   backtracking options to sweep, True and/or False
+    azimFlag:   passed to simulate
+    n_jobs:   number of worker processes. None uses all processors, 1 runs
+              the configurations one after the other in this process
+    verbose:   print the progress of the sweep
+    **kwargs:  other simulate parameters shared by all configurations, for
+               example hub_height, sazm, rowType, albedo or sensorsy.
+               calcule_gti defaults to True.
+
+    Returns
+    -------
+    sweep_df:  pd.DataFrame with one row per configuration and columns
+               limit_angle, gcr, backtrack, front_insolation and rear_insolation
+               (kWh/m2 over the weather file, average of the sensors) and
+               bifacial_ratio (rear/front)
+    '''
+    import itertools
+    from concurrent.futures import ProcessPoolExecutor
+
+    for key in ['tracking', 'limit_angle', 'pitch', 'progress_log']:
+        if key in kwargs:
+            raise ValueError("%s is set by tracker_sweep" % key)
+    kwargs.setdefault('calcule_gti', True)
+
+    myTMY3 = myTMY3.copy()
+    if not (('azimuth' in myTMY3) and ('zenith' in myTMY3) and ('elevation' in myTMY3)):
+        solpos, sunup = cachedsunrisecorrectedsunposition(myTMY3, meta, deltastyle=kwargs.get('deltastyle', 'TMY3'),
+                                                          verbose=verbose,
+                                                          solar_position_method=kwargs.get('solar_position_method', 'nrel_numpy'))
+        myTMY3['zenith'] = np.radians(solpos['zenith'].to_numpy())
+        myTMY3['azimuth'] = np.radians(solpos['azimuth'].to_numpy())
+        myTMY3['elevation']=np.radians(solpos['elevation'].to_numpy())
+
+    configurations = [(azimFlag, limit_angle, gcr, bt, kwargs)
+                      for limit_angle, gcr, bt in itertools.product(limit_angles, gcrs, backtrack)]
+    if verbose:
+        print("Tracker sweep of ", len(configurations), " configurations")
+
+    if n_jobs == 1:
+        _initTrackerSweep(myTMY3, meta)
+        try:
+            results = [_trackerSweepConfiguration(configuration) for configuration in configurations]
+        finally:
+            _initTrackerSweep(None, None)
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_initTrackerSweep,
+                                 initargs=(myTMY3, meta)) as executor:
+            results = list(executor.map(_trackerSweepConfiguration, configurations))
+
+    return pd.DataFrame(results, columns=['limit_angle', 'gcr', 'backtrack', 'front_insolation',
+                                          'rear_insolation', 'bifacial_ratio'])
+
 if __name__ == "__main__":    
 
     # IO Files
@@ -633,7 +886,7 @@ if __name__ == "__main__":
     PVbackSurface = "glass"     # PVbackSurface(glass or ARglass)
 
      # Calculate PV Output Through Various Methods    
-    calculateBilInterpol = True   # Only works with landscape at the moment.
+    calculateBilInterpol = True
     calculatePVMismatch = True
     portraitorlandscape='landscape'   # portrait or landscape
     cellsnum = 72
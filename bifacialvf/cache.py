@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Cache module - bounded in-memory caches used to reuse intermediate results
+between timesteps and between simulations.
+
+"""
+
+from __future__ import division, print_function, absolute_import
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    '''
+    Least-recently-used cache holding at most `maxsize` entries. When full,
+    the entry that was used least recently is evicted. Hits and misses are
+    counted so the effectiveness of the cache can be reported.
+
+    Parameters
+    ----------
+    maxsize : int
+        Maximum number of entries kept in memory.
+
+    Example:
+    cache = LRUCache(maxsize=1000)
+    value = cache.get(key)
+    if value is None:
+        value = expensivefunction(key)
+        cache.put(key, value)
+    '''
+
+    def __init__(self, maxsize=10000):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        ''' Returns the value stored for key (counted as a hit), or default
+        (counted as a miss) '''
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        ''' Stores value for key, evicting the least recently used entry if
+        the cache is full '''
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        ''' Removes all entries and resets the hit and miss counters '''
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self):
+        ''' Fraction of lookups that were hits, 0.0 if there were none '''
+        lookups = self.hits + self.misses
+        if lookups == 0:
+            return 0.0
+        return self.hits / lookups
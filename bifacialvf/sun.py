@@ -10,10 +10,13 @@ Sun module - solar helper files for bifacial-viewfactor
 
 from __future__ import division, print_function # ensure python3 compatible division and printing
 import math
+import os
+import hashlib
 import pandas as pd
 import pytz
 import pvlib
 import numpy as np
+from bifacialvf.cache import LRUCache
 
 def aOIcorrection(n2, inc):
         
@@ -45,6 +48,46 @@ def aOIcorrection(n2, inc):
             return cor;
            # End of AOIcorrection
 
+
+# Lookup tables for aOIcorrectionArray(lut=True), one per index of
+# refraction, built on first use on a grid of AOI_LUT_POINTS incident angles
+# from 0 to 90 degrees
+AOI_LUT_POINTS = 9001
+_AOI_LUT = {}
+
+def aOIcorrectionArray(n2, inc, lut=False):
+    # Array version of aOIcorrection. inc may be a NumPy array of incident
+    # angles in radians; the correction factor is returned for each, and
+    # -9999.0 outside 0 <= inc <= 90 degrees as in aOIcorrection.
+    #
+    # With lut=True the factor is linearly interpolated in a table precomputed
+    # once per index of refraction (e.g. 1.526 glass, 1.300 AR glass), on a
+    # 0.01 degree grid. The interpolation error is below 1e-6.
+
+    inc = np.asarray(inc, dtype=float)
+    valid = (inc >= 0.0) & (inc <= math.pi / 2.0)
+
+    if lut:
+        table = _AOI_LUT.get(n2)
+        if table is None:
+            grid = np.linspace(0.0, math.pi / 2.0, AOI_LUT_POINTS)
+            table = (grid, aOIcorrectionArray(n2, grid))
+            _AOI_LUT[n2] = table
+        cor = np.interp(inc, table[0], table[1])
+        return np.where(valid, cor, -9999.0)
+
+    r0 = math.pow((n2 - 1.0) / (n2 + 1), 2)	# Reflectance at normal incidence, Beckman p217
+    with np.errstate(divide='ignore', invalid='ignore'):
+        refrAng = np.arcsin(np.sin(inc) / n2)  # Refracted angle
+        r1 = (np.power(np.sin(refrAng - inc), 2.0) /
+              np.power(np.sin(refrAng + inc), 2.0))
+        r2 = (np.power(np.tan(refrAng - inc), 2.0) /
+              np.power(np.tan(refrAng + inc), 2.0))
+        cor = (1.0 - 0.5 * (r1 + r2)) / (1.0 - r0)   # Relative to normal incidence
+    cor = np.where(inc == 0, 1.0, cor)
+    return np.where(valid, cor, -9999.0)
+    # End of aOIcorrectionArray
+
 def hrSolarPos( year, month, day, hour, lat, lng, tz ):
  
 		
@@ -190,6 +233,163 @@ def julian(year, month, day):
     return jday;
 
 
+def julianArray(year, month, day):
+    # Array version of julian: julian day of year, with the same leap year
+    # rule (year % 4).
+    year = np.asarray(year); month = np.asarray(month); day = np.asarray(day)
+    cumdays = np.array([0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334])
+    jday = cumdays[month - 1] + day
+    return jday + np.where((year % 4 == 0) & (month > 2), 1, 0)
+
+
+def solarPosArray(year, month, day, hour, minute, lat, lng, tz, refraction=True):
+    # Array version of solarPos (Michalsky, same steps and constants). All
+    # time parameters may be NumPy arrays, and the same 8 values are returned
+    # as arrays: azm, zen, elv, dec, sunrise, sunset, Eo, tst
+    # With refraction=False the elevation and zenith are not corrected for
+    # atmospheric refraction.
+
+    pi=math.pi; DTOR=math.pi/180
+
+    jday = julianArray(year, month, day)    # Get julian day of year
+    year = np.asarray(year, dtype=float)
+    zulu = hour + np.asarray(minute, dtype=float)/60.0 - tz   # Convert local time to zulu time
+    delta = year - 1949
+    leap = np.trunc(delta/4)
+    jd = 32916.5 + delta*365 + leap + jday + zulu/24.0
+    time = jd - 51545.0    # Time in days referenced from noon 1 Jan 2000
+
+    def _remainder(x, y):
+        # iEEERemainder, and shifted to be positive
+        z = x - y*np.round(x/y)
+        return np.where(z < 0.0, z + y, z)
+
+    mnlong = _remainder(280.46 + 0.9856474*time, 360.0)    # Mean longitude between 0-360 deg
+    mnanom = _remainder(357.528 + 0.9856003*time, 360.0)*DTOR   # Mean anomaly between 0-2pi radians
+    eclong = mnlong + 1.915*np.sin(mnanom) + 0.020*np.sin(2.0*mnanom)
+    eclong = _remainder(eclong, 360.0)*DTOR    # Ecliptic longitude between 0-2pi radians
+
+    oblqec = (23.439 - 0.0000004*time)*DTOR    # Obliquity of ecliptic in radians
+    num = np.cos(oblqec)*np.sin(eclong)
+    den = np.cos(eclong)
+    ra = np.arctan(num/den)    # Right ascension in radians
+    ra = np.where(den < 0.0, ra + pi, np.where(num < 0.0, ra + 2.0*pi, ra))
+
+    dec = np.arcsin(np.sin(oblqec)*np.sin(eclong))    # Declination in radians
+
+    gmst = _remainder(6.697375 + 0.0657098242*time + zulu, 24.0)   # Greenwich mean sidereal time in hours
+    lmst = _remainder(gmst + lng/15.0, 24.0)*15.0*DTOR   # Local mean sidereal time in radians
+
+    ha = lmst - ra
+    ha = np.where(ha < -pi, ha + 2*pi, np.where(ha > pi, ha - 2*pi, ha))   # Hour angle in radians between -pi and pi
+
+    lat = lat*DTOR    # Change latitude to radians
+
+    arg = np.sin(dec)*np.sin(lat) + np.cos(dec)*np.cos(lat)*np.cos(ha)   # For elevation in radians
+    elv = np.where(arg > 1.0, pi/2.0, np.where(arg < -1.0, -pi/2.0, np.arcsin(np.clip(arg, -1.0, 1.0))))
+
+    # For solar azimuth in radians per Iqbal
+    with np.errstate(divide='ignore', invalid='ignore'):
+        arg = ((np.sin(elv)*np.sin(lat) - np.sin(dec))/(np.cos(elv)*np.cos(lat)))
+    azm = np.where(arg > 1.0, 0.0, np.where(arg < -1.0, pi, np.arccos(np.clip(arg, -1.0, 1.0))))
+    azm = np.where(((ha <= 0.0) & (ha >= -pi)) | (ha >= pi), pi - azm, pi + azm)
+    azm = np.where(np.cos(elv) == 0.0, pi, azm)    # Assign azimuth = 180 deg if elv = 90 or -90
+
+    elv = elv/DTOR    # Change to degrees for atmospheric correction
+    if refraction:
+        refrac = np.where(elv > -0.56,
+                          3.51561*(0.1594 + 0.0196*elv + 0.00002*elv*elv)/(1.0 + 0.505*elv + 0.0845*elv*elv),
+                          0.56)
+        elv = np.where(elv + refrac > 90.0, 90.0, elv + refrac)
+    elv = elv*DTOR    # Atmospheric corrected elevation(radians)
+
+    E = (mnlong - ra/DTOR)/15.0    # Equation of time in hours
+    E = np.where(E < -0.33, E + 24.0, np.where(E > 0.33, E - 24.0, E))
+
+    arg = -np.tan(lat)*np.tan(dec)
+    ws = np.where(arg >= 1.0, 0.0, np.where(arg <= -1.0, pi, np.arccos(np.clip(arg, -1.0, 1.0))))   # Sunrise hour angle in radians
+
+    # Sunrise and sunset in local standard time
+    sunrise = 12.0 - (ws/DTOR)/15.0 - (lng/15.0 - tz) - E
+    sunset = 12.0 + (ws/DTOR)/15.0 - (lng/15.0 - tz) - E
+
+    Eo = 1.00014 - 0.01671*np.cos(mnanom) - 0.00014*np.cos(2.0*mnanom)   # Earth-sun distance (AU)
+    Eo = 1.0/(Eo*Eo)    # Eccentricity correction factor
+    tst = hour + np.asarray(minute, dtype=float)/60.0 + (lng/15.0 - tz) + E   # True solar time (hr)
+    zen = 0.5*pi - elv    # Zenith angle
+
+    return azm, zen, elv, dec, sunrise, sunset, Eo, tst
+    # End of solarPosArray
+
+
+def hrSolarPosArray(year, month, day, hour, lat, lng, tz, refraction=True):
+    # Array version of hrSolarPos. For hourly data with hour at the end of the
+    # hour (1-24, or 0-23), the sun position is calculated at the midpoint of
+    # the part of the preceding hour that the sun is up, including the
+    # sunrise and sunset hours and the polar cases of hrSolarPos. Returns the
+    # same 9 values as arrays: azm, zen, elv, dec, sunrise, sunset, Eo, tst,
+    # suntime
+
+    DTOR=math.pi/180
+    hour = np.asarray(hour, dtype=float)
+
+    # sunrise/sunset using hour=12 and minute=0.0
+    sunrise, sunset = solarPosArray(year, month, day, 12, 0.0, lat, lng, tz)[4:6]
+
+    # "positive" values between 0 and 24
+    pSunrise = np.where(sunrise < 0.0, sunrise + 24.0, np.where(sunrise > 24.0, sunrise - 24.0, sunrise))
+    pSunset = np.where(sunset < 0.0, sunset + 24.0, np.where(sunset > 24.0, sunset - 24.0, sunset))
+
+    # Branches of hrSolarPos, in the same order
+    neverSets = sunset - sunrise > 23.99
+    neverRises = ~neverSets & (sunset - sunrise < 0.01)
+    other = ~neverSets & ~neverRises
+    riseHour = hour == np.trunc(pSunrise + 1.0)
+    summer = other & riseHour & (np.trunc(sunset + 50) - np.trunc(sunrise + 50) == 24)
+    winter = other & riseHour & ~summer & (np.trunc(sunrise) == np.trunc(sunset))
+    sunriseHour = other & riseHour & ~summer & ~winter
+    sunsetHour = other & ~riseHour & (hour == np.trunc(pSunset + 1.0))
+    dayHour = (other & ~riseHour & ~sunsetHour & (hour > np.trunc(sunrise + 1.0))
+               & (hour < np.trunc(sunset + 1.0)))
+
+    winterTime = sunset - sunrise
+    suntime = np.select([neverSets, summer, winter, sunriseHour, sunsetHour, dayHour],
+                        [1.0, pSunset + 1.0 - pSunrise, winterTime, hour - pSunrise,
+                         pSunset - hour + 1.0, 1.0], 0.0)
+    minute = np.select([summer, winter, sunriseHour, sunsetHour],
+                       [60.0*(1.0 - 0.5*(hour - pSunrise)),
+                        60.0*(pSunrise + 0.25*winterTime - hour + 1.0),
+                        60.0*(1.0 - 0.5*suntime),
+                        60.0*0.5*suntime], 30.0)
+
+    azm, zen, elv, dec, sunrise, sunset, Eo, tst = solarPosArray(
+        year, month, day, hour - 1, minute, lat, lng, tz, refraction)
+
+    twoCalls = summer | winter
+    if np.any(twoCalls):
+        # Sun rises and sets in the same hour: second position in the hour
+        minute2 = np.where(summer, 60.0*0.5*(pSunset - hour + 1.0),
+                           60.0*(pSunrise + 0.5*winterTime - hour + 1.0))
+        azm2, zen2, elv2, dec2, sunrise2, sunset2, Eo2, tst2 = solarPosArray(
+            year, month, day, hour - 1, minute2, lat, lng, tz, refraction)
+        # summer: average of the zenith and of the azimuth (past north)
+        azm1 = np.where(azm/DTOR < 180.0, azm + 360.0*DTOR, azm)
+        azmSummer = (azm1 + azm2)/2.0
+        azmSummer = np.where(azmSummer/DTOR > 360.0, azmSummer - 360.0*DTOR, azmSummer)
+        # winter: zenith at mid-height, everything else at the midpoint
+        zen = np.where(summer, (zen + zen2)/2.0, zen)
+        azm = np.where(summer, azmSummer, np.where(winter, azm2, azm))
+        elv = np.where(twoCalls, elv2, elv)
+        dec = np.where(twoCalls, dec2, dec)
+        sunrise = np.where(twoCalls, sunrise2, sunrise)
+        sunset = np.where(twoCalls, sunset2, sunset)
+        Eo = np.where(twoCalls, Eo2, Eo)
+        tst = np.where(twoCalls, tst2, tst)
+
+    return azm, zen, elv, dec, sunrise, sunset, Eo, tst, suntime
+    # End of hrSolarPosArray
+
+
 def perezComp(dn, df, alb, inc, tilt, zen):      
     #Modified version of the Perez model to also return separate values for the 
     #diffuse components - isotropic sky, circumsolar, horizon, and ground reflected;
@@ -329,6 +529,88 @@ def perezComp(dn, df, alb, inc, tilt, zen):
             poa = A + F1 * B + F2 * C + alb * (dn * CZ + D) * (1.0 - math.cos(tilt)) / 2.0 + dn * ZC;
             return poa, iso_dif, circ_dif, horiz_dif, grd_dif, beam;
             # End of perezComp
+
+
+def perezCompArray(dn, df, alb, inc, tilt, zen):
+    # Array version of perezComp. All parameters may be NumPy arrays (or
+    # scalars) that broadcast against each other, and each of the six returned
+    # components is an array of the broadcast shape:
+    #
+    # poa, iso_dif, circ_dif, horiz_dif, grd_dif, beam = perezCompArray(
+    #     dn, df, alb, inc, tilt, zen)
+    #
+    # The same formulas and branches as perezComp are used; the epsilon bins
+    # are found with np.searchsorted and the branches are masked selects, so
+    # results match perezComp to rounding (< 1e-12 W/m2).
+
+    F11R = np.array([-0.0083117, 0.1299457, 0.3296958, 0.5682053,
+                     0.8730280, 1.1326077, 1.0601591, 0.6777470])
+    F12R = np.array([0.5877285, 0.6825954, 0.4868735, 0.1874525,
+                     -0.3920403, -1.2367284, -1.5999137, -0.3272588])
+    F13R = np.array([-0.0620636, -0.1513752, -0.2210958, -0.2951290,
+                     -0.3616149, -0.4118494, -0.3589221, -0.2504286])
+    F21R = np.array([-0.0596012, -0.0189325, 0.0554140, 0.1088631,
+                     0.2255647, 0.2877813, 0.2642124, 0.1561313])
+    F22R = np.array([0.0721249, 0.0659650, -0.0639588, -0.1519229,
+                     -0.4620442, -0.8230357, -1.1272340, -1.3765031])
+    F23R = np.array([-0.0220216, -0.0288748, -0.0260542, -0.0139754,
+                     0.0012448, 0.0558651, 0.1310694, 0.2506212])
+    EPSBINS = np.array([1.065, 1.23, 1.5, 1.95, 2.8, 4.5, 6.2])
+    B2 = 0.000005534; DTOR = 0.01745329
+
+    dn, df, alb, inc, tilt, zen = np.broadcast_arrays(
+        *[np.asarray(a, dtype=float) for a in (dn, df, alb, inc, tilt, zen)])
+
+    dn = np.where(dn < 0.0, 0.0, dn)          # Negative values may be measured if cloudy
+    cosinc = np.cos(inc)
+    costilt = np.cos(tilt)
+    zero = np.zeros(dn.shape)
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        # Zen not between 0 and 87.5 deg: isotropic diffuse, plus beam if
+        # zen < 90 deg and incident < 90 deg
+        lowSun = (zen < 0.0) | (zen > 1.5271631)
+        dfLow = np.where(df < 0.0, 0.0, df)
+        lowBeam = (cosinc > 0.0) & (zen < 1.5707963)
+        isoLow = dfLow * (1.0 + costilt) / 2.0
+        beamLow = np.where(lowBeam, dn * cosinc, 0.0)
+
+        # Zen between 0 and 87.5 deg, diffuse is zero or less
+        noDiffuse = ~lowSun & (df <= 0.0)
+        beamNoDiffuse = np.where(cosinc > 0.0, dn * cosinc, 0.0)
+
+        # Zen between 0 and 87.5 deg, diffuse is greater than zero
+        CZ = np.cos(zen)
+        ZH = np.where(CZ > 0.0871557, CZ, 0.0871557)    # Maximum of 85 deg
+        D = df
+        ZENITH = zen / DTOR
+        AIRMASS = 1.0 / (CZ + 0.15 * np.power(93.9 - ZENITH, -1.253))
+        DELTA = D * AIRMASS / 1367.0
+        T = np.power(ZENITH, 3.0)
+        EPS = (dn + D) / D
+        EPS = (EPS + T * B2) / (1.0 + T * B2)
+        i = np.searchsorted(EPSBINS, EPS, side='left')   # First bin with EPS <= EPSBINS[i]
+        i = np.where(np.isnan(EPS), 0, i)
+        x = F11R[i] + F12R[i] * DELTA + F13R[i] * zen
+        F1 = np.where(0.0 > x, 0.0, x)
+        F2 = F21R[i] + F22R[i] * DELTA + F23R[i] * zen
+        ZC = np.where(cosinc < 0.0, 0.0, cosinc)
+        A = D * (1.0 + costilt) / 2.0
+        B = ZC / ZH * D - A
+        C = D * np.sin(tilt)
+        poaPerez = A + F1 * B + F2 * C + alb * (dn * CZ + D) * (1.0 - costilt) / 2.0 + dn * ZC
+
+        iso_dif = np.where(lowSun, isoLow,
+                           np.where(noDiffuse, zero, D * (1.0 - F1) * (1.0 + costilt) / 2.0))
+        circ_dif = np.where(lowSun | noDiffuse, zero, D * F1 * ZC / ZH)
+        horiz_dif = np.where(lowSun | noDiffuse, zero, F2 * C)
+        grd_dif = np.where(lowSun | noDiffuse, zero, alb * (dn * CZ + D) * (1.0 - costilt) / 2.0)
+        beam = np.where(lowSun, beamLow, np.where(noDiffuse, beamNoDiffuse, dn * ZC))
+        poa = np.where(lowSun, isoLow + beamLow,
+                       np.where(noDiffuse, beamNoDiffuse, poaPerez))
+
+    return poa, iso_dif, circ_dif, horiz_dif, grd_dif, beam
+    # End of perezCompArray
             
 
 def solarPos( year, month, day, hour, minute, lat, lng, tz ): 		
@@ -667,7 +949,96 @@ def sunIncident(mode, tilt, sazm, rlim, zen, azm):
          # End of sunIncident method
 
 
-def sunrisecorrectedsunposition(myTMY3, metdata, deltastyle = 'exact', verbose=False):
+def sunIncidentArray(mode, tilt, sazm, rlim, zen, azm):
+    # Array version of sunIncident. zen and azm (radians) may be NumPy arrays,
+    # and so may tilt, sazm and rlim (degrees), e.g. time-varying orientations.
+    # All broadcast against each other and inc, tiltr and sazmr are returned as
+    # arrays. The same branches and constants as sunIncident are used, as
+    # masked selects. Results match sunIncident to rounding, which is amplified
+    # by acos/asin for the sun near the surface normal (inc or tilt near 0).
+
+    pi=3.1415927;DTOR=0.017453293;
+
+    tilt, sazm, rlim, zen, azm = np.broadcast_arrays(
+        *[np.asarray(a, dtype=float) for a in (tilt, sazm, rlim, zen, azm)])
+
+    def _incident(tilt, sazm):
+        arg = np.sin(zen)*np.cos(azm-sazm)*np.sin(tilt) + np.cos(zen)*np.cos(tilt)
+        return np.where(arg < -1.0, pi, np.where(arg > 1.0, 0.0, np.arccos(np.clip(arg, -1.0, 1.0))))
+
+    if (mode == 0):               # Fixed-Tilt
+        tilt = tilt*DTOR    # Change tilt and surface azimuth to radians
+        sazm = sazm*DTOR
+        return _incident(tilt, sazm), tilt, sazm
+
+    if (mode == 1):                # One-Axis Tracking
+        xtilt = tilt*DTOR   # Change axis tilt, surface azimuth, and rotation limit to radians
+        xsazm = sazm*DTOR
+        rlim = rlim*DTOR
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Find rotation angle of axis for peak tracking, for vertical axis
+            rotVertical = np.where(xsazm <= pi,
+                                   np.where(azm <= xsazm + pi, azm - xsazm, azm - xsazm - 2.0*pi),
+                                   np.where(azm >= xsazm - pi, azm - xsazm, azm - xsazm + 2.0*pi))
+            # For other than vertical axis
+            arg = (np.sin(zen)*np.sin(azm-xsazm) /
+                   (np.sin(zen)*np.cos(azm-xsazm)*np.sin(xtilt) + np.cos(zen)*np.cos(xtilt)))
+            rot = np.where(arg < -99999.9, -pi/2.0, np.where(arg > 99999.9, pi/2.0, np.arctan(arg)))
+            # Put rot in II (positive rotation) or III (negative) quadrant if needed
+            positive = np.where(xsazm <= pi,
+                                (azm > xsazm) & (azm <= xsazm + pi),
+                                ~((azm < xsazm) & (azm >= xsazm - pi)))
+            rot = np.where(positive & (rot < 0.0), pi + rot, rot)
+            rot = np.where(~positive & (rot > 0.0), rot - pi, rot)
+            rot = np.where(np.abs(np.cos(xtilt)) < 0.001745, rotVertical, rot)
+
+            # Do not let rotation exceed physical constraints
+            rot = np.where(rot < -rlim, -rlim, np.where(rot > rlim, rlim, rot))
+            # Find tilt angle for the tracking surface
+            arg = np.cos(xtilt)*np.cos(rot)
+            tilt = np.where(arg < -1.0, pi, np.where(arg > 1.0, 0.0, np.arccos(np.clip(arg, -1.0, 1.0))))
+            # Find surface azimuth for the tracking surface
+            arg = np.sin(rot)/np.sin(tilt)
+            asinarg = np.arcsin(np.clip(arg, -1.0, 1.0))
+            sazm = np.where(arg < -1.0, 1.5*pi + xsazm,
+                   np.where(arg > 1.0, 0.5*pi + xsazm,
+                   np.where(rot < -0.5*pi, xsazm - pi - asinarg,
+                   np.where(rot > 0.5*pi, xsazm + pi - asinarg,
+                            asinarg + xsazm))))
+            sazm = np.where(sazm > 2.0*pi, sazm - 2.0*pi, np.where(sazm < 0.0, sazm + 2.0*pi, sazm))
+            sazm = np.where(tilt == 0.0, pi, sazm)     # Assign any value if tilt is zero
+        return _incident(tilt, sazm), tilt, sazm
+
+    if (mode == 2):                # Two-Axis Tracking
+        return np.zeros(zen.shape), zen, azm
+    # End of sunIncidentArray
+
+
+SOLAR_POSITION_METHODS = ('nrel_numpy', 'nrel_numba', 'nrel_c', 'pyephem', 'ephemeris', 'marion')
+
+def _spahow(solar_position_method):
+    # pvlib reloads (and for numba recompiles) its spa module whenever the
+    # numpy/numba flavour changes, so sunrise/sunset use the same flavour
+    # as the sun position
+    return 'numba' if solar_position_method == 'nrel_numba' else 'numpy'
+
+
+def _dailysunrisesunset(datetimetz, lat, lng, how='numpy'):
+    '''
+    pvlib's sun_rise_set_transit_spa solved once per local calendar day and
+    broadcast back to all timestamps of that day. The SPA sunrise, sunset and
+    transit only depend on the date, so the result is the same as solving
+    every timestamp, with 24 (hourly) to 1440 (1-minute data) times fewer solves.
+    '''
+    days = datetimetz.normalize()
+    sunup = pvlib.irradiance.solarposition.sun_rise_set_transit_spa(days.unique(), lat, lng, how=how)
+    sunup = sunup.reindex(days)
+    sunup.index = datetimetz
+    return sunup
+
+
+def sunrisecorrectedsunposition(myTMY3, metdata, deltastyle = 'exact', verbose=False,
+                                solar_position_method='nrel_numpy'):
     '''
     
     Calculate sun position, and correct for sunrise/sunset (for 1H interval data)
@@ -687,6 +1058,28 @@ def sunrisecorrectedsunposition(myTMY3, metdata, deltastyle = 'exact', verbose=F
         Sunrise at 7:24 AM, then sunposition will be set at 7:42 AM for the 8 AM timestamp.
         Sunset at 7:24 PM, then sunposition will be set at 7:12 PM for the 8 PM timestamp.
 
+    solar_position_method:
+        'nrel_numpy' (default) uses pvlib's SPA implementation.
+        'nrel_numba', 'nrel_c', 'pyephem' and 'ephemeris' are passed to
+        pvlib's get_solarposition. With 'nrel_numba' the sunrise/sunset solve
+        also uses numba; pvlib compiles its spa module the first time numba is
+        used in a process, see warmupSolarPosition.
+        'marion' uses the vectorized Marion/Michalsky algorithm of solarPos
+        (solarPosArray), for fast screening runs. Sunrise and sunset are taken
+        for the apparent sun disk edge as in SPA, and the same sunrise/sunset
+        hour corrections are applied. Compared to SPA over a year of hourly
+        timestamps (bundled Richmond TMY3 and EPW and Shanghai files):
+        above 10 degrees elevation zenith differs by less than 0.01 degrees;
+        with deltastyle='exact' the daylight timesteps (zenith < 90) are the
+        same but for at most 1 per year. With the hourly deltastyles the Marion
+        sunrise and sunset are within a minute of SPA, but when they fall
+        within that minute of the start of an hour the hour correction picks a
+        different sun time: 3 to 7 timesteps per year change between daylight
+        and night, and their zenith differs by up to 12 degrees (sun within 7
+        degrees of the horizon). Elsewhere in the sunrise and sunset hours the
+        zenith differs by up to 0.22 degrees. The calculation is about 10x
+        ('exact') and 5x (hourly deltastyles) faster than 'nrel_numpy'.
+
     '''
 
     lat = metdata['latitude']; lng = metdata['longitude']; tz = metdata['TZ']
@@ -707,20 +1100,35 @@ def sunrisecorrectedsunposition(myTMY3, metdata, deltastyle = 'exact', verbose=F
         interval = pd.Timedelta('1h') # ISSUE: if 1 datapoint is passed, are we sure it's hourly data?
         print ("TMY interval was unable to be defined, so setting it to 1h.")
 
+    if solar_position_method == 'marion':
+        def dailysunrisesunset():
+            return _mariondailysunrisesunset(datetimetz, lat, lng, tz)
+        def solarposition(times):
+            return _marionsolarposition(times, lat, lng, tz)
+    elif solar_position_method not in SOLAR_POSITION_METHODS:
+        raise ValueError("solar_position_method must be one of %s" % (SOLAR_POSITION_METHODS,))
+    else:
+        how = _spahow(solar_position_method)
+        def dailysunrisesunset():
+            return _dailysunrisesunset(datetimetz, lat, lng, how)
+        def solarposition(times):
+            return pvlib.irradiance.solarposition.get_solarposition(times, lat, lng, elev,
+                                                                    method=solar_position_method)
+
     if deltastyle == 'exact':
         if verbose:
             print("Calculating Sun position with no delta, for exact timestamp in input Weather File")
-        solpos = pvlib.irradiance.solarposition.get_solarposition(datetimetz,lat, lng, elev)
+        solpos = solarposition(datetimetz)
         solpos['Sun position time'] = solpos.index
         solpos.index = datetimetz  #this has the original time data in it
-        sunup= pvlib.irradiance.solarposition.sun_rise_set_transit_spa(datetimetz, lat, lng) 
+        sunup= dailysunrisesunset()
         return solpos, sunup
     else: 
         if interval== pd.Timedelta('1h'):
             if deltastyle == 'TMY3':
                 if verbose:
                     print("Calculating Sun position with a delta of -30 mins. i.e. 12 is 11:30 sunpos")
-                sunup= pvlib.irradiance.solarposition.sun_rise_set_transit_spa(datetimetz, lat, lng) 
+                sunup= dailysunrisesunset()
     
                 sunup['minutedelta']= int(interval.seconds/2/60) # default sun angle 30 minutes before timestamp
                 # vector update of minutedelta at sunrise
@@ -735,7 +1143,7 @@ def sunrisecorrectedsunposition(myTMY3, metdata, deltastyle = 'exact', verbose=F
             elif deltastyle == 'PVSyst' or 'SAM':
                 if verbose:
                     print("Calculating Sun position with a delta of +30 mins. i.e. 12 is 12:30 sunpos")
-                sunup= pvlib.irradiance.solarposition.sun_rise_set_transit_spa(datetimetz, lat, lng) 
+                sunup= dailysunrisesunset()
         
                 sunup['minutedelta']= int(interval.seconds/2/60) # default sun angle 30 minutes after timestamp
                 # vector update of minutedelta at sunrise
@@ -755,10 +1163,146 @@ def sunrisecorrectedsunposition(myTMY3, metdata, deltastyle = 'exact', verbose=F
                 print("If you want no delta for sunposition, run simulation with input variable deltastyle='exact'")
             #datetimetz=datetimetz-pd.Timedelta(minutes = minutedelta)   # This doesn't check for Sunrise or Sunset
             #sunup= pvlib.irradiance.solarposition.get_sun_rise_set_transit(datetimetz, lat, lon) # deprecated in pvlib 0.6.1
-            sunup= pvlib.irradiance.solarposition.sun_rise_set_transit_spa(datetimetz, lat, lng) #new for pvlib >= 0.6.1
+            sunup= dailysunrisesunset() #new for pvlib >= 0.6.1
             sunup['corrected_timestamp'] = sunup.index-pd.Timedelta(minutes = minutedelta)
 
-        solpos = pvlib.irradiance.solarposition.get_solarposition(sunup['corrected_timestamp'],lat,lng,elev)   
+        solpos = solarposition(sunup['corrected_timestamp'])
         solpos['Sun position time'] = solpos.index
         solpos.index = datetimetz  #this has the original time data in it
-        return solpos, sunup
\ No newline at end of file
+        return solpos, sunup
+
+
+def warmupSolarPosition(solar_position_method='nrel_numba'):
+    '''
+    Pays the one-time set-up cost of a solar position method, for example as
+    the initializer of pool workers before they run simulate() for several
+    plants. For 'nrel_numba' pvlib compiles its spa module with numba when it
+    is first used in a process (several seconds); this does it on two
+    timestamps so the plants of that worker don't pay for it. Other methods
+    are cheap to warm up, and 'nrel_numpy' also switches pvlib back to its
+    numpy spa module if numba was used before.
+
+    Returns the seconds spent.
+    '''
+    import time
+    start = time.time()
+    metdata = {'latitude': 40.0, 'longitude': -105.0, 'TZ': -7, 'altitude': 1600.0}
+    index = pd.date_range('2021-06-21 11:00', periods=2, freq='1h')
+    sunrisecorrectedsunposition(pd.DataFrame(index=index), metdata, deltastyle='TMY3',
+                                solar_position_method=solar_position_method)
+    return time.time() - start
+
+
+SOLPOS_CACHE = LRUCache(maxsize=32)
+
+def solarPositionCacheKey(myTMY3, metdata, deltastyle='exact',
+                          solar_position_method='nrel_numpy'):
+    '''
+    Key identifying a sun position calculation: a hash of the timestamps
+    (and their timezone), latitude, longitude, altitude, TZ, deltastyle and
+    solar_position_method. Returned as a hex string so it can also be used
+    as a file name for the on-disk store.
+    '''
+    index = pd.DatetimeIndex(myTMY3.index)
+    timestamps = hashlib.sha1(index.asi8.tobytes())
+    timestamps.update(str(index.tz).encode())
+    key = (timestamps.hexdigest(), float(metdata['latitude']), float(metdata['longitude']),
+           float(metdata['altitude']), float(metdata['TZ']), deltastyle, solar_position_method)
+    return hashlib.sha1(repr(key).encode()).hexdigest()
+
+
+def cachedsunrisecorrectedsunposition(myTMY3, metdata, deltastyle='exact', verbose=False,
+                                      solar_position_method='nrel_numpy',
+                                      cache=None, cachedir=None):
+    '''
+    sunrisecorrectedsunposition with results reused between calls, e.g. for
+    the many simulate() runs of a parametric study on the same weather data.
+
+    Results are kept in the in-memory LRU cache `cache` (default: the module
+    cache SOLPOS_CACHE) and, if `cachedir` is given, also stored in that
+    directory as pickle files named by solarPositionCacheKey, so they can be
+    reused by other processes and later sessions. Copies are returned, so the
+    cached results can't be modified by the caller.
+
+    Returns solpos, sunup as sunrisecorrectedsunposition.
+    '''
+    if cache is None:
+        cache = SOLPOS_CACHE
+
+    key = solarPositionCacheKey(myTMY3, metdata, deltastyle=deltastyle,
+                                solar_position_method=solar_position_method)
+    result = cache.get(key)
+
+    if result is None and cachedir is not None:
+        filename = os.path.join(cachedir, 'solpos_%s.pkl' % key)
+        if os.path.isfile(filename):
+            if verbose:
+                print("Loading Sun position from ", filename)
+            result = pd.read_pickle(filename)
+            cache.put(key, result)
+
+    if result is None:
+        result = sunrisecorrectedsunposition(myTMY3, metdata, deltastyle=deltastyle, verbose=verbose,
+                                             solar_position_method=solar_position_method)
+        cache.put(key, result)
+        if cachedir is not None:
+            os.makedirs(cachedir, exist_ok=True)
+            # write to a temporary file first so parallel runs never read a partial file
+            tmpname = os.path.join(cachedir, 'solpos_%s.%d.tmp' % (key, os.getpid()))
+            pd.to_pickle(result, tmpname)
+            os.replace(tmpname, os.path.join(cachedir, 'solpos_%s.pkl' % key))
+    elif verbose:
+        print("Reusing cached Sun position")
+
+    solpos, sunup = result
+    return solpos.copy(), sunup.copy()
+
+
+def _mariondailysunrisesunset(datetimetz, lat, lng, tz):
+    '''
+    Sunrise, sunset and transit of the local calendar day of each timestamp
+    with the Marion (Michalsky) algorithm of solarPosArray, for the apparent
+    sun disk edge (0.8333 degrees below the horizon) as in pvlib's SPA, so
+    the sunrise and sunset hour corrections of sunrisecorrectedsunposition
+    pick the same hours as with SPA. Indexed like datetimetz.
+    '''
+    DTOR = 0.017453293
+    days = datetimetz.normalize()
+    unique = days.unique()
+    dec, sunrise, sunset = solarPosArray(unique.year.values, unique.month.values, unique.day.values,
+                                         12, 0.0, lat, lng, tz)[3:6]
+    # solarPosArray gives the geometric sunrise; move both to the apparent horizon
+    latr = lat*DTOR
+    wsgeometric = np.arccos(np.clip(-np.tan(latr)*np.tan(dec), -1.0, 1.0))
+    wsapparent = np.arccos(np.clip((np.sin(-0.8333*DTOR) - np.sin(latr)*np.sin(dec)) /
+                                   (np.cos(latr)*np.cos(dec)), -1.0, 1.0))
+    widening = (wsapparent - wsgeometric)/DTOR/15.0     # hours
+    sunrise = sunrise - widening
+    sunset = sunset + widening
+    sunup = pd.DataFrame({'sunrise': unique + pd.to_timedelta(sunrise, unit='h'),
+                          'sunset': unique + pd.to_timedelta(sunset, unit='h'),
+                          'transit': unique + pd.to_timedelta((sunrise + sunset)/2, unit='h')},
+                         index=unique)
+    sunup = sunup.reindex(days)
+    sunup.index = datetimetz
+    return sunup
+
+
+def _marionsolarposition(times, lat, lng, tz):
+    '''
+    Sun position at times (local standard time) with the vectorized Marion
+    (Michalsky) algorithm, as a DataFrame with the columns of pvlib's
+    get_solarposition: zenith, apparent_zenith, elevation, apparent_elevation
+    and azimuth (degrees), indexed by times.
+    '''
+    times = pd.DatetimeIndex(times)
+    year, month, day = times.year.values, times.month.values, times.day.values
+    hour, minute = times.hour.values, times.minute.values + times.second.values/60.0
+    azm, zen, elv = solarPosArray(year, month, day, hour, minute, lat, lng, tz,
+                                  refraction=False)[:3]
+    appzen, appelv = solarPosArray(year, month, day, hour, minute, lat, lng, tz)[1:3]
+    return pd.DataFrame({'apparent_zenith': np.degrees(appzen),
+                         'zenith': np.degrees(zen),
+                         'apparent_elevation': np.degrees(appelv),
+                         'elevation': np.degrees(elv),
+                         'azimuth': np.degrees(azm)}, index=times)
@@ -0,0 +1,407 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the analysis module (PVMismatch and bilinear interpolation of the
+view factor results).
+"""
+import os
+import shutil
+import pytest
+import numpy as np
+import pandas as pd
+import bifacialvf
+from bifacialvf.analysis import MismatchEvaluator, getMismatchEvaluator
+from bifacialvf.analysis import setupforPVMismatch, calculateVFPVMismatch
+from bifacialvf.analysis import analyseVFResultsPVMismatch, analyseVFResultsBilInterpol
+
+TESTDIR = os.path.dirname(__file__)  # this folder
+
+FRONT = np.array([[900, 880, 870, 860, 850, 800],
+                  [0.5, 0.5, 0.4, 0.4, 0.3, 0.3],
+                  [420, 425, 430, 428, 426, 415]], dtype=float)
+BACK = np.array([[100, 120, 140, 150, 160, 190],
+                 [0.1, 0.1, 0.1, 0.1, 0.1, 0.1],
+                 [60, 55, 50, 52, 58, 70]], dtype=float)
+
+
+@pytest.mark.parametrize('portraitorlandscape', ['landscape', 'portrait'])
+def test_MismatchEvaluator(portraitorlandscape):
+    evaluator = getMismatchEvaluator(72, portraitorlandscape, 0.9)
+    assert getMismatchEvaluator(72, portraitorlandscape, 0.9) is evaluator
+    PowerAveraged, PowerDetailed = evaluator.evaluate_batch(FRONT, BACK)
+    assert PowerAveraged[1] == 0 and PowerDetailed[1] == 0  # dark hour
+    assert (PowerDetailed <= PowerAveraged + 1e-9).all()
+    assert PowerAveraged[0] > PowerAveraged[2] > 0
+    # a newly built module gives the same results
+    fresh = MismatchEvaluator(72, portraitorlandscape, 0.9)
+    for i in range(len(FRONT)):
+        assert np.allclose(fresh.evaluate(FRONT[i], BACK[i]),
+                           (PowerAveraged[i], PowerDetailed[i]))
+    stdpl, cellsx, cellsy = setupforPVMismatch(portraitorlandscape, 6, 72)
+    assert np.allclose(calculateVFPVMismatch(stdpl, cellsx, cellsy, 6, FRONT[0], BACK[0], 0.9),
+                       (PowerAveraged[0], PowerDetailed[0]))
+
+
+def test_calculateVFPVMismatch_stdpl():
+    '''
+    A cell placement other than the layout one is passed to PVMismatch.
+    '''
+    stdpl, cellsx, cellsy = setupforPVMismatch('landscape', 6, 72)
+    front = np.array(FRONT[0]); front[0] = 200.0    # first row shaded
+    back = np.array(BACK[0])
+    # the cells of the module numbered along the rows instead of the columns
+    rowwise = setupforPVMismatch('portrait', 6, 72)[0].reshape(cellsy, cellsx)
+    PowerAveraged, PowerDetailed = calculateVFPVMismatch(stdpl, cellsx, cellsy, 6, front, back, 0.9)
+    rowwiseAveraged, rowwiseDetailed = calculateVFPVMismatch(rowwise, cellsx, cellsy, 6, front, back, 0.9)
+    assert np.isclose(rowwiseAveraged, PowerAveraged)
+    assert rowwiseDetailed < 0.6 * PowerDetailed
+    # flipping the placement is the same as flipping the irradiances
+    assert np.allclose(calculateVFPVMismatch(np.flipud(rowwise), cellsx, cellsy, 6, front[::-1], back[::-1], 0.9),
+                       (rowwiseAveraged, rowwiseDetailed))
+    assert calculateVFPVMismatch(stdpl[:, :5], cellsx, cellsy, 6, front, back, 0.9) is None
+
+
+def test_MismatchEvaluator_invalid():
+    with pytest.raises(ValueError):
+        MismatchEvaluator(numcells=50)
+
+
+def test_ModuleLayout():
+    '''
+    The registered layouts reproduce the PVMismatch standard modules, and
+    other modules (half-cut too) can be evaluated.
+    '''
+    from pvmismatch.pvmismatch_lib import pvmodule
+    from bifacialvf.analysis import getModuleLayout, registerModuleLayout, _cellCenterValues
+    assert getModuleLayout(72).cell_pos == pvmodule.STD72
+    assert getModuleLayout(96).cell_pos == pvmodule.STD96
+    stdpl, cellsx, cellsy = setupforPVMismatch('portrait', 6, 96)
+    assert (cellsx, cellsy) == (8, 12)
+    assert list(stdpl[1]) == [1, 22, 25, 46, 49, 70, 73, 94]
+    stdpl, cellsx, cellsy = setupforPVMismatch('landscape', 6, 144)
+    assert (cellsx, cellsy) == (24, 6) and sorted(stdpl.ravel()) == list(range(144))
+    with pytest.raises(ValueError):
+        getModuleLayout(50)
+    with pytest.raises(ValueError):
+        registerModuleLayout(50, 10, [2, 2, 2])
+
+    # half-cut: the halves of the module are in parallel, so shading the
+    # lower half loses much less power than in a full cell module
+    front = [[1000.0] * 6, [1000.0] * 3 + [200.0] * 3]
+    PowerAveraged, PowerDetailed = MismatchEvaluator(120, 'portrait').evaluate_batch(front, [[0.0] * 6] * 2)
+    FullAveraged, FullDetailed = MismatchEvaluator(60, 'portrait').evaluate_batch(front, [[0.0] * 6] * 2)
+    assert np.isclose(PowerAveraged[0], FullAveraged[0], rtol=1e-2)
+    assert PowerDetailed[1] > 2 * FullDetailed[1]
+    assert MismatchEvaluator(66, 'landscape').evaluate(FRONT[0], BACK[0])[1] > 0
+
+    # the precomputed resampling from sensors to cell rows is np.interp
+    GTI = np.random.default_rng(0).uniform(0, 1000, (5, 7))
+    assert np.allclose(_cellCenterValues(GTI, 20),
+                       [np.interp(np.linspace(0, 6, 20), range(7), row) for row in GTI], rtol=1e-14)
+
+
+@pytest.mark.parametrize('portraitorlandscape', ['landscape', 'portrait'])
+def test_MismatchEvaluator_cell_iv_resolution(portraitorlandscape):
+    '''
+    The module powers with the tabulated cell IV curves match PVMismatch within
+    the interpolation between grid irradiances, and exactly on the grid.
+    '''
+    evaluator = getMismatchEvaluator(72, portraitorlandscape, 0.9)
+    tabulated = MismatchEvaluator(72, portraitorlandscape, 0.9, cell_iv_resolution=1.0)
+    front = np.vstack([FRONT, [[1500.0] * 6]])
+    back = np.vstack([BACK, [[0.0] * 6]])
+    PowerAveraged, PowerDetailed = evaluator.evaluate_batch(front, back)
+    TAveraged, TDetailed = tabulated.evaluate_batch(front, back)
+    assert np.allclose(TAveraged, PowerAveraged, rtol=1e-4)
+    assert np.allclose(TDetailed, PowerDetailed, rtol=1e-4)
+    assert np.isclose(TAveraged[3], PowerAveraged[3], rtol=1e-12)  # above the grid: PVMismatch
+    grid, Icell, Vcell = tabulated.cellIVTable()
+    assert Icell.shape == (1400, 303) and tabulated.cellIVTable()[1] is Icell
+    cellsuns = np.ones((tabulated.cellsy, tabulated.cellsx)) * grid[np.arange(tabulated.cellsy) * 100 + 99, None]
+    assert np.isclose(tabulated.pmp(cellsuns), evaluator.pmp(cellsuns), rtol=1e-12)
+
+
+def test_MismatchEvaluator_pmp_cache():
+    evaluator = MismatchEvaluator(72, 'landscape', 1.0)
+    front = np.vstack([FRONT[0], FRONT[0], FRONT[2]])
+    back = np.vstack([BACK[0], BACK[0], BACK[2]])
+    PowerAveraged, PowerDetailed = evaluator.evaluate_batch(front, back)
+    assert (evaluator.pmpCache.hits, evaluator.pmpCache.misses) == (2, 4)
+    assert PowerDetailed[0] == PowerDetailed[1]
+
+    # 5 W/m2 steps: patterns closer than that share a solve
+    quantized = MismatchEvaluator(72, 'landscape', 1.0, pmp_cache_resolution=5.0)
+    QAveraged, QDetailed = quantized.evaluate_batch(front + [[0.4] * 6, [0.6] * 6, [0.0] * 6], back)
+    assert quantized.pmpCache.misses == 4
+    assert np.allclose(QAveraged, PowerAveraged, rtol=5e-3)
+    assert np.allclose(QDetailed, PowerDetailed, rtol=5e-3)
+
+
+@pytest.mark.parametrize('analyse, ending', [
+    (analyseVFResultsPVMismatch, '_PVMismatch.csv'),
+    (analyseVFResultsBilInterpol, '_BilInterpol.csv')])
+def test_analyseVFResults_n_jobs(tmpdir, analyse, ending):
+    '''
+    Splitting the hours across worker processes gives the same output file.
+    '''
+    results = []
+    for n_jobs in [1, 2]:
+        inputfile = os.path.join(str(tmpdir), 'jobs%d.csv' % n_jobs)
+        shutil.copy(os.path.join(TESTDIR, 'Test_RICHMOND_mismatch.csv'), inputfile)
+        analyse(filename=inputfile, portraitorlandscape='landscape', n_jobs=n_jobs)
+        results.append(pd.read_csv(inputfile.replace('.csv', ending), skiprows=2))
+    pd.testing.assert_frame_equal(results[0], results[1])
+
+
+def test_analyseVFResultsPVMismatch_output_df(tmpdir):
+    '''
+    Results passed in memory give the same powers as the results file, and
+    nothing is written unless writefilename is passed.
+    '''
+    inputfile = os.path.join(str(tmpdir), 'results.csv')
+    shutil.copy(os.path.join(TESTDIR, 'Test_RICHMOND_mismatch.csv'), inputfile)
+    fromfile = analyseVFResultsPVMismatch(filename=inputfile, portraitorlandscape='landscape')
+    (data, metadata) = bifacialvf.loadVFresults(inputfile)
+    inmemory = analyseVFResultsPVMismatch(output_df=data, portraitorlandscape='landscape')
+    assert sorted(os.listdir(str(tmpdir))) == ['results.csv', 'results_PVMismatch.csv']
+    assert 'PVMismatch FRONT + BACK (Averaged) PmaxIdeal [W]' not in data
+    pd.testing.assert_frame_equal(inmemory, fromfile)
+
+    writefilename = os.path.join(str(tmpdir), 'inmemory.csv')
+    analyseVFResultsPVMismatch(output_df=data, portraitorlandscape='landscape',
+                               writefilename=writefilename)
+    written = pd.read_csv(writefilename, skiprows=2)
+    assert np.allclose(written['PVMismatch FRONT + BACK (Detailed) PmaxUnmatched [W]'],
+                       fromfile['PVMismatch FRONT + BACK (Detailed) PmaxUnmatched [W]'])
+    assert pd.read_csv(writefilename, nrows=1)['MismatchEngine'][0] == 'pvmismatch'
+
+
+@pytest.mark.parametrize('batch, singlehour, numsens', [
+    ('LandscapeBatch', 'LandscapeSingleHour', 6),
+    ('PortraitBatch', 'PortraitSingleHour', 12)])
+def test_BilinearBatch(batch, singlehour, numsens):
+    '''
+    The batched bilinear interpolation matches the single hour routine hour by
+    hour, including dark hours and irradiances and temperatures clipped to the grids.
+    '''
+    params = bifacialvf.analysis.setupforBilinearInterpolation()
+    front = np.vstack([FRONT, [[1300.0] * 6]])
+    back = np.vstack([BACK, [[250.0] * 6]])
+    if numsens == 12:
+        front = np.hstack([front, front[:, ::-1] * 0.95])
+        back = np.hstack([back, back[:, ::-1] * 1.1])
+    Tamb = np.array([25.0, -20.0, 10.0, 45.0])
+    VWind = np.array([1.0, 0.0, 5.5, 2.0])
+    calculator = getattr(bifacialvf, batch)(*params, chunksize=3)
+    PmaxIdeal, PmaxUnmatched, PmaxAvg = calculator.calculate(front, back, Tamb, VWind, numsens)
+    for i in range(len(front)):
+        assert np.allclose((PmaxIdeal[i], PmaxUnmatched[i], PmaxAvg[i]),
+                           getattr(bifacialvf, singlehour)(front[i], back[i], Tamb[i], VWind[i], numsens, *params),
+                           rtol=1e-12)
+    assert (PmaxUnmatched <= PmaxIdeal + 1e-9).all()
+
+
+@pytest.mark.parametrize('singlehour, numsens', [('LandscapeSingleHour', 6), ('PortraitSingleHour', 12)])
+def test_SingleHour_threads(singlehour, numsens):
+    '''
+    The single hour routines keep no module state: concurrent calls from
+    threads give the same results as calls one after the other.
+    '''
+    from concurrent.futures import ThreadPoolExecutor
+    params = bifacialvf.analysis.setupforBilinearInterpolation()
+    front = np.tile(np.hstack([FRONT, FRONT])[:, :numsens], (4, 1)) * np.linspace(0.5, 1.2, 12)[:, None]
+    back = np.tile(np.hstack([BACK, BACK])[:, :numsens], (4, 1))
+    calculate = getattr(bifacialvf, singlehour)
+    serial = [calculate(front[i], back[i], 25.0, 1.0, numsens, *params) for i in range(len(front))]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        threaded = list(pool.map(lambda i: calculate(front[i], back[i], 25.0, 1.0, numsens, *params), range(len(front))))
+    assert threaded == serial
+    assert not hasattr(getattr(bifacialvf.BF_BifacialIrradiances, singlehour), 'PmaxIdeal')
+
+    (data, metadata) = bifacialvf.loadVFresults(os.path.join(TESTDIR, 'Test_RICHMOND_mismatch.csv'))
+    portraitorlandscape = 'landscape' if numsens == 6 else 'portrait'
+    results = analyseVFResultsBilInterpol(output_df=data, portraitorlandscape=portraitorlandscape)
+    threads = analyseVFResultsBilInterpol(output_df=data, portraitorlandscape=portraitorlandscape, n_jobs=2,
+                                          executor='threads')
+    pd.testing.assert_frame_equal(threads, results)
+    with pytest.raises(ValueError):
+        analyseVFResultsBilInterpol(output_df=data, executor='fibers')
+
+
+def test_analyseVFResultsBilInterpol_portrait():
+    '''
+    Portrait resamples the 6 sensors to 12 cell rows, like
+    calculateVFBilinearInterpolation does hour by hour.
+    '''
+    (data, metadata) = bifacialvf.loadVFresults(os.path.join(TESTDIR, 'Test_RICHMOND_mismatch.csv'))
+    results = analyseVFResultsBilInterpol(output_df=data, portraitorlandscape='portrait')
+    params = bifacialvf.analysis.setupforBilinearInterpolation()
+    frontGTI = data[[col for col in data if col.endswith('RowFrontGTI')]].to_numpy()
+    backGTI = data[[col for col in data if col.endswith('RowBackGTI')]].to_numpy()
+    for i in range(len(data)):
+        expected = bifacialvf.analysis.calculateVFBilinearInterpolation('portrait', 6, *params, frontGTI[i], backGTI[i],
+                                                                        data['Tamb'][i], data['VWind'][i])
+        assert np.allclose((results['BilInterpol FRONT + BACK (Averaged) PmaxIdeal [W]'][i],
+                            results['BilInterpol FRONT + BACK (Detailed) PmaxUnmatched [W]'][i]), expected, rtol=1e-12)
+        # front only is evaluated without the rear irradiance
+        expected = bifacialvf.analysis.calculateVFBilinearInterpolation('portrait', 6, *params, frontGTI[i], 0 * backGTI[i],
+                                                                        data['Tamb'][i], data['VWind'][i])
+        assert np.allclose((results['BilInterpol FRONT ONLY (Averaged) PmaxIdeal [W]'][i],
+                            results['BilInterpol FRONT ONLY (Detailed) PmaxUnmatched [W]'][i]), expected, rtol=1e-12)
+    assert (results['BilInterpol FRONT ONLY (Averaged) PmaxIdeal [W]'] <
+            results['BilInterpol FRONT + BACK (Averaged) PmaxIdeal [W]']).all()
+    landscape = analyseVFResultsBilInterpol(output_df=data, portraitorlandscape='landscape')
+    assert not np.allclose(results['BilInterpol FRONT + BACK (Detailed) PmaxUnmatched [W]'],
+                           landscape['BilInterpol FRONT + BACK (Detailed) PmaxUnmatched [W]'])
+    with pytest.raises(ValueError):
+        analyseVFResultsBilInterpol(output_df=data, portraitorlandscape='sideways')
+
+
+def test_loadBilinearInterpolationParams(tmpdir):
+    '''
+    Registered parameters are converted once to .npy files, memory-mapped and
+    kept for the next calls.
+    '''
+    from scipy.io import loadmat
+    from bifacialvf.analysis import BILINEARPARAMSDIR, loadBilinearInterpolationParams
+    from bifacialvf.analysis import registerBilinearInterpolationParams, setupforBilinearInterpolation
+    for matfile in ['IVArrayYingli.mat', 'newBilinearParamsYingli.mat']:
+        shutil.copy(os.path.join(BILINEARPARAMSDIR, matfile), str(tmpdir))
+    registerBilinearInterpolationParams('test', os.path.join(str(tmpdir), 'IVArrayYingli.mat'),
+                                        os.path.join(str(tmpdir), 'newBilinearParamsYingli.mat'), interpolA=0.01)
+    try:
+        interpolA, IVArray, beta_voc_all, m_all, bee_all = setupforBilinearInterpolation('test')
+        assert interpolA == 0.01
+        assert isinstance(IVArray, np.memmap)
+        assert np.array_equal(IVArray, loadmat(os.path.join(BILINEARPARAMSDIR, 'IVArrayYingli.mat'))['IVArray'])
+        assert np.array_equal(bee_all, loadmat(os.path.join(BILINEARPARAMSDIR, 'newBilinearParamsYingli.mat'))['bee_all'])
+        assert sorted(f for f in os.listdir(str(tmpdir)) if f.endswith('.npy')) == [
+            'IVArrayYingli_IVArray.npy', 'newBilinearParamsYingli_bee_all.npy',
+            'newBilinearParamsYingli_beta_voc_all.npy', 'newBilinearParamsYingli_m_all.npy']
+        assert loadBilinearInterpolationParams('test')[1] is IVArray
+    finally:
+        bifacialvf.analysis._BILINEAR_REGISTRY.pop('test')
+        bifacialvf.analysis._BILINEAR_PARAMS.pop('test')
+    with pytest.raises(ValueError):
+        loadBilinearInterpolationParams('test')
+
+
+def _syntheticHours(nhours, seed):
+    ''' Random daylight hours of front and back irradiances with the rear
+    irradiance higher at the module edges, and Tamb '''
+    rng = np.random.default_rng(seed)
+    suns = rng.uniform(100, 1000, (nhours, 1))
+    front = suns * (1 + rng.uniform(-0.03, 0.03, (nhours, 1)) * np.linspace(-1, 1, 6))
+    back = suns * rng.uniform(0.05, 0.25, (nhours, 1)) * (1 + rng.uniform(0, 0.6, (nhours, 1)) * np.linspace(-1, 1, 6)**2)
+    return front, back, rng.uniform(0, 35, nhours)
+
+
+def test_MismatchSurrogate():
+    '''
+    The surrogate fitted on sampled hours reproduces the full model on hours
+    it never sampled, and hours outside its training domain use the full model.
+    '''
+    from bifacialvf.analysis import MismatchSurrogate
+    frontGTI, backGTI, Tamb = _syntheticHours(400, seed=1)
+    surrogate = MismatchSurrogate(72, 'landscape').fit(frontGTI, backGTI, Tamb, nsamples=200)
+    assert surrogate.holdout_rmse < 1e-3
+    # other hours, with Tamb out of the training range, which is not checked
+    frontGTI, backGTI, Tamb = _syntheticHours(50, seed=2)
+    PowerAveraged, PowerDetailed = surrogate.evaluate_batch(frontGTI, backGTI, Tamb + 50)
+    Averaged, Detailed = getMismatchEvaluator(72, 'landscape', 1.0).evaluate_batch(frontGTI, backGTI)
+    assert surrogate.fallbacks < 5
+    assert np.allclose(PowerAveraged, Averaged, rtol=1e-3)
+    assert np.allclose(PowerDetailed, Detailed, rtol=2e-3)
+
+    # much more nonuniform than any training hour: full model
+    fallbacks = surrogate.fallbacks
+    PowerAveraged, PowerDetailed = surrogate.evaluate_batch(FRONT[:1], BACK[:1] * 5, 20.0)
+    assert surrogate.fallbacks == fallbacks + 1
+    assert np.allclose((PowerAveraged[0], PowerDetailed[0]),
+                       getMismatchEvaluator(72, 'landscape', 1.0).evaluate(FRONT[0], BACK[0] * 5))
+
+    (data, metadata) = bifacialvf.loadVFresults(os.path.join(TESTDIR, 'Test_RICHMOND_mismatch.csv'))
+    Detailed = getMismatchEvaluator(72, 'landscape', 1.0).evaluate_batch(
+        data[[col for col in data if col.endswith('RowFrontGTI')]].to_numpy(dtype=float),
+        data[[col for col in data if col.endswith('RowBackGTI')]].to_numpy(dtype=float))[1]
+    results = analyseVFResultsPVMismatch(output_df=data, portraitorlandscape='landscape', surrogate=surrogate)
+    assert np.allclose(results['Surrogate FRONT + BACK (Detailed) PmaxUnmatched [W]'], Detailed, rtol=2e-2)
+    assert 'PVMismatch FRONT + BACK (Detailed) PmaxUnmatched [W]' not in results
+    assert results.attrs['MismatchEngine'] == 'pvmismatch'
+    assert results.attrs['MismatchSurrogate'] == surrogate.holdout_rmse
+    with pytest.raises(ValueError):
+        analyseVFResultsPVMismatch(output_df=data, surrogate=surrogate, mismatch_engine='vectorized')
+
+    # fewer hours than terms of the model (28 with Tamb)
+    with pytest.raises(ValueError):
+        MismatchSurrogate(72, 'landscape').fit(frontGTI, backGTI, Tamb, nsamples=10)
+
+
+@pytest.mark.parametrize('portraitorlandscape', ['landscape', 'portrait'])
+def test_VectorizedMismatchEngine(portraitorlandscape):
+    '''
+    The vectorized engine solves the PVMismatch cells, so the powers match
+    PVMismatch within the discretization of its IV curves.
+    '''
+    from bifacialvf.analysis import VectorizedMismatchEngine
+    engine = VectorizedMismatchEngine(72, portraitorlandscape, 0.9)
+    PowerAveraged, PowerDetailed = engine.evaluate_batch(FRONT, BACK)
+    Averaged, Detailed = getMismatchEvaluator(72, portraitorlandscape, 0.9).evaluate_batch(FRONT, BACK)
+    assert PowerAveraged[1] == 0 and PowerDetailed[1] == 0
+    assert np.allclose(PowerAveraged, Averaged, rtol=1e-2)
+    assert np.allclose(PowerDetailed, Detailed, rtol=2e-2)
+    assert np.all(PowerDetailed <= PowerAveraged)
+    assert np.allclose(engine.evaluate(FRONT[0], BACK[0]), (PowerAveraged[0], PowerDetailed[0]))
+
+    (data, metadata) = bifacialvf.loadVFresults(os.path.join(TESTDIR, 'Test_RICHMOND_mismatch.csv'))
+    results = analyseVFResultsPVMismatch(output_df=data, portraitorlandscape=portraitorlandscape, bififactor=0.9,
+                                         mismatch_engine='vectorized')
+    frontGTI = data[[col for col in data if col.endswith('RowFrontGTI')]].to_numpy(dtype=float)
+    backGTI = data[[col for col in data if col.endswith('RowBackGTI')]].to_numpy(dtype=float)
+    assert 'PVMismatch FRONT + BACK (Detailed) PmaxUnmatched [W]' not in results
+    assert results.attrs['MismatchEngine'] == 'vectorized' and results.attrs['MismatchSurrogate'] is None
+    assert np.array_equal(results['Vectorized FRONT + BACK (Detailed) PmaxUnmatched [W]'],
+                          engine.evaluate_batch(frontGTI, backGTI)[1])
+    with pytest.raises(ValueError):
+        analyseVFResultsPVMismatch(output_df=data, mismatch_engine='fast')
+
+
+def test_StringMismatchEvaluator():
+    '''
+    Strings across rows with different rear irradiance lose power to the
+    mismatch between their modules, and parallel strings at one voltage lose
+    some more.
+    '''
+    from bifacialvf.analysis import StringMismatchEvaluator, VectorizedMismatchEngine
+    from bifacialvf.analysis import stringLayout, analyseVFResultsStringMismatch
+    strings = stringLayout(modulesPerString=10, stringsPerInverter=3, rows=3)
+    assert strings == [{'first': 10}, {'interior': 10}, {'last': 10}]
+    assert stringLayout(10, 3, rows=2) == [{'first': 10}, {'first': 5, 'last': 5}, {'last': 10}]
+    with pytest.raises(ValueError):
+        stringLayout(10, 3, rows=4)
+
+    frontGTI = {'first': FRONT, 'interior': FRONT * 0.95, 'last': FRONT}
+    backGTI = {'first': BACK * 1.5, 'interior': BACK, 'last': BACK * 0.5}
+    evaluator = StringMismatchEvaluator(stringLayout(10, 3, rows=2) + strings)
+    assert evaluator.stringMultiplicity.sum() == 6 and len(evaluator.stringCounts) == 4
+    PowerAveraged, PowerModules, PowerStrings, PowerInverter = evaluator.evaluate_batch(frontGTI, backGTI)
+    assert PowerInverter[1] == 0
+    assert np.all(PowerInverter <= PowerStrings) and np.all(PowerStrings <= PowerModules)
+    assert np.all(PowerModules <= PowerAveraged)
+    # the modules at their own maximum power are those of the engine
+    engine = VectorizedMismatchEngine(72, 'landscape')
+    assert np.allclose(PowerModules, sum(engine.evaluate_batch(frontGTI[rowType], backGTI[rowType])[1] * modules
+                                         for rowType, modules in zip(evaluator.rowTypes, evaluator.moduleCounts)))
+
+    # a string of one row type is its modules in series
+    evaluator = StringMismatchEvaluator([{'interior': 10}] * 2)
+    PowerAveraged, PowerModules, PowerStrings, PowerInverter = evaluator.evaluate_batch(
+        {'interior': FRONT}, {'interior': BACK})
+    assert np.allclose(PowerStrings, PowerModules, rtol=1e-5)
+    assert np.allclose(PowerInverter, PowerStrings)
+
+    (data, metadata) = bifacialvf.loadVFresults(os.path.join(TESTDIR, 'Test_RICHMOND_mismatch.csv'))
+    results = analyseVFResultsStringMismatch({'first': data, 'last': data}, stringLayout(10, 2, rows=2))
+    assert np.allclose(results['Inverter FRONT + BACK (Inverter) Pmax [W]'],
+                       results['Inverter FRONT + BACK (Modules) Pmax [W]'], rtol=1e-5)
+    with pytest.raises(ValueError):
+        analyseVFResultsStringMismatch({'first': data}, stringLayout(10, 2, rows=2))
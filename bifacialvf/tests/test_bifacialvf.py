@@ -7,6 +7,7 @@ import pytest
 import numpy as np
 import pandas as pd
 import os
+import inspect
 import bifacialvf
 from bifacialvf.tests import (
     FIXED_ENDTOEND_GTIFRONT, FIXED_ENDTOEND_GTIBACK,
@@ -186,6 +187,89 @@ def test_pvmismatch():
         pytest.approx(194.879, abs = 0.001)    
     
 
+def test_simulate_mismatch_engine():
+    '''
+    An unknown mismatch_engine raises before the year is simulated. The
+    arguments before it keep their positions for positional callers.
+    '''
+    parameters = list(inspect.signature(bifacialvf.simulate).parameters)
+    assert parameters[parameters.index('cellsnum') + 1] == 'portraitorlandscape'
+    assert parameters[-1] == 'mismatch_engine'
+    (myTMY3, meta) = bifacialvf.readInputTMY(os.path.join(DATADIR, "USA_VA_Richmond.Intl.AP.724010_TMY.epw"))
+    with pytest.raises(ValueError, match='mismatch_engine'):
+        bifacialvf.simulate(myTMY3, meta, 1, calcule_gti=True, progress_log=[None],
+                            calculatePVMismatch=True, mismatch_engine='vectorised')
+
+
+def test_simulate_shade_cache():
+    '''
+    With shade_cache_resolution the fixed tilt irradiances stay within the
+    accuracy documented in getGroundShadeFactorsCached (0.5 degree: single
+    timesteps within 7.5 W/m2, two weeks summed within 0.035%), and the
+    cache is looked up once per daylight timestep.
+    '''
+    (myTMY3, meta) = bifacialvf.readInputTMY(os.path.join(DATADIR, "724010TYA.CSV"))
+    myTMY3 = myTMY3[(myTMY3.index.month == 1) & (myTMY3.index.day <= 14)]
+    kwargs = dict(tilt=10, sazm=180, clearance_height=0.2, pitch=1.5, rowType='interior',
+                  albedo=0.2, calcule_gti=True, progress_log=[None])
+    exact = bifacialvf.simulate(myTMY3.copy(), meta, 1, **kwargs)
+    cached = bifacialvf.simulate(myTMY3.copy(), meta, 1, shade_cache_resolution=0.5, **kwargs)
+    assert 'shade_cache_hits' not in exact.attrs
+    hits, misses = cached.attrs['shade_cache_hits'], cached.attrs['shade_cache_misses']
+    assert hits > 0 and misses > 0
+    assert hits + misses == len(exact)     # one lookup per daylight timestep
+    for surface in ['RowFrontGTI', 'RowBackGTI']:
+        expected = exact.filter(like=surface).astype(float).to_numpy()
+        actual = cached.filter(like=surface).astype(float).to_numpy()
+        assert np.nanmax(np.abs(actual - expected)) < 7.6
+        assert np.isclose(np.nansum(actual), np.nansum(expected), rtol=3.5e-4)
+
+
+def test_simulate_solar_position_cache(tmpdir, monkeypatch):
+    '''
+    A second simulate call reuses the cached sun position, a new location,
+    deltastyle or solar_position_method is a new entry, and the sun positions
+    stored in solar_position_cachedir are read back by an empty cache.
+    '''
+    from bifacialvf import sun
+    from bifacialvf.cache import LRUCache
+    (myTMY3, meta) = bifacialvf.readInputTMY(os.path.join(DATADIR, "724010TYA.CSV"))
+    myTMY3 = myTMY3.iloc[:48]
+    cachedir = str(tmpdir)
+    kwargs = dict(tilt=10, clearance_height=0.5, pitch=1.5, albedo=0.2, calcule_gti=True,
+                  progress_log=[None], deltastyle='TMY3', solar_position_cachedir=cachedir)
+    cache = LRUCache(maxsize=32)
+    monkeypatch.setattr(sun, 'SOLPOS_CACHE', cache)
+
+    first = bifacialvf.simulate(myTMY3.copy(), meta, 1, **kwargs)
+    second = bifacialvf.simulate(myTMY3.copy(), meta, 1, **kwargs)
+    assert (cache.hits, cache.misses) == (1, 1)
+    pd.testing.assert_frame_equal(first, second)
+    uncached = bifacialvf.simulate(myTMY3.copy(), meta, 1, solar_position_cache=False, **kwargs)
+    pd.testing.assert_frame_equal(first, uncached)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    variants = [(dict(meta, latitude=meta['latitude'] + 1), {}),
+                (dict(meta, longitude=meta['longitude'] + 1), {}),
+                (dict(meta, TZ=meta['TZ'] + 1), {}),
+                (meta, dict(deltastyle='exact')),
+                (meta, dict(solar_position_method='marion'))]
+    for variantmeta, variantkwargs in variants:
+        bifacialvf.simulate(myTMY3.copy(), variantmeta, 1, **dict(kwargs, **variantkwargs))
+    assert (cache.hits, cache.misses) == (1, 1 + len(variants))
+    assert len(cache) == 1 + len(variants)
+    assert len(os.listdir(cachedir)) == 1 + len(variants)
+
+    # a new process starts with an empty memory cache and reads the disk store
+    cache.clear()
+    def recalculate(*args, **kwargs):
+        raise AssertionError("the sun position should be read from solar_position_cachedir")
+    monkeypatch.setattr(sun, 'sunrisecorrectedsunposition', recalculate)
+    stored = bifacialvf.simulate(myTMY3.copy(), meta, 1, **kwargs)
+    pd.testing.assert_frame_equal(first, stored)
+    assert len(cache) == 1
+
+
 '''  FROM test_vf with nice test fixtures n stuff
 @pytest.mark.parametrize('beta, C, D, expected',
     [(160, 0.5, 1, SKY_BETA160_C05_D1), (20, 0.5, 1, SKY_BETA20_C05_D1),
@@ -199,4 +283,78 @@ def test_getSkyConfigurationFactors(beta, C, D, expected):
     """
     assert np.allclose(
         getSkyConfigurationFactors("interior", beta, C, D), expected)
-'''
\ No newline at end of file
+'''
+
+def test_tracker_sweep():
+    '''
+    tracker_sweep returns one row per configuration, matching simulate for
+    the same configuration.
+    '''
+    (myTMY3, meta) = bifacialvf.readInputTMY(os.path.join(DATADIR, "USA_VA_Richmond.Intl.AP.724010_TMY.epw"))
+    myTMY3 = myTMY3.iloc[4000:4048].copy()
+    sweep = bifacialvf.tracker_sweep(myTMY3, meta, limit_angles=[45, 60], gcrs=[0.35],
+                                     backtrack=[True, False], n_jobs=2,
+                                     hub_height=1.5, rowType='interior', albedo=0.2)
+    assert len(sweep) == 4
+    assert list(sweep.columns[:3]) == ['limit_angle', 'gcr', 'backtrack']
+    assert (sweep['front_insolation'] > sweep['rear_insolation']).all()
+
+    output_df = bifacialvf.simulate(myTMY3.copy(), meta, 1, tracking=True, limit_angle=60,
+                                    backtrack=False, pitch=1/0.35, hub_height=1.5,
+                                    rowType='interior', albedo=0.2, calcule_gti=True,
+                                    progress_log=[None])
+    front = output_df.filter(like='RowFrontGTI').astype(float).mean(axis=1).sum() / 1000
+    row = sweep[(sweep.limit_angle == 60) & (sweep.backtrack == False)]
+    assert np.isclose(row['front_insolation'].iloc[0], front)
+
+    # in this process, each configuration still gets its own tracker angles
+    inprocess = bifacialvf.tracker_sweep(myTMY3, meta, limit_angles=[45, 60], gcrs=[0.35],
+                                         backtrack=[True, False], n_jobs=1,
+                                         hub_height=1.5, rowType='interior', albedo=0.2)
+    pd.testing.assert_frame_equal(inprocess, sweep)
+
+
+def test_tracking_rowtypes():
+    '''
+    Tracking runs for the end rows, where a ground segment can be right under
+    the edge of the row for some tracker states, and the end rows get more
+    rear irradiance than an interior row.
+    '''
+    (myTMY3, meta) = bifacialvf.readInputTMY(os.path.join(DATADIR, "USA_VA_Richmond.Intl.AP.724010_TMY.epw"))
+    myTMY3 = myTMY3.iloc[4000:4048]
+    rear = {}
+    for rowType in ['interior', 'first', 'last', 'single']:
+        output_df = bifacialvf.simulate(myTMY3.copy(), meta, 1, tracking=True, limit_angle=60, backtrack=False,
+                                        pitch=1/0.35, hub_height=1.5, rowType=rowType, albedo=0.2,
+                                        calcule_gti=True, progress_log=[None])
+        gti = output_df.filter(like='GTI').astype(float).to_numpy()
+        assert np.isfinite(gti).all()
+        assert output_df.attrs['tracker_states_unique'] < output_df.attrs['tracker_states_timesteps']
+        rear[rowType] = output_df.filter(like='RowBackGTI').astype(float).to_numpy().sum()
+    assert rear['first'] > rear['interior'] and rear['last'] > rear['interior']
+    assert rear['single'] > max(rear['first'], rear['last'])
+
+
+@pytest.mark.parametrize('tracking', [False, True])
+def test_simulate_incremental(tracking):
+    '''
+    The incremental mode gives the results of the default calculation, and
+    counts each daylight timestep once as reused or recomputed.
+    '''
+    (myTMY3, meta) = bifacialvf.readInputTMY(os.path.join(DATADIR, "USA_VA_Richmond.Intl.AP.724010_TMY.epw"))
+    myTMY3 = myTMY3.iloc[4000:4048]
+    kwargs = dict(tracking=tracking, tilt=25, limit_angle=60, backtrack=True, pitch=1/0.35, hub_height=1.5,
+                  albedo=0.2, calcule_gti=True, progress_log=[None])
+    default = bifacialvf.simulate(myTMY3.copy(), meta, 1, **kwargs)
+    incremental = bifacialvf.simulate(myTMY3.copy(), meta, 1, incremental=True, **kwargs)
+    assert np.allclose(incremental.filter(like='GTI').astype(float).to_numpy(),
+                       default.filter(like='GTI').astype(float).to_numpy(), rtol=1e-9, atol=1e-9)
+
+    daylight = len(default)
+    attrs = incremental.attrs
+    assert attrs['incremental_geometry_reused'] + attrs['incremental_geometry_recomputed'] == daylight
+    assert attrs['incremental_beam_factor_reused'] + attrs['incremental_beam_factor_recomputed'] == daylight
+    assert attrs['incremental_geometry_reused'] > 0
+    if not tracking:
+        assert attrs['incremental_geometry_recomputed'] == 1
+    assert 'incremental_geometry_reused' not in default.attrs
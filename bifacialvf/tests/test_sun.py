@@ -0,0 +1,207 @@
+"""
+Tests of the sun module.
+py.test --cov-report term-missing --cov=bifacialvf
+"""
+import os
+import pytest
+import numpy as np
+import pandas as pd
+import pytz
+import pvlib
+import bifacialvf
+from bifacialvf.sun import perezComp, perezCompArray, sunIncident, sunIncidentArray
+from bifacialvf.sun import aOIcorrection, aOIcorrectionArray
+from bifacialvf.sun import solarPos, solarPosArray, hrSolarPos, hrSolarPosArray
+from bifacialvf.sun import sunrisecorrectedsunposition, cachedsunrisecorrectedsunposition
+from bifacialvf.sun import _dailysunrisesunset, warmupSolarPosition
+from bifacialvf.cache import LRUCache
+
+TESTDIR = os.path.dirname(__file__)  # this folder
+DATADIR = os.path.abspath(os.path.join(TESTDIR, '..', 'data'))
+WEATHERFILES = sorted(f for f in os.listdir(DATADIR)
+                      if f.lower().endswith(('.csv', '.epw')))
+
+
+@pytest.mark.parametrize('weatherfile', WEATHERFILES)
+def test_perezCompArray(weatherfile):
+    '''
+    perezCompArray matches perezComp for every hour of the bundled weather
+    files, for a horizontal and a tilted surface.
+    '''
+    (myTMY3, meta) = bifacialvf.readInputTMY(os.path.join(DATADIR, weatherfile))
+    lat = meta.get('latitude')
+    lng = meta.get('longitude')
+    solpos = pvlib.solarposition.get_solarposition(myTMY3.index, lat, lng)
+    zen = np.radians(solpos['zenith'].values)
+    azm = np.radians(solpos['azimuth'].values)
+    dni = myTMY3['DNI'].values.astype(float)
+    dhi = myTMY3['DHI'].values.astype(float)
+    alb = 0.25
+    tilt = np.radians(30.0)
+    sazm = np.radians(180.0)
+    inc = np.arccos(np.clip(np.cos(zen) * np.cos(tilt) + np.sin(zen) *
+                            np.sin(tilt) * np.cos(azm - sazm), -1, 1))
+
+    for surfinc, surftilt in [(zen, 0.0), (inc, tilt)]:
+        expected = np.array([perezComp(dni[k], dhi[k], alb, surfinc[k],
+                                       surftilt, zen[k])
+                             for k in range(len(zen))]).T
+        result = perezCompArray(dni, dhi, alb, surfinc, surftilt, zen)
+        assert len(result) == 6
+        for e, r in zip(expected, result):
+            assert r.shape == zen.shape
+            np.testing.assert_allclose(r, e, rtol=0, atol=1e-12)
+
+
+@pytest.mark.parametrize('mode', [0, 1, 2])
+def test_sunIncidentArray(mode):
+    '''
+    sunIncidentArray matches sunIncident for random sun positions and time
+    varying orientations.
+    '''
+    rng = np.random.RandomState(0)
+    n = 2000
+    zen = rng.uniform(0, np.pi / 2, n)
+    azm = rng.uniform(0, 2 * np.pi, n)
+    tilt = rng.uniform(1, 89, n)
+    sazm = rng.uniform(0, 360, n)
+    rlim = rng.uniform(0, 180, n)
+    inc, tiltr, sazmr = sunIncidentArray(mode, tilt, sazm, rlim, zen, azm)
+    expected = np.array([sunIncident(mode, tilt[k], sazm[k], rlim[k], zen[k],
+                                     azm[k]) for k in range(n)]).T
+    np.testing.assert_allclose(inc, expected[0], atol=1e-9)
+    np.testing.assert_allclose(tiltr, expected[1], atol=1e-9)
+    np.testing.assert_allclose(sazmr, expected[2], atol=1e-9)
+
+    # scalar orientation broadcast against the sun position arrays
+    inc, tiltr, sazmr = sunIncidentArray(mode, 20.0, 180.0, 45.0, zen, azm)
+    assert inc.shape == zen.shape
+    assert np.isclose(inc[0], sunIncident(mode, 20.0, 180.0, 45.0, zen[0],
+                                          azm[0])[0])
+
+
+@pytest.mark.parametrize('n2', [1.526, 1.300])
+def test_aOIcorrectionArray(n2):
+    '''
+    aOIcorrectionArray matches aOIcorrection, exactly and with the lookup
+    table, including the invalid angles.
+    '''
+    inc = np.concatenate([np.linspace(-0.1, 1.7, 1001), [0.0, np.pi / 2]])
+    expected = np.array([aOIcorrection(n2, x) for x in inc])
+    np.testing.assert_allclose(aOIcorrectionArray(n2, inc), expected,
+                               atol=1e-12)
+    np.testing.assert_allclose(aOIcorrectionArray(n2, inc, lut=True),
+                               expected, atol=1e-6)
+
+
+@pytest.mark.parametrize('lat, lng, tz', [(37.5, -77.3, -5), (69.6, 18.9, 1),
+                                          (-78.0, 166.7, 12)])
+def test_hrSolarPosArray(lat, lng, tz):
+    '''
+    solarPosArray and hrSolarPosArray match solarPos and hrSolarPos,
+    including polar days and nights.
+    '''
+    rng = np.random.RandomState(1)
+    n = 1000
+    year = rng.randint(1960, 2040, n)
+    month = rng.randint(1, 13, n)
+    day = rng.randint(1, 29, n)
+    hour = rng.randint(0, 25, n)
+    minute = rng.uniform(0, 60, n)
+
+    result = solarPosArray(year, month, day, hour, minute, lat, lng, tz)
+    expected = np.array([solarPos(year[k], month[k], day[k], hour[k],
+                                  minute[k], lat, lng, tz)
+                         for k in range(n)]).T
+    for r, e in zip(result, expected):
+        np.testing.assert_allclose(r, e, atol=1e-9)
+
+    result = hrSolarPosArray(year, month, day, hour, lat, lng, tz)
+    expected = np.array([hrSolarPos(year[k], month[k], day[k], hour[k], lat,
+                                    lng, tz)
+                         for k in range(n)]).T
+    for r, e in zip(result, expected):
+        np.testing.assert_allclose(r, e, atol=1e-9)
+
+
+def test_sunrisecorrectedsunposition_marion():
+    '''
+    The Marion solar position is close to pvlib's SPA for Richmond, VA, and
+    the sunrise and sunset hours get the same daylight timesteps but for a
+    few hours a year.
+    '''
+    (myTMY3, meta) = bifacialvf.readInputTMY(os.path.join(DATADIR, '724010TYA.CSV'))
+    for deltastyle, maxchanged in [('exact', 1), ('TMY3', 8), ('SAM', 8)]:
+        spa, sunupspa = sunrisecorrectedsunposition(myTMY3, meta, deltastyle)
+        marion, sunup = sunrisecorrectedsunposition(
+            myTMY3, meta, deltastyle, solar_position_method='marion')
+        assert (marion.index == spa.index).all()
+        assert list(sunup.columns) == list(sunupspa.columns)
+        assert np.abs(sunup['sunrise'] - sunupspa['sunrise']).max() < pd.Timedelta('1min')
+        up = spa['elevation'] > 10
+        assert np.abs(marion['zenith'] - spa['zenith'])[up].max() < 0.02
+        assert np.abs(marion['azimuth'] - spa['azimuth'])[up].max() < 0.05
+        changed = (marion['zenith'] < 90) != (spa['zenith'] < 90)
+        assert changed.sum() <= maxchanged
+        assert np.abs(marion['zenith'] - spa['zenith'])[~changed & (spa['zenith'] < 90)].max() < 0.3
+    with pytest.raises(ValueError):
+        sunrisecorrectedsunposition(myTMY3, meta, solar_position_method='x')
+
+
+def test_dailysunrisesunset():
+    '''
+    Sunrise, sunset and transit solved once per day match pvlib solving
+    every timestamp, for 1-minute data over several local days.
+    '''
+    times = pd.date_range('2021-03-12 20:00', periods=3*1440, freq='1min',
+                          tz=pytz.FixedOffset(-300))
+    expected = pvlib.solarposition.sun_rise_set_transit_spa(times, 37.5, -77.3)
+    result = _dailysunrisesunset(times, 37.5, -77.3)
+    assert result.equals(expected)
+
+
+def test_cachedsunrisecorrectedsunposition(tmpdir):
+    '''
+    Cached sun positions equal the calculated ones, are reused from memory
+    and from the on-disk store, and are keyed on the location.
+    '''
+    (myTMY3, meta) = bifacialvf.readInputTMY(os.path.join(DATADIR, '724010TYA.CSV'))
+    myTMY3 = myTMY3.iloc[:48]
+    solpos, sunup = sunrisecorrectedsunposition(myTMY3, meta, 'TMY3')
+    cache = LRUCache(maxsize=4)
+    cachedir = str(tmpdir)
+    for _ in range(2):
+        cached, cachedsunup = cachedsunrisecorrectedsunposition(
+            myTMY3, meta, 'TMY3', cache=cache, cachedir=cachedir)
+        assert cached.equals(solpos)
+        assert cachedsunup.equals(sunup)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert len(os.listdir(cachedir)) == 1
+    # a new process starts with an empty memory cache and reads the disk store
+    cache.clear()
+    cached, _ = cachedsunrisecorrectedsunposition(
+        myTMY3, meta, 'TMY3', cache=cache, cachedir=cachedir)
+    assert cached.equals(solpos)
+    # another location is a different entry
+    othermeta = dict(meta, latitude=meta['latitude'] + 1)
+    cachedsunrisecorrectedsunposition(myTMY3, othermeta, 'TMY3', cache=cache)
+    assert len(cache) == 2
+
+
+def test_sunrisecorrectedsunposition_numba():
+    '''
+    pvlib's numba SPA, after the warm-up, gives the numpy SPA sun position.
+    '''
+    pytest.importorskip('numba')
+    (myTMY3, meta) = bifacialvf.readInputTMY(os.path.join(DATADIR, '724010TYA.CSV'))
+    myTMY3 = myTMY3.iloc[:240]
+    spa, sunupspa = sunrisecorrectedsunposition(myTMY3, meta, 'TMY3')
+    try:
+        assert warmupSolarPosition('nrel_numba') >= 0
+        numba, sunup = sunrisecorrectedsunposition(
+            myTMY3, meta, 'TMY3', solar_position_method='nrel_numba')
+    finally:
+        warmupSolarPosition('nrel_numpy')
+    assert sunup.equals(sunupspa)
+    np.testing.assert_allclose(numba['zenith'], spa['zenith'], atol=1e-6)
+    np.testing.assert_allclose(numba['azimuth'], spa['azimuth'], atol=1e-6)
@@ -4,7 +4,15 @@ py.test --cov-report term-missing --cov=bifacialvf
 """
 import pytest
 import numpy as np
+import pandas as pd
+import math
 from bifacialvf.vf import getSkyConfigurationFactors
+from bifacialvf.vf import getFrontSurfaceIrradiances, getBackSurfaceIrradiances
+from bifacialvf.vf import getGroundShadeFactors, getGroundShadeFactorsCached
+from bifacialvf.vf import getSurfaceIrradianceWeights, getSurfaceIrradiancesFromWeights
+from bifacialvf.vf import groupTrackerStates, trackingBFvaluescalculator, trackingGeometry
+from bifacialvf.cache import LRUCache
+from bifacialvf.sun import perezComp, sunIncident
 from bifacialvf.tests import (
     SKY_BETA160_C05_D1, SKY_BETA20_C05_D1, SKY_BETA20_C0_D1, SKY_BETA160_C0_D1,
     SKY_BETA160_C1_D1, SKY_BETA20_C1_D1, SKY_BETA20_C1_D0, SKY_BETA160_C1_D0,
@@ -33,4 +41,106 @@ def test_getSkyConfigurationsRowtype(rowtype, expected):
     Benchmark against to the master branch on 2018-08-20 at 91e785d.
     """
     assert np.allclose(
-        getSkyConfigurationFactors(rowtype, beta=20, C=1, D=1), expected)
\ No newline at end of file
+        getSkyConfigurationFactors(rowtype, beta=20, C=1, D=1), expected)
+
+def test_getGroundShadeFactorsCached():
+    """
+    Cached shade factors equal the shade factors at the center of the sun
+    position bin, and sun positions in the same bin reuse the cache entry.
+    """
+    cache = LRUCache(maxsize=10)
+    res = 0.5
+    elv, azm = np.radians(20.1), np.radians(150.1)
+    cached = getGroundShadeFactorsCached(
+        cache, res, 'interior', 20.0, 0.5, 1.0, elv, azm, np.radians(180))
+    expected = getGroundShadeFactors(
+        'interior', 20.0, 0.5, 1.0, np.radians(20.25), np.radians(150.25),
+        np.radians(180))
+    assert np.allclose(cached[:3], expected[:3])
+    assert cached[3] == expected[3] and cached[4] == expected[4]
+    assert (cache.hits, cache.misses) == (0, 1)
+    getGroundShadeFactorsCached(
+        cache, res, 'interior', 20.0, 0.5, 1.0, np.radians(20.4),
+        np.radians(150.0), np.radians(180))
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert len(cache) == 1
+
+
+@pytest.mark.parametrize('rowtype', ['interior', 'first', 'last', 'single'])
+def test_getSurfaceIrradiancesFromWeights(rowtype):
+    """
+    Surface irradiances from the geometry weights reproduce the surface
+    irradiance methods for a partly shaded hour.
+    """
+    beta, sazm, C, D, sensorsy = 25.0, 180.0, 0.5, 1.2, 6
+    dni, dhi, albedo, zen, azm = 650.0, 120.0, 0.3, np.radians(55), np.radians(200)
+    rearSky, frontSky = getSkyConfigurationFactors(rowtype, beta, C, D)
+    pvFrontSH, pvBackSH, maxShadow, rearGroundSH, frontGroundSH = \
+        getGroundShadeFactors(rowtype, beta, C, D, np.pi / 2 - zen, azm,
+                              np.radians(sazm))
+    ghi, iso_dif, circ_dif, horiz_dif, grd_dif, beam = perezComp(
+        dni, dhi, albedo, zen, 0.0, zen)
+    rearGroundGHI = [iso_dif * f + (beam + circ_dif) * (0.01 if sh else 1.0)
+                     for f, sh in zip(rearSky, rearGroundSH)]
+    frontGroundGHI = [iso_dif * f + (beam + circ_dif) * (0.01 if sh else 1.0)
+                      for f, sh in zip(frontSky, frontGroundSH)]
+    aveGroundGHI, frontGTI, frontReflected = getFrontSurfaceIrradiances(
+        rowtype, maxShadow, 'glass', beta, sazm, dni, dhi, C, D, albedo, zen,
+        azm, sensorsy, pvFrontSH, frontGroundGHI, 100)
+    backGTI, aveGroundGHI = getBackSurfaceIrradiances(
+        rowtype, maxShadow, 'ARglass', beta, sazm, dni, dhi, C, D, albedo,
+        zen, azm, sensorsy, pvBackSH, rearGroundGHI, frontGroundGHI,
+        frontReflected, 100)
+
+    weights = getSurfaceIrradianceWeights(
+        rowtype, 'glass', 'ARglass', beta, C, D, sensorsy, 100)
+    front, back, ave = getSurfaceIrradiancesFromWeights(
+        weights, 'glass', 'ARglass', beta, sazm, dni, dhi, albedo, zen, azm,
+        pvFrontSH, pvBackSH, rearGroundGHI, frontGroundGHI)
+    assert np.allclose(front, frontGTI)
+    assert np.allclose(back, backGTI)
+    assert np.isclose(ave, aveGroundGHI)
+
+
+@pytest.mark.parametrize('beta', [
+    30.0, np.float64(-52.5), [0.0, 45.0, 90.0], np.array([-60.0, 12.5]),
+    pd.Series([10.0, -10.0, 60.0], index=pd.date_range('2021-06-21 10:00', periods=3, freq='1h'))])
+def test_trackingGeometry(beta):
+    C, D, h, x1, rtr = trackingGeometry(beta, 1.5, 2.86)
+    betas = np.atleast_1d(np.asarray(beta, dtype=float))
+    expected_C = [1.5 - 0.5 * math.sin(math.radians(b)) for b in betas]
+    expected_D = [2.86 - math.cos(math.radians(b)) for b in betas]
+    assert np.allclose(np.atleast_1d(C), expected_C)
+    assert np.allclose(np.atleast_1d(D), expected_D)
+    assert np.allclose(np.atleast_1d(h), np.sin(np.radians(betas)))
+    assert np.allclose(np.atleast_1d(x1), np.cos(np.radians(betas)))
+    assert np.allclose(rtr, 2.86)
+    if isinstance(beta, pd.Series):
+        assert isinstance(C, pd.Series) and (C.index == beta.index).all()
+    assert np.allclose(trackingBFvaluescalculator(beta, 1.5, 2.86), (C, D))
+    # simulate groups the tracker states from the arrays of trackingGeometry
+    stateCounts = groupTrackerStates(betas, np.atleast_1d(np.asarray(C)),
+                                     np.atleast_1d(np.asarray(D)))
+    assert [state[0] for state in stateCounts] == list(betas)
+    assert sum(stateCounts.values()) == betas.size
+
+
+def test_groupTrackerStates():
+    # limit angle and stow hours share the same state
+    beta = pd.Series([45.0, 45.0, 30.2, 12.0, 45.0, 90.0, 90.0])
+    C, D = trackingBFvaluescalculator(beta, 1.5, 3.0)
+    stateCounts = groupTrackerStates(beta, C, D)
+    assert [state[0] for state in stateCounts] == [45.0, 30.2, 12.0, 90.0]
+    assert list(stateCounts.values()) == [3, 1, 1, 2]
+    assert sum(stateCounts.values()) == beta.size
+
+
+def test_LRUCache_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert 'b' not in cache and 'a' in cache and 'c' in cache
+    assert cache.get('b') is None
+    assert cache.hit_rate == 0.5
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # 5 - Benchmark: Bilinear Interpolation vs PVMismatch throughput
+# 
+# This journal simulates one year of a 1-up portrait single-axis tracker and times the two
+# mismatch power calculations on the same irradiance results:
+# 
+# <ol>
+#     <li> Bilinear interpolation (batched PortraitBatch routine, 12 cell rows) </li> 
+#     <li> PVMismatch (72 cells, portrait) </li> 
+# </ol>
+# 
+
+# In[1]:
+
+
+from pathlib import Path
+import os
+import time
+import bifacialvf
+
+datafile = Path(bifacialvf.__file__).resolve().parent / 'data' / 'USA_VA_Richmond.Intl.AP.724010_TMY.epw'
+myTMY3, meta = bifacialvf.readInputTMY(str(datafile))
+
+
+# In[2]:
+
+
+# One year of a 1-up portrait tracker, 12 sensors along the module
+start = time.time()
+output_df = bifacialvf.simulate(myTMY3, meta, 1, tracking=True, backtrack=True, limit_angle=60,
+                                pitch=1/0.35, hub_height=1.5, rowType='interior', albedo=0.2,
+                                sensorsy=12, calcule_gti=True, progress_log=[None])
+print("View factor simulation (s): {:.1f}".format(time.time() - start))
+
+
+# In[3]:
+
+
+from bifacialvf.analysis import analyseVFResultsBilInterpol, analyseVFResultsPVMismatch
+
+hours = len(output_df)
+
+start = time.time()
+bilinear = analyseVFResultsBilInterpol(output_df=output_df, portraitorlandscape='portrait', write=False)
+bilineartime = time.time() - start
+
+start = time.time()
+pvmismatch = analyseVFResultsPVMismatch(output_df=output_df, portraitorlandscape='portrait', write=False)
+pvmismatchtime = time.time() - start
+
+print("Bilinear interpolation: {:.1f} s, {:.0f} hours/s".format(bilineartime, hours / bilineartime))
+print("PVMismatch:             {:.1f} s, {:.0f} hours/s".format(pvmismatchtime, hours / pvmismatchtime))
+print("Speedup: {:.1f}x".format(pvmismatchtime / bilineartime))
+
+
+# In[4]:
+
+
+# Both give the annual mismatch loss of the portrait module
+for name, results, method in [('Bilinear interpolation', bilinear, 'BilInterpol'),
+                              ('PVMismatch', pvmismatch, 'PVMismatch')]:
+    ideal = results[method + ' FRONT + BACK (Averaged) PmaxIdeal [W]'].sum()
+    unmatched = results[method + ' FRONT + BACK (Detailed) PmaxUnmatched [W]'].sum()
+    print("{}: mismatch loss {:.3f} %".format(name, 100 * (1 - unmatched / ideal)))